@@ -0,0 +1,9 @@
+pytest_plugins = [
+    "testhelper.plugins.baseline",
+    "testhelper.plugins.cifs_stats",
+    "testhelper.plugins.distributed",
+    "testhelper.plugins.profiling",
+    "testhelper.plugins.resources",
+    "testhelper.plugins.results",
+    "testhelper.plugins.sampler",
+]
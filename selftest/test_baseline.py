@@ -0,0 +1,72 @@
+import pytest
+from testhelper import baseline
+
+
+@pytest.mark.parametrize(
+    "metric, direction",
+    [
+        ("workload.read.mbps", 1),
+        ("randio.fs4096.bs4096.iops", 1),
+        ("locking.disjoint.p1.h0.locks_per_sec", 1),
+        ("largedir.1000.scandir_s", -1),
+        ("workload.read.p99_ms", -1),
+        ("mmap.random.read_majflt", -1),
+        ("copy.userspace.rchar", 0),
+        ("smbtorture.stuck_elapsed_s", 0),
+    ],
+)
+def test_metric_direction(metric, direction):
+    assert baseline.metric_direction(metric) == direction
+
+
+def test_t_critical():
+    assert baseline.t_critical(1) == 6.314
+    assert baseline.t_critical(4.9, 0.99) == 3.747
+    assert 1.645 < baseline.t_critical(100) < 1.697
+
+
+def test_compare_samples():
+    base = [100.0, 101.0, 99.0, 100.5, 99.5]
+    # Within the noise
+    res = baseline.compare_samples(base, [99.0, 100.0, 98.5], 1)
+    assert not res["regression"]
+    # A 20% drop in throughput
+    res = baseline.compare_samples(base, [80.0, 81.0, 79.0], 1)
+    assert res["regression"]
+    assert res["change"] == pytest.approx(0.2)
+    # The same drop is within a 25% tolerance
+    res = baseline.compare_samples(base, [80.0, 81.0, 79.0], 1, 0.25)
+    assert res["significant"] and not res["regression"]
+    # A rise in latency, with a single sample in the current run
+    res = baseline.compare_samples(base, [130.0], -1)
+    assert res["regression"]
+    # An improvement
+    res = baseline.compare_samples(base, [130.0], 1)
+    assert not res["significant"]
+    # Single samples cannot be told from noise
+    res = baseline.compare_samples([100.0], [50.0], 1)
+    assert res["change_low"] is None and not res["regression"]
+
+
+def test_store_round_trip(tmp_path):
+    store = baseline.BaselineStore()
+    key = ("xfs", "share1", "test_workload", "workload.read.mbps")
+    store.set(key, [100.0, 101.0, 99.0])
+    store.set(key[:3] + ("workload.read.p99_ms",), [2.0, 2.1, 1.9])
+    store.save(tmp_path / "base.json")
+    loaded = baseline.BaselineStore.load(tmp_path / "base.json")
+    assert loaded.entries == store.entries
+
+    current = baseline.BaselineStore()
+    current.set(key, [70.0, 71.0])
+    current.set(key[:3] + ("workload.read.p99_ms",), [2.5, 2.6])
+    current.set(key[:3] + ("other.mbps",), [1.0])
+    results = dict(baseline.compare_stores(loaded, current))
+    assert len(results) == 2
+    assert results[key]["regression"]
+    tolerances = {"*_ms": 0.5}
+    results = dict(
+        baseline.compare_stores(loaded, current, 0.05, 0.95, tolerances)
+    )
+    assert not results[key[:3] + ("workload.read.p99_ms",)]["regression"]
+    assert "REGRESSION" in baseline.format_comparison(list(results.items()))
@@ -0,0 +1,51 @@
+import pytest
+from testhelper import cmdhelper
+from testhelper.plugins import cifs_stats
+
+unc = "\\\\server\\share"
+
+
+def _stats(shares):
+    return {"global": {"share_reconnects": 0}, "shares": shares}
+
+
+def test_diff_share_mounted_during_test(monkeypatch):
+    # Mounted, used, unmounted and mounted again within the test
+    history = [
+        {
+            "unc": unc,
+            "mounted_at": 11.0,
+            "umounted_at": 12.0,
+            "stats_mounted": {"reads": 1},
+            "stats_umounted": {"reads": 11},
+        },
+        {
+            "unc": unc,
+            "mounted_at": 13.0,
+            "umounted_at": None,
+            "stats_mounted": {"reads": 1},
+            "stats_umounted": None,
+        },
+    ]
+    monkeypatch.setattr(cmdhelper, "_cifs_mount_history", history)
+    plugin = cifs_stats.CifsStats(None)
+    res = plugin._diff(10.0, _stats({}), _stats({unc: {"reads": 5}}))
+    assert res["shares"] == {unc: {"reads": 16}}
+
+
+def test_diff_premounted_share(monkeypatch):
+    monkeypatch.setattr(cmdhelper, "_cifs_mount_history", [])
+    plugin = cifs_stats.CifsStats(None)
+    start = _stats({unc: {"reads": 100, "writes": 7}})
+    end = _stats({unc: {"reads": 150, "writes": 7}})
+    res = plugin._diff(10.0, start, end)
+    assert res["shares"] == {unc: {"reads": 50, "writes": 0}}
+    assert res["global"] == {"share_reconnects": 0}
+
+
+@pytest.mark.parametrize(
+    "unc,prefix",
+    [(unc, "cifs.server.share"), ("\\\\10.0.0.1\\a b", "cifs.10.0.0.1.a b")],
+)
+def test_share_prefix(unc, prefix):
+    assert cifs_stats._share_prefix(unc) == prefix
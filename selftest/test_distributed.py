@@ -0,0 +1,83 @@
+import collections
+import pytest
+import types
+from smb import smb_structs  # type: ignore
+from testhelper import smbclient
+from testhelper.plugins import distributed
+
+Item = collections.namedtuple("Item", ["nodeid", "share"])
+
+
+def test_parse_shard():
+    assert distributed.parse_shard("1/4") == (0, 4)
+    assert distributed.parse_shard("4/4") == (3, 4)
+    for value in ("0/4", "5/4", "4", "a/b"):
+        with pytest.raises(pytest.UsageError):
+            distributed.parse_shard(value)
+
+
+def test_assign_shards():
+    items = [Item(f"t{i}[{share}]", share) for share in "ab" for i in range(6)]
+    items.append(Item("u", None))
+    shards = distributed.assign_shards(items, lambda i: i.share, 3)
+    # The assignment does not depend on the order of collection
+    assert distributed.assign_shards(items[::-1], lambda i: i.share, 3) == (
+        shards
+    )
+    assert sorted(shards) == sorted(i.nodeid for i in items)
+    # The tests of each share are spread evenly over the shards
+    for share in "ab":
+        counts = collections.Counter(
+            shards[i.nodeid] for i in items if i.share == share
+        )
+        assert counts == {0: 2, 1: 2, 2: 2}
+
+
+class FakeSMBClient:
+    # Fails to create the lock directory with the given error
+    error: Exception = FileExistsError("failed to mkdir: collision")
+    attempts = 0
+
+    def __init__(self, *args):
+        pass
+
+    def mkdir(self, dpath):
+        FakeSMBClient.attempts += 1
+        raise self.error
+
+    def read_text(self, fpath):
+        return "gw1"
+
+    def disconnect(self):
+        pass
+
+
+def test_smb_share_lock_errors(monkeypatch):
+    monkeypatch.setattr(smbclient, "SMBClient", FakeSMBClient)
+    params = {"host": "h", "share": "s", "username": "u", "password": "p"}
+    # A held lock is waited for
+    with pytest.raises(TimeoutError, match="held by gw1"):
+        with smbclient.smb_share_lock(params, "me", timeout=0.2, poll=0.1):
+            pass
+    assert FakeSMBClient.attempts > 1
+    # Other errors are not mistaken for a held lock
+    FakeSMBClient.attempts = 0
+    monkeypatch.setattr(
+        FakeSMBClient, "error", IOError("failed to mkdir: access denied")
+    )
+    with pytest.raises(IOError, match="access denied"):
+        with smbclient.smb_share_lock(params, "me", timeout=60, poll=10):
+            pass
+    assert FakeSMBClient.attempts == 1
+
+
+def test_mkdir_collision():
+    class Connection:
+        def createDirectory(self, share, dpath):
+            msg = types.SimpleNamespace(status=0xC0000035, raw_data=b"")
+            raise smb_structs.OperationFailure("createDirectory", [msg])
+
+    client = smbclient.SMBClient.__new__(smbclient.SMBClient)
+    client.ctx, client.share = Connection(), "s"
+    with pytest.raises(FileExistsError):
+        client.mkdir("/.sit-exclusive.lock")
@@ -0,0 +1,74 @@
+import importlib
+import importlib.util
+import inspect
+import os
+import pytest
+import subprocess
+import sys
+import testhelper
+from pathlib import Path
+
+# Heavy modules which must not be loaded just to parse the test-info
+heavy_modules = ["smb", "pyasn1", "subprocess"]
+# Upper bound in seconds for importing testhelper and using read_yaml
+import_time_budget = float(os.getenv("SIT_IMPORT_TIME_BUDGET", "0.5"))
+
+repo_root = str(Path(__file__).resolve().parent.parent)
+
+
+def _run_python(code: str) -> str:
+    env = dict(os.environ, PYTHONPATH=repo_root)
+    ret = subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return ret.stdout
+
+
+def _import_time(attr: str) -> float:
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        "import testhelper\n"
+        f"testhelper.{attr}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    # Best of several runs to filter out noise from a busy runner
+    return min(float(_run_python(code)) for _ in range(5))
+
+
+def test_lazy_import_modules():
+    code = (
+        "import sys\n"
+        "import testhelper\n"
+        "testhelper.read_yaml\n"
+        f"print(' '.join(m for m in {heavy_modules!r} if m in sys.modules))\n"
+    )
+    loaded = _run_python(code).split()
+    assert loaded == [], f"heavy modules loaded on import: {loaded}"
+
+
+def test_lazy_import_time():
+    lazy = _import_time("read_yaml")
+    print(f"import testhelper: read_yaml {lazy:.4f}s")
+    if importlib.util.find_spec("smb") is not None:
+        full = _import_time("SMBClient")
+        print(f"import testhelper: SMBClient {full:.4f}s")
+    assert lazy < import_time_budget, f"import took {lazy:.4f}s"
+
+
+def test_lazy_names_complete():
+    pytest.importorskip("smb")
+    # Every public function or class of the submodules must be reachable
+    for submodule, names in testhelper._submodule_names.items():
+        module = importlib.import_module("testhelper." + submodule)
+        for name, obj in vars(module).items():
+            if name.startswith("_") or not callable(obj):
+                continue
+            if inspect.getmodule(obj) is not module:
+                continue
+            assert name in names, f"{submodule}.{name} not exported"
+            assert getattr(testhelper, name) is obj
@@ -0,0 +1,43 @@
+import pytest
+import testhelper
+
+
+def test_write_seeded_file(tmp_path):
+    entry = testhelper.write_seeded_file(tmp_path, "f", 10000, 42, 4096)
+    data = (tmp_path / "f").read_bytes()
+    assert len(data) == 10000
+    assert len(entry.digests) == 3
+    assert entry.digests == testhelper.chunk_digests(data, 4096)
+    testhelper.verify_file(tmp_path / "f", 10000, entry.digests, 4096)
+    again = testhelper.write_seeded_file(tmp_path, "g", 10000, 42, 4096)
+    assert again.digests == entry.digests
+
+
+def test_verify_file_mismatch(tmp_path):
+    entry = testhelper.write_seeded_file(tmp_path, "f", 10000, 1, 4096)
+    path = tmp_path / "f"
+    with open(path, "r+b") as f:
+        f.seek(5000)
+        f.write(b"X")
+    with pytest.raises(IOError, match="chunk 1"):
+        testhelper.verify_file(path, 10000, entry.digests, 4096)
+    path.write_bytes(b"short")
+    with pytest.raises(IOError, match="size mismatch"):
+        testhelper.verify_file(path, 10000, entry.digests, 4096)
+
+
+def test_manifest_save_load_verify(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    manifest = testhelper.write_seeded_files(data_dir, 5, 3000, 7, 2, 1024)
+    manifest.save(tmp_path / "manifest.jsonl")
+    loaded = testhelper.Manifest.load(tmp_path / "manifest.jsonl")
+    assert loaded.chunk_size == 1024
+    assert [e.path for e in loaded.entries] == [
+        f"file-{i:06d}" for i in range(5)
+    ]
+    assert loaded.verify(data_dir) == []
+    (data_dir / "file-000003").write_bytes(b"\0" * 3000)
+    (data_dir / "file-000004").unlink()
+    errors = loaded.verify(data_dir)
+    assert len(errors) == 2
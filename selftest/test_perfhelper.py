@@ -0,0 +1,28 @@
+import testhelper
+
+
+def test_percentile():
+    samples = [float(i) for i in range(1, 101)]
+    assert testhelper.percentile(samples, 50) == 50.0
+    assert testhelper.percentile(samples, 99) == 99.0
+    assert testhelper.percentile(samples, 100) == 100.0
+    assert testhelper.percentile(samples, 0) == 1.0
+    assert testhelper.percentile([], 50) == 0.0
+
+
+def test_summarize_latencies():
+    stats = testhelper.summarize_latencies([0.001, 0.002, 0.003, 0.010])
+    assert stats["count"] == 4
+    assert stats["p50_ms"] == 2.0
+    assert stats["max_ms"] == 10.0
+    assert abs(stats["mean_ms"] - 4.0) < 1e-9
+    assert testhelper.summarize_latencies([])["count"] == 0
+
+
+def test_format_table():
+    table = testhelper.format_table(["name", "value"], [["a", 1.5], ["bb", 2]])
+    lines = table.splitlines()
+    assert len(lines) == 4
+    assert lines[0].split() == ["name", "value"]
+    assert lines[2].split() == ["a", "1.500"]
+    assert len(set(len(line) for line in lines)) == 1
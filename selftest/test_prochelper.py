@@ -0,0 +1,80 @@
+import testhelper
+from pathlib import Path
+
+debug_data = (Path(__file__).parent / "data/cifs-debugdata.txt").read_text()
+
+
+def test_split_cifs_servers():
+    servers = testhelper.split_cifs_servers(debug_data)
+    assert len(servers) == 2
+    assert servers[0].startswith("1) ConnectionId: 0x1")
+    assert servers[1].startswith("2) ConnectionId: 0x5")
+
+
+def test_cifs_channel_count():
+    count = testhelper.cifs_channel_count
+    assert count(debug_data, "192.168.123.10", "gluster-vol") == 4
+    assert count(debug_data, "192.168.123.10", "GLUSTER-VOL") == 4
+    assert count(debug_data, "192.168.123.11", "export2") == 1
+    assert count(debug_data, "192.168.123.10", "gluster") is None
+    assert count("", "192.168.123.10", "gluster-vol") is None
+
+
+def test_parse_proc_io():
+    text = "rchar: 3980\nwchar: 12\nread_bytes: 0\nwrite_bytes: 4096\n"
+    io = testhelper.parse_proc_io(text)
+    assert io["rchar"] == 3980
+    assert io["wchar"] == 12
+    assert io["write_bytes"] == 4096
+
+
+def test_parse_net_dev():
+    text = (
+        "Inter-|   Receive                            |  Transmit\n"
+        " face |bytes    packets errs drop fifo frame compressed multicast"
+        "|bytes    packets errs drop fifo colls carrier compressed\n"
+        "    lo: 2117 21 0 0 0 0 0 0 2117 21 0 0 0 0 0 0\n"
+        "  eth0:100 2 0 0 0 0 0 0 300 4 0 0 0 0 0 0\n"
+    )
+    assert testhelper.parse_net_dev(text) == {
+        "lo": {"rx_bytes": 2117, "tx_bytes": 2117},
+        "eth0": {"rx_bytes": 100, "tx_bytes": 300},
+    }
+
+
+def test_parse_cifs_stats():
+    text = (Path(__file__).parent / "data/cifs-stats.txt").read_text()
+    stats = testhelper.parse_cifs_stats(text)
+    assert stats["global"] == {
+        "session_reconnects": 1,
+        "share_reconnects": 2,
+        "vfs_operations": 270,
+    }
+    share = stats["shares"]["\\\\192.168.123.10\\gluster-vol"]
+    assert share["smbs"] == 180
+    assert share["bytes_read"] == 4194304
+    assert share["bytes_written"] == 8388608
+    assert share["creates"] == 60
+    assert share["creates_failed"] == 2
+    assert share["oplockbreaks"] == 0
+    assert stats["shares"]["\\\\192.168.123.11\\export2"]["closes"] == 3
+    assert testhelper.parse_cifs_stats("") == {"global": {}, "shares": {}}
+
+
+def test_parse_cifs_server_state():
+    state = testhelper.parse_cifs_server_state(debug_data)
+    assert state["192.168.123.10"] == {
+        "credits": 8190,
+        "in_send": 1,
+        "in_maxreq_wait": 0,
+    }
+    assert state["192.168.123.11"]["in_maxreq_wait"] == 2
+
+
+def test_diff_counters():
+    diff = testhelper.diff_counters({"reads": 4, "writes": 8}, {"reads": 10})
+    assert diff == {"reads": 6}
+    # A counter going backwards was reset and counts from zero
+    assert testhelper.diff_counters({"reads": 10}, {"reads": 3}) == {
+        "reads": 3
+    }
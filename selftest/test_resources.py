@@ -0,0 +1,50 @@
+import json
+from testhelper.plugins import resources
+
+pytest_plugins = ["pytester"]
+
+
+def test_measure_nested():
+    plugin = resources.ResourceAccounting(None, "wall_s", 10)
+    outer = plugin._measure("t", "setup")
+    next(outer)
+    inner = plugin._measure("t", "fixture:f")
+    next(inner)
+    data = bytearray(32 * 2**20)
+    for gen in (inner, outer):
+        for _ in gen:
+            pass
+    del data
+    fixture, setup = plugin.records
+    assert fixture["phase"] == "fixture:f"
+    assert setup["phase"] == "setup"
+    assert fixture["peak_rss_bytes"] >= 32 * 2**20
+    # The peak of the fixture is part of the enclosing phase
+    assert setup["peak_rss_bytes"] >= fixture["peak_rss_bytes"]
+    assert setup["wall_s"] >= fixture["wall_s"]
+    assert set(resources.resource_columns) <= set(setup)
+
+
+def test_fixture_teardown(pytester):
+    pytester.makepyfile("""
+        import pytest
+        import time
+
+        @pytest.fixture
+        def slow_teardown():
+            yield
+            time.sleep(0.2)
+
+        def test_a(slow_teardown):
+            pass
+        """)
+    json_path = pytester.path / "resources.json"
+    result = pytester.runpytest(
+        "-p", "testhelper.plugins.resources", f"--resources-json={json_path}"
+    )
+    result.assert_outcomes(passed=1)
+    records = {r["phase"]: r for r in json.loads(json_path.read_text())}
+    teardown = records["fixture:slow_teardown:teardown"]
+    assert teardown["nodeid"] == "test_fixture_teardown.py::test_a"
+    assert teardown["wall_s"] >= 0.2
+    assert records["teardown"]["wall_s"] >= teardown["wall_s"]
@@ -0,0 +1,96 @@
+import types
+from testhelper import results
+from testhelper.plugins.results import ResultsWarehouse
+
+
+def test_store(tmp_path):
+    with results.ResultsStore(tmp_path / "results.db") as store:
+        tags = {"backend": "xfs", "server": "192.168.1.2", "share": "share1"}
+        for i, outcome in enumerate(["passed", "passed", "failed"]):
+            run = store.add_run(f"rev{i}", started_at=1000.0 + i)
+            store.add_result(
+                run,
+                "test_io.py::test_a",
+                "passed",
+                10.0 + 5 * i,
+                tags,
+                [("io.mbps", 100.0 - i), ("io.mbps", 102.0 - i)],
+                [("samba3.smb2.rw", "success")],
+            )
+            store.add_result(
+                run,
+                "test_io.py::test_b",
+                outcome,
+                1.0,
+                subtests=[("samba3.smb2.lock", outcome)],
+            )
+        runs = store.runs()
+        assert [r[0] for r in runs] == [3, 2, 1]
+        assert runs[0][5:] == (2, 1)
+
+        trend = store.trend("*test_a", "*.mbps")
+        assert [r[5] for r in trend] == [101.0, 100.0, 99.0]
+        trend = store.trend("*test_b")
+        assert [r[4] for r in trend] == ["passed", "passed", "failed"]
+
+        growth = store.growth()
+        assert growth[0][0] == "test_io.py::test_a"
+        assert growth[0][4] == 5.0
+        # Failed runs do not count
+        assert growth[1][1] == 2
+
+        diff = store.diff(1, 3)
+        assert diff["outcomes"] == [("test_io.py::test_b", "passed", "failed")]
+        assert diff["subtests"] == [
+            ("test_io.py::test_b", "samba3.smb2.lock", "passed", "failed")
+        ]
+        assert ("test_io.py::test_a", 10.0, 20.0) in diff["durations"]
+        assert diff["metrics"] == [
+            ("test_io.py::test_a", "io.mbps", 101.0, 99.0)
+        ]
+
+
+def test_warehouse_xdist_controller(tmp_path):
+    with results.ResultsStore(tmp_path / "results.db") as store:
+        run = store.add_run("rev")
+        warehouse = ResultsWarehouse(store, run)
+        node = types.SimpleNamespace(workerinput={})
+        warehouse.pytest_configure_node(node)
+        assert node.workerinput == {"results_run_id": run}
+        # The results come from the workers
+        warehouse.pytest_runtest_logreport(
+            types.SimpleNamespace(nodeid="test_io.py::test_a")
+        )
+        assert warehouse._reports == {}
+
+
+def test_store_metrics_replaced(tmp_path):
+    path = tmp_path / "results.db"
+    with results.ResultsStore(path) as store:
+        run = store.add_run("rev")
+        for value in [100.0, 90.0]:
+            store.add_result(
+                run,
+                "test_io.py::test_a",
+                "passed",
+                1.0,
+                None,
+                [("io.mbps", value)],
+            )
+        rows = store.db.execute("SELECT value FROM metrics").fetchall()
+        assert rows == [(90.0,)]
+
+
+def test_store_merge_metrics(tmp_path):
+    # A database written before metrics were unique
+    path = tmp_path / "results.db"
+    with results.ResultsStore(path) as store:
+        run = store.add_run("rev")
+        store.db.executescript(
+            "DROP INDEX metrics_key;"
+            f" INSERT INTO metrics VALUES ({run}, 'test_a', 'io.mbps', 100);"
+            f" INSERT INTO metrics VALUES ({run}, 'test_a', 'io.mbps', 102);"
+        )
+    with results.ResultsStore(path) as store:
+        rows = store.db.execute("SELECT value FROM metrics").fetchall()
+        assert rows == [(101.0,)]
@@ -0,0 +1,43 @@
+import csv
+import pytest
+import time
+import testhelper
+
+
+def test_sampler(tmp_path):
+    path = tmp_path / "samples.csv"
+    with testhelper.Sampler(path, interval=0.05) as sampler:
+        for _ in range(5):
+            sampler.count("write")
+            sampler.count("write_bytes", 4096)
+            time.sleep(0.02)
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert rows
+    assert list(rows[0])[:4] == [
+        "time_s",
+        "cpu_user_pct",
+        "cpu_sys_pct",
+        "rss_bytes",
+    ]
+    assert int(rows[0]["rss_bytes"]) > 0
+    assert "write_per_s" in rows[0]
+    assert "write_bytes_per_s" in rows[0]
+    # The rates add up to the counted operations
+    total = 0.0
+    prev = 0.0
+    for row in rows:
+        now = float(row["time_s"])
+        total += float(row["write_per_s"]) * (now - prev)
+        prev = now
+    assert round(total) == 5
+
+
+def test_null_sampler():
+    testhelper.NullSampler().count("write", 10)
+
+
+def test_sampler_unknown_interface(tmp_path):
+    sampler = testhelper.Sampler(tmp_path / "samples.csv", 0.05, "nosuch0")
+    with pytest.raises(ValueError, match="nosuch0"):
+        sampler.start()
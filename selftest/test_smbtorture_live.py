@@ -0,0 +1,157 @@
+import importlib.util
+import io
+import pytest
+import yaml
+from pathlib import Path
+
+smbtorture_dir = (
+    Path(__file__).resolve().parent.parent / "testcases/smbtorture"
+)
+
+
+@pytest.fixture(scope="module")
+def smbtorture(tmp_path_factory):
+    # Importing the tests generates them from the test information
+    test_info = yaml.safe_load(Path("test-info1.yml").read_text())
+    test_info["tests"] = {"smbtorture": {"split_subtests": False}}
+    test_info_file = tmp_path_factory.mktemp("smbtorture") / "test-info.yml"
+    test_info_file.write_text(yaml.safe_dump(test_info))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("TEST_INFO_FILE", str(test_info_file))
+        spec = importlib.util.spec_from_file_location(
+            "smbtorture_tests", smbtorture_dir / "test_smbtorture.py"
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+def test_run_live_subtest_timeout(smbtorture):
+    sink = io.BytesIO()
+    events = []
+    cmd = ["sh", "-c", "printf 'test: a\\nsuccess: a\\ntest: b\\n'; sleep 30"]
+    stuck = smbtorture.run_live(cmd, sink, events.append, 1.0)
+    assert stuck is not None
+    name, elapsed = stuck
+    assert name == "b"
+    assert 1.0 <= elapsed < 10
+    assert events[:2] == ["a started", events[1]]
+    assert events[1].startswith("a success (")
+    assert events[2:4] == ["b started", events[3]]
+    assert events[3].startswith("b timed out after ")
+    output = sink.getvalue().decode()
+    assert output.startswith("test: a\nsuccess: a\ntest: b\nerror: b [\n")
+    assert output.endswith("smbtorture killed\n]\n")
+
+
+def test_run_live_timeout_with_output(smbtorture):
+    sink = io.BytesIO()
+    events = []
+    # A stuck subtest logging retries keeps the pipe ready to read
+    script = "printf 'test: b\\n'; exec yes retrying"
+    stuck = smbtorture.run_live(["sh", "-c", script], sink, events.append, 1.0)
+    assert stuck is not None
+    name, elapsed = stuck
+    assert name == "b"
+    assert 1.0 <= elapsed < 10
+    assert sink.getvalue().endswith(b"smbtorture killed\n]\n")
+
+
+def test_run_live_startup_timeout(smbtorture):
+    sink = io.BytesIO()
+    events = []
+    # $0 of the script is the test run
+    cmd = ["sh", "-c", "sleep 30", "smb2.connect"]
+    stuck = smbtorture.run_live(cmd, sink, events.append, 0.5)
+    assert stuck is not None
+    assert stuck[0] == "smb2.connect"
+    assert sink.getvalue().startswith(b"error: smb2.connect [\n")
+
+
+def test_run_live_no_timeout(smbtorture):
+    sink = io.BytesIO()
+    events = []
+    script = "printf 'test: a\\n'; sleep 1; printf 'test: b\\nskip: b'"
+    stuck = smbtorture.run_live(
+        ["sh", "-c", script], sink, events.append, None
+    )
+    assert stuck is None
+    assert sink.getvalue() == b"test: a\ntest: b\nskip: b"
+    # The last line is reported though not terminated
+    assert events == ["a started", "b started", events[2]]
+    assert events[2].startswith("b skip (")
+
+
+@pytest.fixture
+def fake_smbtorture(smbtorture, tmp_path, monkeypatch):
+    # Logs its invocations, prints the version file and lists two
+    # subtests per suite, unless the fail or slow file exists
+    script = tmp_path / "smbtorture"
+    script.write_text(
+        "#!/bin/sh\n"
+        f'echo "$@" >> {tmp_path}/log\n'
+        'case "$1" in\n'
+        f"--version) cat {tmp_path}/version ;;\n"
+        f"--list) test -e {tmp_path}/fail && exit 1\n"
+        f"  test -e {tmp_path}/slow && sleep 30\n"
+        '  printf "%s\\n" "$2" "$2.read" "write" ;;\n'
+        "esac\n"
+    )
+    script.chmod(0o755)
+    (tmp_path / "version").write_text("Version 4.20.0\n")
+    monkeypatch.setattr(smbtorture, "smbtorture_exec", str(script))
+    monkeypatch.setattr(
+        smbtorture, "subtests_cache_file", tmp_path / "cache/subtests.json"
+    )
+    return tmp_path
+
+
+def _invocations(tmp_path):
+    log = tmp_path / "log"
+    lines = log.read_text().splitlines()
+    log.unlink()
+    return lines
+
+
+def test_expand_suites(smbtorture, fake_smbtorture):
+    suites = ["smb2.rw", "smb2.lock"]
+    subtests = [
+        "smb2.rw.read",
+        "smb2.rw.write",
+        "smb2.lock.read",
+        "smb2.lock.write",
+    ]
+    assert smbtorture.expand_suites(suites) == subtests
+    assert _invocations(fake_smbtorture) == [
+        "--version",
+        "--list smb2.rw",
+        "--list smb2.lock",
+    ]
+    # Later collections read the cache
+    assert smbtorture.expand_suites(suites) == subtests
+    assert _invocations(fake_smbtorture) == ["--version"]
+    assert smbtorture.expand_suites(suites[1:]) == subtests[2:]
+    assert _invocations(fake_smbtorture) == ["--version"]
+    # Another smbtorture lists the suites again
+    (fake_smbtorture / "version").write_text("Version 4.21.0\n")
+    assert smbtorture.expand_suites(suites[1:]) == subtests[2:]
+    assert _invocations(fake_smbtorture) == ["--version", "--list smb2.lock"]
+
+
+def test_expand_suites_list_failure(smbtorture, fake_smbtorture):
+    (fake_smbtorture / "fail").touch()
+    suites = ["smb2.rw", "smb2.lock"]
+    assert smbtorture.expand_suites(suites) == suites
+    assert _invocations(fake_smbtorture) == ["--version", "--list smb2.rw"]
+    assert not smbtorture.subtests_cache_file.exists()
+    # Without smbtorture the suites are run whole
+    (fake_smbtorture / "smbtorture").unlink()
+    assert smbtorture.expand_suites(suites) == suites
+
+
+def test_expand_suites_list_timeout(smbtorture, fake_smbtorture, monkeypatch):
+    (fake_smbtorture / "slow").touch()
+    monkeypatch.setattr(smbtorture, "smbtorture_list_timeout", 0.5)
+    suites = ["smb2.rw"]
+    assert smbtorture.expand_suites(suites) == suites
+    assert not smbtorture.subtests_cache_file.exists()
@@ -0,0 +1,345 @@
+import gzip
+import importlib.util
+import io
+import re
+import sys
+import types
+import unittest
+import zlib
+import pytest
+from pathlib import Path
+
+smbtorture_dir = (
+    Path(__file__).resolve().parent.parent / "testcases/smbtorture"
+)
+selftest_dir = smbtorture_dir / "selftest"
+
+
+class RemotedTestCase:
+    # Stand-in for samba.subunit.RemotedTestCase
+    def __init__(self, description):
+        self._description = description
+
+    def id(self):
+        return str(self._description)
+
+
+class ProtocolClient(unittest.TestResult):
+    # Stand-in for samba.subunit.run.TestProtocolClient
+    def __init__(self, stream):
+        super().__init__()
+        self._stream = stream
+
+
+def _samba_stub():
+    samba = types.ModuleType("samba")
+    subunit = types.ModuleType("samba.subunit")
+    run = types.ModuleType("samba.subunit.run")
+    subunit.RemotedTestCase = RemotedTestCase
+    # The message is enough to compare the results
+    subunit.RemoteError = lambda description="": description
+    subunit.PROGRESS_SET = 0
+    subunit.PROGRESS_CUR = 1
+    subunit.PROGRESS_PUSH = 2
+    subunit.PROGRESS_POP = 3
+    run.TestProtocolClient = ProtocolClient
+    samba.subunit = subunit
+    subunit.run = run
+    return {"samba": samba, "samba.subunit": subunit, "samba.subunit.run": run}
+
+
+def _load(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def subunithelper():
+    with pytest.MonkeyPatch.context() as mp:
+        for name, module in _samba_stub().items():
+            mp.setitem(sys.modules, name, module)
+        yield _load(selftest_dir / "subunithelper.py", "subunithelper")
+
+
+class Recorder:
+    """msg_ops recording the events reported by the parsers"""
+
+    def __init__(self):
+        self.events = []
+
+    def __getattr__(self, name):
+        def record(*args):
+            self.events.append(
+                (name,)
+                + tuple(a.id() if hasattr(a, "id") else a for a in args)
+            )
+
+        return record
+
+
+def _statistics():
+    return dict.fromkeys(
+        [
+            "TESTS_UNEXPECTED_OK",
+            "TESTS_EXPECTED_OK",
+            "TESTS_UNEXPECTED_FAIL",
+            "TESTS_EXPECTED_FAIL",
+            "TESTS_ERROR",
+            "TESTS_SKIP",
+        ],
+        0,
+    )
+
+
+def _parse_v1(subunithelper, lines):
+    ops = Recorder()
+    statistics = _statistics()
+    ret = subunithelper.parse_results(ops, statistics, iter(lines))
+    return ret, statistics, ops.events
+
+
+# Commands recognised by the previous, split() based, parser
+_v1_commands = {
+    "test",
+    "testing",
+    "time",
+    "testsuite",
+    "progress",
+    "success",
+    "successful",
+    "failure",
+    "fail",
+    "skip",
+    "knownfail",
+    "error",
+    "xfail",
+    "skip-testsuite",
+    "testsuite-failure",
+    "testsuite-xfail",
+    "testsuite-success",
+    "testsuite-error",
+    "uxsuccess",
+    "testsuite-uxsuccess",
+}
+
+
+def _is_control_v1(line):
+    parts = line.split(None, 1)
+    if len(parts) != 2 or not line.startswith(parts[0]):
+        return False
+    return parts[0].rstrip(":") in _v1_commands
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "test: a\n",
+        "test:a\n",
+        "  test: a\n",
+        "testing: a\n",
+        "success: a\n",
+        "success:: a\n",
+        "success:\ta\n",
+        "success:a\n",
+        "success:\n",
+        "success: \n",
+        "successful: a\n",
+        "xfail a\n",
+        "tests: x\n",
+        "testsuite: s\n",
+        "testsuite-success: s\n",
+        "skip-testsuite: s\n",
+        "progress: push\n",
+        "time: 2024-01-11 12:34:56Z\n",
+        "random output\n",
+        "\n",
+    ],
+)
+def test_parse_results_control_lines(subunithelper, line):
+    _, _, events = _parse_v1(subunithelper, [line])
+    output = [e for e in events if e[0] == "output_msg"]
+    if _is_control_v1(line):
+        assert output == []
+    else:
+        assert output == [("output_msg", line)]
+
+
+def test_parse_results_reasons(subunithelper):
+    ret, statistics, events = _parse_v1(
+        subunithelper,
+        ["test: a\n", "failure: a [ multipart\n", "r1\n", "r2\n", "]\n"],
+    )
+    assert ret == 1
+    assert statistics["TESTS_UNEXPECTED_FAIL"] == 1
+    assert ("addFailure", "a", "r1\nr2\n") in events
+
+    ret, statistics, events = _parse_v1(
+        subunithelper, ["test: a\n", "success: a\n", "skip: b [\n", "]\n"]
+    )
+    assert ret == 0
+    assert ("addSuccess", "a") in events
+    assert ("addSkip", "b", "") in events
+
+    ret, statistics, events = _parse_v1(
+        subunithelper, ["test: a\n", "failure: a [\n", "r1\n"]
+    )
+    assert ret == 1
+    assert statistics["TESTS_ERROR"] == 1
+    assert events[-1] == (
+        "addError",
+        "a",
+        "result (failure) reason (r1\n) interrupted",
+    )
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "2024-01-11 12:34:56Z",
+        "2024-01-11 12:34:56.123456Z",
+        "2024-01-11 12:34:56.5Z",
+        "2024-01-11T12:34:56.123Z",
+        "2024-01-11T12:34:56+02:00",
+    ],
+)
+def test_parse_time(subunithelper, text):
+    iso8601 = pytest.importorskip("iso8601")
+    assert subunithelper.parse_time(text) == iso8601.parse_date(text)
+
+
+def test_combine_regexes(subunithelper):
+    regexes = subunithelper.read_test_regexes(
+        *[str(selftest_dir / name) for name in ("knownfail", "flapping")]
+    )
+    combined = subunithelper.combine_regexes(regexes)
+    assert len(combined) == 1
+    names = [r.pattern.strip("^$").replace("\\", "") for r in regexes]
+    names += [name + ".sub" for name in names]
+    names += ["samba3.smb2.rw.rw1", "samba3.smb2.lock", ""]
+    for name in names:
+        assert subunithelper.find_in_list(
+            combined, name
+        ) == subunithelper.find_in_list(regexes, name)
+
+    # A backreference would refer to another group once merged
+    regexes = [re.compile(p) for p in ["^a", r"^(b)\1", "^c"]]
+    combined = subunithelper.combine_regexes(regexes)
+    assert combined[1:] == [regexes[1]]
+    for name in ["a", "bb", "b", "c", "d"]:
+        assert subunithelper.find_in_list(
+            combined, name
+        ) == subunithelper.find_in_list(regexes, name)
+
+    # Inline flags are not allowed in the middle of the merged pattern
+    regexes = [re.compile(p) for p in ["^a", "(?i)^b"]]
+    assert subunithelper.combine_regexes(regexes) == regexes
+
+
+@pytest.fixture(scope="module")
+def make_corpus():
+    return _load(smbtorture_dir / "benchmark/make_corpus.py", "make_corpus")
+
+
+def _parse_v2(subunithelper, data):
+    ops = Recorder()
+    statistics = _statistics()
+    ret = subunithelper.parse_stream(ops, statistics, io.BytesIO(data))
+    return ret, statistics, ops.events
+
+
+def _results(events):
+    return [e for e in events if e[0].startswith(("add", "startTest"))]
+
+
+@pytest.mark.parametrize("corpus", ["smb2-quick", "smb2-verbose"])
+def test_parse_results_v2_corpus(subunithelper, corpus):
+    streams = {}
+    for ext in ("subunit", "subunit2"):
+        path = smbtorture_dir / f"benchmark/corpus/{corpus}.{ext}.gz"
+        with gzip.open(path, "rb") as f:
+            streams[ext] = _parse_v2(subunithelper, f.read())
+    ret, statistics, events = streams["subunit"]
+    ret2, statistics2, events2 = streams["subunit2"]
+    assert (ret, statistics) == (ret2, statistics2)
+    assert _results(events) == _results(events2)
+    assert _results(events)
+
+
+def _bad_crc(packet):
+    return packet[:-1] + bytes([packet[-1] ^ 0xFF])
+
+
+@pytest.mark.parametrize(
+    "corrupt, error",
+    [
+        (_bad_crc, "bad CRC32"),
+        (lambda packet: packet[:3], "truncated packet header"),
+        (lambda packet: packet[:-2], "truncated packet of"),
+        # A length of 7 and a CRC over the first 4 bytes
+        (
+            lambda packet: b"\xb3\x20\x02\x07"
+            + zlib.crc32(b"\xb3\x20\x02\x07").to_bytes(4, "big"),
+            "bad packet length 7",
+        ),
+    ],
+    ids=["bad-crc", "truncated-header", "truncated-body", "short-length"],
+)
+def test_parse_results_v2_errors(subunithelper, make_corpus, corrupt, error):
+    data = make_corpus.v2_packet(2, "a") + corrupt(
+        make_corpus.v2_packet(3, "a")
+    )
+    ret, statistics, events = _parse_v2(subunithelper, data)
+    assert ret == 1
+    assert statistics["TESTS_ERROR"] == 1
+    assert events[-1][:2] == ("addError", "subunit.parser")
+    assert events[-1][2].startswith("subunit v2: " + error)
+
+
+def test_parse_results_v2_output(subunithelper, make_corpus):
+    data = (
+        make_corpus.v2_packet(2, "a")
+        + b"stray output\n"
+        + make_corpus.v2_packet(0, "a", None, "stdout", b"debug\n")
+        + make_corpus.v2_packet(3, "a")
+    )
+    ret, statistics, events = _parse_v2(subunithelper, data)
+    assert ret == 0
+    assert statistics["TESTS_EXPECTED_OK"] == 1
+    output = [e[1] for e in events if e[0] == "output_msg"]
+    assert output == ["stray output\n", "debug\n"]
+
+
+@pytest.mark.parametrize(
+    "status, file_name, result",
+    [
+        (5, "reason", "addSkip"),
+        (6, "traceback", "addFailure"),
+        (7, "traceback", "addExpectedFailure"),
+    ],
+)
+def test_parse_results_v2_reason(
+    subunithelper, make_corpus, status, file_name, result
+):
+    data = (
+        make_corpus.v2_packet(2, "a")
+        + make_corpus.v2_packet(0, "a", None, file_name, b"line 1\n")
+        + make_corpus.v2_packet(0, "a", None, file_name, b"line 2\n")
+        + make_corpus.v2_packet(status, "a")
+    )
+    _, _, events = _parse_v2(subunithelper, data)
+    assert _results(events)[-1] == (result, "a", "line 1\nline 2\n")
+
+
+def test_parse_stream(subunithelper, make_corpus):
+    v1 = b"test: a\nsuccess: a\n"
+    v2 = make_corpus.v2_packet(2, "a") + make_corpus.v2_packet(3, "a")
+    for data in (v1, v2):
+        ret, statistics, events = _parse_v2(subunithelper, data)
+        assert ret == 0
+        assert statistics["TESTS_EXPECTED_OK"] == 1
+        assert _results(events) == [("startTest", "a"), ("addSuccess", "a")]
+    # A v1 stream is not mistaken for v2, nor the other way round
+    assert _parse_v2(subunithelper, b"\xb3 not a packet\n")[0] == 1
+    assert _parse_v2(subunithelper, b"")[:2] == (0, _statistics())
@@ -1,3 +1,6 @@
+import os
+import pytest
+import shutil
 import testhelper
 from pathlib import Path
 
@@ -60,3 +63,100 @@ def test_generate_exported_shares():
         arr.append((share["server"], share["name"]))
     assert len(arr) == 1
     assert ("server_name", "export2") in arr
+
+
+def test_get_test_config():
+    testinfo = testhelper.read_yaml("test-info1.yml")
+    fsstress = testhelper.get_test_config(testinfo, "fsstress")
+    assert fsstress["profiles"]["quick"]["procs"] == 2
+    largedir = testhelper.get_test_config(testinfo, "largedir", {"n": 1})
+    assert largedir == {"n": 1}
+
+    testinfo = testhelper.read_yaml("test-info2.yml")
+    assert testhelper.get_test_config(testinfo, "fsstress") == {}
+
+
+def test_get_test_info_cached(tmp_path):
+    test_info_file = tmp_path / "test-info.yml"
+    shutil.copy("test-info1.yml", test_info_file)
+    testinfo = testhelper.get_test_info(str(test_info_file))
+    assert testhelper.get_test_info(str(test_info_file)) is testinfo
+
+    # Rewriting the file invalidates the cached copy
+    shutil.copy("test-info2.yml", test_info_file)
+    st = test_info_file.stat()
+    os.utime(test_info_file, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    testinfo2 = testhelper.get_test_info(str(test_info_file))
+    assert testinfo2 is not testinfo
+    assert "gluster-vol" in testinfo2["shares"]
+
+
+def test_generate_seeded_bytes():
+    data = testhelper.generate_seeded_bytes(1234, 100000)
+    assert len(data) == 100000
+    assert data == testhelper.generate_seeded_bytes(1234, 100000)
+    assert data != testhelper.generate_seeded_bytes(1235, 100000)
+    assert testhelper.generate_seeded_bytes(1, 0) == b""
+
+
+def test_get_worker_namespace(monkeypatch):
+    namespace = testhelper.get_worker_namespace()
+    assert namespace.startswith("sit-")
+    assert namespace.endswith(f"-main-{os.getpid()}")
+    monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw3")
+    assert testhelper.get_worker_namespace().endswith(f"-gw3-{os.getpid()}")
+
+
+def _make_tree(root):
+    for i in range(10):
+        leaf = root / f"d{i}" / "a" / "b"
+        leaf.mkdir(parents=True)
+        for j in range(20):
+            (leaf / f"f{j}").write_text("data")
+        (root / f"d{i}" / "f").write_text("data")
+    (root / "link").symlink_to(root / "d0")
+
+
+def test_rmtree_parallel(tmp_path):
+    root = tmp_path / "tree"
+    _make_tree(root)
+    stats = testhelper.rmtree_parallel(root, workers=4)
+    assert not root.exists()
+    assert stats["files"] == 10 * 21 + 1
+    assert stats["dirs"] == 1 + 10 * 3
+    # Removing a missing tree is not an error
+    stats = testhelper.rmtree_parallel(root)
+    assert stats["files"] == stats["dirs"] == 0
+
+
+def test_rmtree_parallel_file(tmp_path):
+    path = tmp_path / "file"
+    path.write_text("data")
+    stats = testhelper.rmtree_parallel(path)
+    assert not path.exists()
+    assert (stats["files"], stats["dirs"]) == (1, 0)
+    # A link to a directory is removed, not its target
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "f").write_text("data")
+    (tmp_path / "link").symlink_to(tmp_path / "dir")
+    testhelper.rmtree_parallel(tmp_path / "link")
+    assert not (tmp_path / "link").exists()
+    assert (tmp_path / "dir" / "f").exists()
+
+
+def test_rmtree_parallel_leftovers(tmp_path, monkeypatch):
+    root = tmp_path / "tree"
+    _make_tree(root)
+    unlink = os.unlink
+
+    def failing_unlink(path):
+        if path.endswith("f7"):
+            raise PermissionError(13, "Permission denied", path)
+        unlink(path)
+
+    monkeypatch.setattr(os, "unlink", failing_unlink)
+    with pytest.raises(OSError, match="entries left in .*Permission denied"):
+        testhelper.rmtree_parallel(root)
+    monkeypatch.undo()
+    leftovers = sorted(p.name for p in root.rglob("*"))
+    assert leftovers.count("f7") == 10
@@ -0,0 +1,73 @@
+import pytest
+import testhelper
+from testhelper import workload
+
+
+def test_parse_size():
+    assert testhelper.parse_size(4096) == 4096
+    assert testhelper.parse_size("4k") == 4096
+    assert testhelper.parse_size("16M") == 2**24
+    assert testhelper.parse_size("1.5g") == 3 * 2**29
+
+
+def test_run_workload_job(tmp_path):
+    job = testhelper.WorkloadJob(
+        {
+            "name": "mixed",
+            "fileset": {"nfiles": 8, "size": "10k"},
+            "block_size": "4k",
+            "ops": {"read": 3, "write": 2, "stat": 1, "unlink": 1},
+            "threads": 2,
+            "ops_count": 50,
+        }
+    )
+    res = testhelper.run_workload_job(job, tmp_path)
+    assert res["job"] == "mixed"
+    assert res["ops"] == 100
+    assert set(res["op"]) <= {"read", "write", "stat", "unlink"}
+    assert res["op"]["read"]["count"] > 0
+
+
+def test_workload_detects_corruption(tmp_path):
+    job = testhelper.WorkloadJob(
+        {"name": "verify", "fileset": {"nfiles": 1, "size": "8k"}}
+    )
+    (tmp_path / job.dirname).mkdir()
+    worker = workload._Worker(job, tmp_path, 0)
+    worker.prepare()
+    assert worker.do_read(0) == 8192
+
+    path = job.file_path(tmp_path, 0)
+    data = bytearray(path.read_bytes())
+    data[100] ^= 0xFF
+    path.write_bytes(data)
+    with pytest.raises(IOError, match="data mismatch"):
+        worker.do_read(0)
+
+    worker.do_unlink(0)
+    assert worker.do_read(0) == 0
+    worker.do_write(0)
+    assert worker.do_read(0) == 8192
+
+
+def test_run_io_checks(tmp_path):
+    dsets = testhelper.make_datasets(tmp_path / "io", 1024, 4)
+    assert testhelper.run_io_checks(dsets) == 4 * 4 * 1024
+    assert list((tmp_path / "io").iterdir()) == []
+
+
+def test_run_random_io(tmp_path):
+    bfile = testhelper.BlockFile(tmp_path / "randio", 2**16, 4096, 1)
+    bfile.open()
+    try:
+        bfile.fill()
+        res = testhelper.run_random_io(bfile, 2, 50, 0.2)
+        bfile.verify()
+    finally:
+        bfile.close()
+    assert res["read"]["count"] + res["write"]["count"] > 0
+
+
+def test_run_stress_test(tmp_path):
+    testhelper.run_stress_test(tmp_path, 2, 3, 4096)
+    assert list(tmp_path.iterdir()) == []
@@ -8,18 +8,16 @@
 
 import testhelper
 from testhelper import SMBClient
-import os
 import pytest
 import typing
 
 test_string = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
-test_info_file = os.getenv("TEST_INFO_FILE")
-test_info = testhelper.read_yaml(test_info_file)
 
 
 def consistency_check(hostname: str, share_name: str) -> None:
+    test_info = testhelper.get_test_info()
     mount_params = testhelper.get_mount_parameters(test_info, share_name)
-    test_filename = "/test_consistency"
+    test_filename = "/test_consistency-" + testhelper.get_worker_namespace()
 
     # file write cycle
     smbclient = SMBClient(
@@ -46,6 +44,7 @@ def consistency_check(hostname: str, share_name: str) -> None:
 
 
 def generate_consistency_check() -> typing.List[typing.Tuple[str, str]]:
+    test_info = testhelper.get_test_info()
     arr = []
     for sharename in testhelper.get_exported_shares(test_info):
         share = testhelper.get_share(test_info, sharename)
@@ -140,17 +140,68 @@ _sit_run_ltp_tests() {
 	done
 }
 
-_sit_run_ltp_fsstress_with() {
-	_run ${FSSTRESS_PROG} "$@" -d "${TMPDIR}"
+# Each fsstress profile is a line of the form:
+#   <name> <duration-seconds> <fsstress-arguments...>
+# A duration of 0 runs fsstress until its operation count is done.
+declare -a FSSTRESS_DEFAULT_PROFILES=(
+	"single 0 -n 1 -p 1 -r"
+	"small 0 -n 10 -p 10 -r"
+	"mixed 0 -n 1000 -p 10 -r -f creat=1000 -f read=100 -f write=100 -f stat=100 -f mkdir=100 -f getdents=100 -f truncate=10"
+)
+
+_sit_run_ltp_fsstress_profile() {
+	local name="$1"
+	local duration="$2"
+	shift 2
+	local counts="${TMPDIR}/.fsstress-${name}.counts"
+	local start end ret
+
+	_msg "fsstress profile ${name}: duration=${duration} args=$*"
+	start=$(date +%s.%N)
+	set -o pipefail
+	if [[ "${duration}" -gt 0 ]]; then
+		timeout "${duration}" ${FSSTRESS_PROG} "$@" -v -d "${TMPDIR}" | \
+			awk '$1 ~ /^[0-9]+\/[0-9]+:$/ { n[$2]++ }
+			END { for (op in n) print op, n[op] }' > "${counts}"
+		ret=$?
+		# timeout(1) exits with 124 when the duration has elapsed
+		[[ ${ret} -eq 124 ]] && ret=0
+	else
+		${FSSTRESS_PROG} "$@" -v -d "${TMPDIR}" | \
+			awk '$1 ~ /^[0-9]+\/[0-9]+:$/ { n[$2]++ }
+			END { for (op in n) print op, n[op] }' > "${counts}"
+		ret=$?
+	fi
+	set +o pipefail
+	end=$(date +%s.%N)
+	[[ ${ret} -eq 0 ]] || _die "failed: fsstress profile ${name}"
+
+	awk -v name="${name}" -v start="${start}" -v end="${end}" '
+		{ n[$1] = $2; total += $2 }
+		END {
+			elapsed = end - start
+			if (elapsed <= 0) elapsed = 1e-9
+			n["all"] = total
+			for (op in n)
+				printf "SIT-FSSTRESS: profile=%s op=%s count=%d " \
+					"elapsed=%.3f ops_per_sec=%.2f\n",
+					name, op, n[op], elapsed, n[op] / elapsed
+		}' "${counts}"
+	rm -f "${counts}"
 }
 
 _sit_run_ltp_fsstress() {
-	_sit_run_ltp_fsstress_with -n 1 -p 1 -r
-	_sit_run_ltp_fsstress_with -n 10 -p 10 -r
-	_sit_run_ltp_fsstress_with -n 1000 -p 10 -r \
-		-f creat=1000 -f read=100 -f write=100 \
-		-f stat=100 -f mkdir=100 -f getdents=100 \
-		-f truncate=10
+	local -a profiles=("${FSSTRESS_DEFAULT_PROFILES[@]}")
+	local profile
+
+	if [[ -n "${SIT_FSSTRESS_PROFILES}" ]]; then
+		mapfile -t profiles <<< "${SIT_FSSTRESS_PROFILES}"
+	fi
+	for profile in "${profiles[@]}"; do
+		[[ -n "${profile}" ]] || continue
+		# shellcheck disable=SC2086
+		_sit_run_ltp_fsstress_profile ${profile}
+	done
 }
 
 
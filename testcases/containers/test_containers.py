@@ -7,18 +7,15 @@
 # ip addresses).
 
 import testhelper
-import os
 import pytest
+import re
 import typing
 import yaml
 from pathlib import Path
-import shutil
 
 script_root = Path(__file__).resolve().parent
 container_tests_file = script_root / "test_containers.yml"
 
-# Use a global test_info to get a better output when running pytest
-test_info: typing.Dict[str, typing.Any] = {}
 # global containing tests read from yaml
 container_tests: typing.Dict[str, str] = {}
 
@@ -35,30 +32,93 @@ def load_container_tests() -> int:
 
 
 # Load globals
-test_info = testhelper.read_yaml(os.getenv("TEST_INFO_FILE"))
 assert load_container_tests() != 0, "No tests loaded"
 
 
-def containers_check_mounted(mount_point: Path, test: str) -> None:
-    test_dir = mount_point / test
+fsstress_stat_re = re.compile(
+    r"^SIT-FSSTRESS: profile=(\S+) op=(\S+) count=(\d+) "
+    r"elapsed=(\S+) ops_per_sec=(\S+)$",
+    re.MULTILINE,
+)
+
+
+def fsstress_profile_args(profile: dict) -> typing.List[str]:
+    """Convert a fsstress profile from test-info into fsstress arguments"""
+    args = []
+    if "procs" in profile:
+        args += ["-p", str(profile["procs"])]
+    if "ops" in profile:
+        args += ["-n", str(profile["ops"])]
+    if profile.get("duration"):
+        # loop forever, the run is bounded by the duration
+        args += ["-l", "0"]
+    ops_mix = profile.get("ops_mix") or {}
+    if ops_mix:
+        args.append("-z")
+        for op, weight in ops_mix.items():
+            args += ["-f", f"{op}={weight}"]
+    args += str(profile.get("args", "")).split()
+    return args
+
+
+def fsstress_profiles_env() -> typing.Dict[str, str]:
+    """Environment selecting the fsstress profiles to run in a container"""
+    test_info = testhelper.get_test_info()
+    config = testhelper.get_test_config(test_info, "fsstress")
+    profiles = config.get("profiles") or {}
+    if not profiles:
+        return {}
+    lines = []
+    for name in config.get("run") or list(profiles.keys()):
+        assert name in profiles, f"Unknown fsstress profile {name}"
+        assert " " not in name, f"Invalid fsstress profile name {name}"
+        profile = profiles[name] or {}
+        duration = int(profile.get("duration", 0))
+        args = " ".join(fsstress_profile_args(profile))
+        lines.append(f"{name} {duration} {args}")
+    return {"SIT_FSSTRESS_PROFILES": "\n".join(lines)}
+
+
+def record_fsstress_stats(
+    output: str, record_property: typing.Callable[[str, object], None]
+) -> None:
+    for m in fsstress_stat_re.finditer(output):
+        profile, op, count, elapsed, ops_per_sec = m.groups()
+        record_property(f"fsstress.{profile}.{op}.count", int(count))
+        record_property(f"fsstress.{profile}.{op}.elapsed_s", float(elapsed))
+        record_property(
+            f"fsstress.{profile}.{op}.ops_per_sec", float(ops_per_sec)
+        )
+
+
+def containers_check_mounted(mount_point: Path, test: str) -> str:
+    test_dir = mount_point / f"{test}-{testhelper.get_worker_namespace()}"
     test_dir.mkdir()
     try:
-        ret, output = testhelper.podman_run(container_tests[test], test_dir)
+        ret, output = testhelper.podman_run(
+            container_tests[test], test_dir, env=fsstress_profiles_env()
+        )
         print(output)
         assert ret == 0, "Error running test"
     finally:
-        # Cannot use Path.rmdir() here since test_dir isn't empty
-        shutil.rmtree(test_dir, ignore_errors=True)
+        # Containers can leave tens of thousands of files behind
+        stats = testhelper.rmtree_parallel(test_dir)
+        print(
+            f"Removed {stats['files']} files and {stats['dirs']} "
+            f"directories in {stats['elapsed_s']:.2f}s"
+        )
+    return output
 
 
-def containers_check(ipaddr: str, share_name: str, test: str) -> None:
+def containers_check(ipaddr: str, share_name: str, test: str) -> str:
+    test_info = testhelper.get_test_info()
     mount_params = testhelper.get_mount_parameters(test_info, share_name)
     mount_params["host"] = ipaddr
     tmp_root = testhelper.get_tmp_root()
     mount_point = testhelper.get_tmp_mount_point(tmp_root)
     testhelper.cifs_mount(mount_params, mount_point)
     try:
-        containers_check_mounted(mount_point, test)
+        return containers_check_mounted(mount_point, test)
     finally:
         testhelper.cifs_umount(mount_point)
         mount_point.rmdir()
@@ -66,6 +126,7 @@ def containers_check(ipaddr: str, share_name: str, test: str) -> None:
 
 
 def generate_containers_test() -> typing.List[typing.Tuple[str, str, str]]:
+    test_info = testhelper.get_test_info()
     arr = []
     for share_name in testhelper.get_exported_shares(test_info):
         server = testhelper.get_share(test_info, share_name)["server"]
@@ -79,5 +140,11 @@ def generate_containers_test() -> typing.List[typing.Tuple[str, str, str]]:
     "ipaddr,share_name,test",
     generate_containers_test(),
 )
-def test_containers(ipaddr: str, share_name: str, test: str) -> None:
-    containers_check(ipaddr, share_name, test)
+def test_containers(
+    ipaddr: str,
+    share_name: str,
+    test: str,
+    record_property: typing.Callable[[str, object], None],
+) -> None:
+    output = containers_check(ipaddr, share_name, test)
+    record_fsstress_stats(output, record_property)
@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 
+import contextlib
 import pytest
-import os
-import shutil
 import testhelper
 import typing
 from pathlib import Path
 
-test_info_file = os.getenv("TEST_INFO_FILE")
-test_info = testhelper.read_yaml(test_info_file)
+
+def _remove_test_dir(test_dir: Path) -> None:
+    stats = testhelper.rmtree_parallel(test_dir)
+    print(
+        f"Removed {stats['files']} files and {stats['dirs']} directories "
+        f"in {stats['elapsed_s']:.2f}s"
+    )
 
 
 @pytest.fixture
@@ -20,13 +24,14 @@ def setup_mount(
     tmp_root = testhelper.get_tmp_root()
     mount_point = testhelper.get_tmp_mount_point(tmp_root)
     try:
+        test_info = testhelper.get_test_info()
         mount_params = testhelper.get_mount_parameters(test_info, share_name)
         mount_params["host"] = ipaddr
 
         # mount cifs share
         testhelper.cifs_mount(mount_params, mount_point)
         flag_mounted = True
-        test_dir = mount_point / "mount_test"
+        test_dir = mount_point / testhelper.get_worker_namespace()
         test_dir.mkdir()
     except Exception as e:
         raise Exception(f"Setup failed: {str(e)}")
@@ -36,16 +41,61 @@ def setup_mount(
 
     # Perform teardown after the test has run
     try:
-        if flag_mounted and test_dir:
-            shutil.rmtree(test_dir, ignore_errors=True)
+        try:
+            if flag_mounted and test_dir:
+                try:
+                    _remove_test_dir(test_dir)
+                finally:
+                    testhelper.cifs_umount(mount_point)
+        finally:
+            mount_point.rmdir()
+            tmp_root.rmdir()
+    except Exception as e:
+        raise Exception(f"Teardown failed: {str(e)}")
+
+
+@pytest.fixture
+def test_dir(
+    request: pytest.FixtureRequest,
+) -> typing.Generator[Path, None, None]:
+    """Directory of this test runner in a premounted share"""
+    share_path: Path = request.param
+    test_dir = share_path / testhelper.get_worker_namespace()
+    test_dir.mkdir()
+    yield test_dir
+    _remove_test_dir(test_dir)
+
+
+@contextlib.contextmanager
+def mounted_share(
+    ipaddr: str,
+    share_name: str,
+    opts: str = "",
+    username: typing.Optional[str] = None,
+) -> typing.Generator[Path, None, None]:
+    """Mount an exported share with the given mount options and user"""
+    test_info = testhelper.get_test_info()
+    mount_params = testhelper.get_mount_parameters(test_info, share_name)
+    mount_params["host"] = ipaddr
+    if username is not None:
+        users = testhelper.get_share(test_info, share_name)["users"]
+        mount_params["username"] = username
+        mount_params["password"] = users[username]
+    tmp_root = testhelper.get_tmp_root()
+    mount_point = testhelper.get_tmp_mount_point(tmp_root)
+    try:
+        testhelper.cifs_mount(mount_params, mount_point, opts)
+        try:
+            yield mount_point
+        finally:
             testhelper.cifs_umount(mount_point)
+    finally:
         mount_point.rmdir()
         tmp_root.rmdir()
-    except Exception as e:
-        raise Exception(f"Teardown failed: {str(e)}")
 
 
 def gen_params() -> typing.List[typing.Any]:
+    test_info = testhelper.get_test_info()
     exported_sharenames = testhelper.get_exported_shares(test_info)
     arr = []
     for share_name in exported_sharenames:
@@ -56,5 +106,17 @@ def gen_params() -> typing.List[typing.Any]:
     return arr
 
 
+def gen_params_exported() -> typing.List[typing.Any]:
+    """Parameters for tests taking separate ipaddr and share_name"""
+    test_info = testhelper.get_test_info()
+    arr = []
+    for share_name in testhelper.get_exported_shares(test_info):
+        server = testhelper.get_share(test_info, share_name)["server"]
+        arr.append(
+            pytest.param(server, share_name, id=f"{server}-{share_name}")
+        )
+    return arr
+
+
 def gen_params_premounted() -> typing.List[Path]:
-    return testhelper.get_premounted_shares(test_info)
+    return testhelper.get_premounted_shares(testhelper.get_test_info())
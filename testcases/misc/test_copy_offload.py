@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+# Compare server-side copy offload through copy_file_range with a
+# userspace read+write copy of large files on the same share.
+
+import pytest
+import os
+import random
+import time
+import typing
+import testhelper
+from pathlib import Path
+from .conftest import gen_params, gen_params_premounted
+
+default_config = {
+    "nfiles": 4,
+    "file_size": 2**30,
+    # Buffer size of the userspace copy and request size of
+    # copy_file_range
+    "io_size": 2**23,
+    # Fail unless copy_file_range moved less than a tenth of the copied
+    # data over the network, i.e. the copy was offloaded to the server
+    "require_offload": False,
+    # Network interface to the server whose traffic is counted, all
+    # interfaces but the loopback by default
+    "interface": None,
+}
+
+
+def _drop_cache(path: Path) -> None:
+    # Make sure the source data is read from the server
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def _copy_offload(src: Path, dst: Path, size: int, io_size: int) -> None:
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        copied = 0
+        while copied < size:
+            count = min(io_size, size - copied)
+            ret = os.copy_file_range(fsrc.fileno(), fdst.fileno(), count)
+            if not ret:
+                raise IOError(f"short copy of {src}: {copied}")
+            copied += ret
+        os.fsync(fdst.fileno())
+
+
+def _copy_userspace(src: Path, dst: Path, size: int, io_size: int) -> None:
+    buf = bytearray(io_size)
+    view = memoryview(buf)
+    with open(src, "rb", buffering=0) as fsrc, open(
+        dst, "wb", buffering=0
+    ) as fdst:
+        copied = 0
+        while copied < size:
+            n = fsrc.readinto(view)
+            if not n:
+                raise IOError(f"short copy of {src}: {copied}")
+            fdst.write(view[:n])
+            copied += n
+        os.fsync(fdst.fileno())
+
+
+copy_methods = {
+    "copy_file_range": _copy_offload,
+    "userspace": _copy_userspace,
+}
+
+
+def _net_bytes(interface: typing.Optional[str]) -> int:
+    devs = testhelper.read_net_dev()
+    if interface is not None:
+        if interface not in devs:
+            raise ValueError(f"unknown network interface: {interface}")
+        devs = {interface: devs[interface]}
+    return sum(
+        dev["rx_bytes"] + dev["tx_bytes"]
+        for name, dev in devs.items()
+        if name != "lo" or interface is not None
+    )
+
+
+def _measure_copy(
+    method: str,
+    src_dir: Path,
+    dst_dir: Path,
+    manifest: testhelper.Manifest,
+    io_size: int,
+    interface: typing.Optional[str],
+) -> typing.Dict[str, float]:
+    copy = copy_methods[method]
+    dst_dir.mkdir()
+    for entry in manifest.entries:
+        _drop_cache(src_dir / entry.path)
+    total = sum(entry.size for entry in manifest.entries)
+    io0 = testhelper.read_proc_io()
+    net0 = _net_bytes(interface)
+    t0 = time.perf_counter()
+    for entry in manifest.entries:
+        copy(src_dir / entry.path, dst_dir / entry.path, entry.size, io_size)
+    elapsed = time.perf_counter() - t0
+    net1 = _net_bytes(interface)
+    io1 = testhelper.read_proc_io()
+    errors = manifest.verify(dst_dir)
+    assert not errors, f"{method}: " + "; ".join(errors[:10])
+    return {
+        "mbps": total / elapsed / 2**20,
+        "rchar": io1["rchar"] - io0["rchar"],
+        "wchar": io1["wchar"] - io0["wchar"],
+        "net_bytes": net1 - net0,
+        "net_ratio": (net1 - net0) / total,
+    }
+
+
+def _run_copy_offload(
+    base: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(), "copy_offload", default_config
+    )
+    headers = ["method", "MB/s", "rchar", "wchar", "net_bytes", "net/copied"]
+    rows = []
+    base.mkdir(exist_ok=True)
+    results = {}
+    try:
+        src_dir = base / "src"
+        src_dir.mkdir()
+        manifest = testhelper.write_seeded_files(
+            src_dir,
+            config["nfiles"],
+            config["file_size"],
+            random.randrange(2**32),
+        )
+        for method in copy_methods:
+            res = _measure_copy(
+                method,
+                src_dir,
+                base / method,
+                manifest,
+                config["io_size"],
+                config["interface"],
+            )
+            testhelper.rmtree_parallel(base / method)
+            results[method] = res
+            rows.append(
+                [method, res["mbps"], res["rchar"], res["wchar"]]
+                + [res["net_bytes"], res["net_ratio"]]
+            )
+            for metric in ("mbps", "rchar", "wchar", "net_bytes"):
+                record_property(f"copy.{method}.{metric}", res[metric])
+    finally:
+        print("\n" + testhelper.format_table(headers, rows))
+        testhelper.rmtree_parallel(base)
+    if config["require_offload"]:
+        ratio = results["copy_file_range"]["net_ratio"]
+        assert ratio < 0.1, f"copy was not offloaded: net/copied={ratio}"
+
+
+@pytest.mark.privileged
+@pytest.mark.parametrize("setup_mount", gen_params(), indirect=True)
+def test_copy_offload(
+    setup_mount: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    base = setup_mount / "copy-offload"
+    _run_copy_offload(base, record_property)
+
+
+@pytest.mark.parametrize("test_dir", gen_params_premounted(), indirect=True)
+def test_copy_offload_premounted(
+    test_dir: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    base = test_dir / "copy-offload"
+    _run_copy_offload(base, record_property)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Write a data set through one mount and verify it against its checksum
+# manifest through fresh mounts of every public interface and user.
+
+import itertools
+import pytest
+import random
+import time
+import typing
+import testhelper
+from pathlib import Path
+from .conftest import gen_params_exported, mounted_share
+
+default_config = {
+    "nfiles": 64,
+    "file_size": 2**24,
+    # Number of files written and verified in parallel
+    "workers": 8,
+}
+
+
+def _mount_combinations(
+    ipaddr: str, share_name: str
+) -> typing.List[typing.Tuple[str, str]]:
+    test_info = testhelper.get_test_info()
+    interfaces = test_info.get("public_interfaces") or [ipaddr]
+    users = list(testhelper.get_share(test_info, share_name)["users"])
+    return list(itertools.product(interfaces, users))
+
+
+@pytest.mark.privileged
+@pytest.mark.parametrize("ipaddr,share_name", gen_params_exported())
+def test_crossclient_verify(
+    ipaddr: str,
+    share_name: str,
+    tmp_path: Path,
+    record_property: typing.Callable[[str, object], None],
+) -> None:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(), "crossclient", default_config
+    )
+    combinations = _mount_combinations(ipaddr, share_name)
+    dirname = f"crossclient-{testhelper.get_worker_namespace()}"
+    manifest_path = tmp_path / "manifest.jsonl"
+    total_mb = config["nfiles"] * config["file_size"] / 2**20
+    headers = ["interface", "user", "op", "MB/s"]
+    rows = []
+    writer_host, writer_user = combinations[0]
+    try:
+        with mounted_share(
+            writer_host, share_name, username=writer_user
+        ) as mount_point:
+            (mount_point / dirname).mkdir()
+            t0 = time.perf_counter()
+            manifest = testhelper.write_seeded_files(
+                mount_point / dirname,
+                config["nfiles"],
+                config["file_size"],
+                random.randrange(2**32),
+                config["workers"],
+            )
+            write_mbps = total_mb / (time.perf_counter() - t0)
+            manifest.save(manifest_path)
+        rows.append([writer_host, writer_user, "write", write_mbps])
+        record_property("crossclient.write_mbps", write_mbps)
+
+        # Each verification starts from a new mount and the manifest
+        # file only, so nothing is served from the writer's memory.
+        for host, user in combinations:
+            with mounted_share(host, share_name, username=user) as mount:
+                t0 = time.perf_counter()
+                errors = testhelper.Manifest.load(manifest_path).verify(
+                    mount / dirname, config["workers"]
+                )
+                verify_mbps = total_mb / (time.perf_counter() - t0)
+            rows.append([host, user, "verify", verify_mbps])
+            record_property(
+                f"crossclient.{host}.{user}.verify_mbps", verify_mbps
+            )
+            assert not errors, f"{host} {user}: " + "; ".join(errors[:10])
+    finally:
+        print("\n" + testhelper.format_table(headers, rows))
+        with mounted_share(ipaddr, share_name) as mount_point:
+            testhelper.rmtree_parallel(mount_point / dirname)
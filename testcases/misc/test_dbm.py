@@ -5,9 +5,9 @@ import pytest
 import dbm
 import hashlib
 import pickle
-import shutil
 import typing
 import random
+import testhelper
 from pathlib import Path
 from .conftest import gen_params, gen_params_premounted
 
@@ -98,7 +98,7 @@ def _run_dbm_consistency_checks(base_path: Path) -> None:
         _check_dbm_consistency(base_path, 100)
         _check_dbm_consistency(base_path, 10000)
     finally:
-        shutil.rmtree(base_path, ignore_errors=True)
+        testhelper.rmtree_parallel(base_path)
 
 
 @pytest.mark.privileged
@@ -108,7 +108,7 @@ def test_dbm_consistency(setup_mount: Path) -> None:
     _run_dbm_consistency_checks(base)
 
 
-@pytest.mark.parametrize("test_dir", gen_params_premounted())
+@pytest.mark.parametrize("test_dir", gen_params_premounted(), indirect=True)
 def test_dbm_consistency_premounted(test_dir: Path) -> None:
     base = test_dir / "dbm-consistency"
     _run_dbm_consistency_checks(base)
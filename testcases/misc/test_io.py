@@ -4,121 +4,32 @@
 
 import pytest
 import datetime
-import shutil
 import typing
 import testhelper
+import time
 import random
 from pathlib import Path
 from .conftest import gen_params, gen_params_premounted
 
 
-class DataPath:
-    """A pair of random data-buffer and path-name to its regular file"""
-
-    def __init__(self, path: Path, size: int) -> None:
-        self.path = path
-        self.size = size
-        self.data = testhelper.generate_random_bytes(size)
-
-    def renew(self) -> None:
-        self.data = testhelper.generate_random_bytes(self.size)
-
-    def write(self) -> None:
-        self.path.write_bytes(self.data)
-
-    def overwrite(self) -> None:
-        self.renew()
-        self.write()
-
-    def read(self) -> bytes:
-        return self.path.read_bytes()
-
-    def mkdirs(self) -> None:
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-
-    def unlink(self) -> None:
-        self.path.unlink()
-
-    def stat_size(self) -> int:
-        return self.path.stat().st_size
-
-    def verify(self) -> None:
-        self.verify_size()
-        self.verify_data()
-
-    def verify_size(self) -> None:
-        st_size = self.stat_size()
-        if st_size != self.size:
-            raise IOError(
-                f"stat size mismatch: {st_size} != {self.size} {self.path}"
-            )
-
-    def verify_data(self) -> None:
-        data = self.read()
-        dlen = len(data)
-        if dlen != self.size:
-            raise IOError(f"data length mismatch: {dlen} != {self.size}")
-        if data != self.data:
-            raise IOError(f"data mismatch at {self.path}")
-
-    def verify_noent(self) -> None:
-        has_stat = False
-        try:
-            self.path.stat()
-            has_stat = True
-        except FileNotFoundError:
-            pass
-        if has_stat:
-            raise IOError(f"still exists: {self.path}")
-
-
-def _make_pathname(base: Path, idx: int) -> Path:
-    return base / str(idx)
-
-
-def _make_datapath(base: Path, idx: int, size: int) -> DataPath:
-    return DataPath(_make_pathname(base, idx), size)
-
-
-def _make_datasets(base: Path, size: int, count: int) -> typing.List[DataPath]:
-    return [_make_datapath(base, idx, size) for idx in range(0, count)]
-
-
-def _run_checks(dsets: typing.List[DataPath]) -> None:
-    for dset in dsets:
-        dset.mkdirs()
-    for dset in dsets:
-        dset.write()
-    for dset in dsets:
-        dset.verify()
-    for dset in dsets:
-        dset.overwrite()
-    for dset in dsets:
-        dset.verify()
-    for dset in dsets:
-        dset.unlink()
-    for dset in dsets:
-        dset.verify_noent()
-
-
-def _check_io_consistency(base: Path) -> None:
+def _check_io_consistency(base: Path) -> float:
+    """Run the I/O consistency cases and return their throughput in MB/s"""
     try:
         print("\n")
         base.mkdir()
-        # Case-1: single 4K file
-        _run_checks(_make_datasets(base, 4096, 1))
-        # Case-2: single 16M file
-        _run_checks(_make_datasets(base, 2**24, 1))
-        # Case-3: few 1M files
-        _run_checks(_make_datasets(base, 2**20, 10))
-        # Case-4: many 1K files
-        _run_checks(_make_datasets(base, 1024, 100))
+        nbytes = 0
+        start = time.monotonic()
+        for size, count in testhelper.io_cases:
+            nbytes += testhelper.run_io_checks(
+                testhelper.make_datasets(base, size, count)
+            )
+        return nbytes / (time.monotonic() - start) / 2**20
     except Exception as ex:
         print("Error while executing test_io_consistency: %s", ex)
         raise
     finally:
         if base:
-            shutil.rmtree(base, ignore_errors=True)
+            testhelper.rmtree_parallel(base)
 
 
 def _reset_random_seed() -> None:
@@ -127,19 +38,26 @@ def _reset_random_seed() -> None:
     random.seed(seed)
 
 
-def _perform_io_consistency_check(directory: Path) -> None:
+def _perform_io_consistency_check(
+    directory: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
     _reset_random_seed()
-    _check_io_consistency(directory)
+    mbps = _check_io_consistency(directory)
+    record_property("io_consistency.mbps", mbps)
 
 
 @pytest.mark.privileged
 @pytest.mark.parametrize("setup_mount", gen_params(), indirect=True)
-def test_check_io_consistency(setup_mount: Path) -> None:
+def test_check_io_consistency(
+    setup_mount: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
     base = setup_mount / "test_io_consistency"
-    _perform_io_consistency_check(base)
+    _perform_io_consistency_check(base, record_property)
 
 
-@pytest.mark.parametrize("test_dir", gen_params_premounted())
-def test_check_io_consistency_premounted(test_dir: Path) -> None:
+@pytest.mark.parametrize("test_dir", gen_params_premounted(), indirect=True)
+def test_check_io_consistency_premounted(
+    test_dir: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
     base = test_dir / "test_io_consistency"
-    _perform_io_consistency_check(base)
+    _perform_io_consistency_check(base, record_property)
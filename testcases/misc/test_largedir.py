@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+# Measure how directory listing and lookups scale with the number of
+# entries in a single directory on the SMB share.
+
+import pytest
+import os
+import time
+import typing
+import testhelper
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from .conftest import gen_params, gen_params_premounted
+
+default_config = {
+    # Directory sizes to measure, in increasing order. Larger sizes, up
+    # to 1000000, are opt-in through the test-info.
+    "sizes": [1000, 10000],
+    # Number of threads populating the directory
+    "workers": 32,
+    # Number of lookups of non-existing entries per size
+    "misses": 1000,
+}
+
+
+def _entry_name(idx: int) -> str:
+    return f"entry-{idx:08d}"
+
+
+def _create_entries(base: Path, start: int, end: int) -> None:
+    for idx in range(start, end):
+        fd = os.open(base / _entry_name(idx), os.O_CREAT | os.O_EXCL, 0o644)
+        os.close(fd)
+
+
+def _populate(base: Path, start: int, end: int, workers: int) -> float:
+    chunk = max(1, min(1000, (end - start) // workers))
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_create_entries, base, i, min(i + chunk, end))
+            for i in range(start, end, chunk)
+        ]
+        for future in futures:
+            future.result()
+    return time.perf_counter() - t0
+
+
+def _time_scandir(base: Path, nentries: int) -> float:
+    t0 = time.perf_counter()
+    with os.scandir(base) as it:
+        count = sum(1 for _ in it)
+    elapsed = time.perf_counter() - t0
+    if count != nentries:
+        raise IOError(f"scandir count mismatch: {count} != {nentries}")
+    return elapsed
+
+
+def _time_stat_all(base: Path, nentries: int) -> float:
+    t0 = time.perf_counter()
+    for idx in range(nentries):
+        os.stat(base / _entry_name(idx))
+    return time.perf_counter() - t0
+
+
+def _time_lookup_miss(
+    base: Path, nentries: int, count: int
+) -> typing.Dict[str, float]:
+    latencies = []
+    for idx in range(nentries, nentries + count):
+        path = base / ("missing-" + _entry_name(idx))
+        t0 = time.perf_counter()
+        try:
+            os.stat(path)
+        except FileNotFoundError:
+            pass
+        else:
+            raise IOError(f"unexpected entry: {path}")
+        latencies.append(time.perf_counter() - t0)
+    return testhelper.summarize_latencies(latencies)
+
+
+def _time_smb_listdir(
+    smbclient: testhelper.SMBClient, smb_path: str, nentries: int
+) -> float:
+    t0 = time.perf_counter()
+    # pysmb needs the whole listing within the timeout
+    names = smbclient.listdir(smb_path, timeout=max(30, nentries // 1000))
+    elapsed = time.perf_counter() - t0
+    count = len([n for n in names if n not in (".", "..")])
+    if count != nentries:
+        raise IOError(f"smb listdir count mismatch: {count} != {nentries}")
+    return elapsed
+
+
+def _run_largedir_scaling(
+    base: Path,
+    record_property: typing.Callable[[str, object], None],
+    smbclient: typing.Optional[testhelper.SMBClient] = None,
+    smb_path: str = "",
+) -> None:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(), "largedir", default_config
+    )
+    headers = ["entries", "create/s", "scandir_s", "stat_all_s"]
+    headers += ["miss_p50_ms", "miss_p99_ms"]
+    if smbclient is not None:
+        headers.append("smb_listdir_s")
+    rows = []
+    base.mkdir(exist_ok=True)
+    try:
+        nentries = 0
+        for size in sorted(config["sizes"]):
+            elapsed = _populate(base, nentries, size, config["workers"])
+            create_rate = (size - nentries) / elapsed
+            nentries = size
+            scandir_s = _time_scandir(base, nentries)
+            stat_all_s = _time_stat_all(base, nentries)
+            miss = _time_lookup_miss(base, nentries, config["misses"])
+            row = [size, create_rate, scandir_s, stat_all_s]
+            row += [miss["p50_ms"], miss["p99_ms"]]
+            record_property(f"largedir.{size}.create_per_sec", create_rate)
+            record_property(f"largedir.{size}.scandir_s", scandir_s)
+            record_property(f"largedir.{size}.stat_all_s", stat_all_s)
+            record_property(f"largedir.{size}.miss_p50_ms", miss["p50_ms"])
+            record_property(f"largedir.{size}.miss_p99_ms", miss["p99_ms"])
+            if smbclient is not None:
+                listdir_s = _time_smb_listdir(smbclient, smb_path, nentries)
+                row.append(listdir_s)
+                record_property(f"largedir.{size}.smb_listdir_s", listdir_s)
+            rows.append(row)
+    finally:
+        print("\n" + testhelper.format_table(headers, rows))
+        testhelper.rmtree_parallel(base)
+
+
+@pytest.mark.privileged
+@pytest.mark.parametrize("setup_mount", gen_params(), indirect=True)
+def test_largedir_scaling(
+    setup_mount: Path,
+    request: pytest.FixtureRequest,
+    record_property: typing.Callable[[str, object], None],
+) -> None:
+    ipaddr, share_name = request.node.callspec.params["setup_mount"]
+    test_info = testhelper.get_test_info()
+    mount_params = testhelper.get_mount_parameters(test_info, share_name)
+    base = setup_mount / "largedir"
+    smbclient = testhelper.SMBClient(
+        ipaddr,
+        mount_params["share"],
+        mount_params["username"],
+        mount_params["password"],
+    )
+    try:
+        smb_path = "/" + base.relative_to(setup_mount.parent).as_posix()
+        _run_largedir_scaling(base, record_property, smbclient, smb_path)
+    finally:
+        smbclient.disconnect()
+
+
+@pytest.mark.parametrize("test_dir", gen_params_premounted(), indirect=True)
+def test_largedir_scaling_premounted(
+    test_dir: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    base = test_dir / "largedir"
+    _run_largedir_scaling(base, record_property)
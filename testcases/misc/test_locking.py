@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+# Measure the cost of byte-range locking under contention. Several
+# processes take fcntl locks on a file on the SMB mount and increment a
+# counter while holding the lock, which proves mutual exclusion: any
+# lock granted twice at the same time loses an increment.
+
+import pytest
+import fcntl
+import itertools
+import os
+import struct
+import time
+import typing
+import testhelper
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from .conftest import gen_params, gen_params_premounted
+
+default_config = {
+    # Numbers of processes contending for the locks
+    "processes": [1, 2, 4, 8],
+    # overlapping: the locked ranges of all processes cover a shared
+    # counter. disjoint: each process locks a range of its own.
+    "modes": ["overlapping", "disjoint"],
+    # Time in milliseconds each lock is held
+    "hold_ms": [0, 1],
+    "region_size": 4096,
+    # Duration in seconds of each combination
+    "duration": 5,
+}
+
+counter = struct.Struct("<Q")
+
+
+def _lock_range(
+    mode: str, idx: int, region_size: int
+) -> typing.Tuple[int, int]:
+    """Return the (start, length) of the range locked by process idx"""
+    if mode == "overlapping":
+        # Ranges of different lengths, all covering the counter at 0
+        return 0, region_size * (idx + 1)
+    assert mode == "disjoint", f"unknown lock mode {mode}"
+    return idx * region_size, region_size
+
+
+def _lock_process(
+    path: str,
+    mode: str,
+    idx: int,
+    region_size: int,
+    hold: float,
+    start_at: float,
+    duration: float,
+) -> typing.Tuple[typing.List[float], float, float]:
+    start, length = _lock_range(mode, idx, region_size)
+    latencies = []
+    fd = os.open(path, os.O_RDWR)
+    try:
+        time.sleep(max(0.0, start_at - time.time()))
+        started = time.time()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            fcntl.lockf(fd, fcntl.LOCK_EX, length, start)
+            latencies.append(time.perf_counter() - t0)
+            try:
+                data = os.pread(fd, counter.size, start)
+                value = counter.unpack(data)[0]
+                if hold:
+                    time.sleep(hold)
+                os.pwrite(fd, counter.pack(value + 1), start)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, length, start)
+        ended = time.time()
+    finally:
+        os.close(fd)
+    # Wall clock times, comparable between the processes
+    return latencies, started, ended
+
+
+def _measure_locking(
+    path: Path, mode: str, nprocs: int, hold_ms: float, config: dict
+) -> typing.Dict[str, typing.Any]:
+    region_size = config["region_size"]
+    with open(path, "wb") as f:
+        f.truncate(region_size * nprocs)
+    # Leave time for the processes to start so that they contend from
+    # the first lock on.
+    start_at = time.time() + 1.0
+    with ProcessPoolExecutor(max_workers=nprocs) as executor:
+        futures = [
+            executor.submit(
+                _lock_process,
+                str(path),
+                mode,
+                idx,
+                region_size,
+                hold_ms / 1000,
+                start_at,
+                config["duration"],
+            )
+            for idx in range(nprocs)
+        ]
+        results = [future.result() for future in futures]
+
+    data = path.read_bytes()
+    counts = [len(lat) for lat, _, _ in results]
+    if mode == "overlapping":
+        expected = {0: sum(counts)}
+    else:
+        expected = {idx * region_size: n for idx, n in enumerate(counts)}
+    for off, count in expected.items():
+        value = counter.unpack_from(data, off)[0]
+        if value != count:
+            raise IOError(
+                f"lock lost updates at {off}: counter {value} != {count}"
+            )
+    latencies = list(itertools.chain(*(lat for lat, _, _ in results)))
+    ret: typing.Dict[str, typing.Any] = dict(
+        testhelper.summarize_latencies(latencies)
+    )
+    # The loops overrun the duration by the last lock held
+    elapsed = max(r[2] for r in results) - min(r[1] for r in results)
+    ret["locks_per_sec"] = sum(counts) / elapsed
+    return ret
+
+
+def _run_locking(
+    base: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(), "locking", default_config
+    )
+    headers = ["mode", "procs", "hold_ms", "locks/s"]
+    headers += ["p50_ms", "p90_ms", "p99_ms", "max_ms"]
+    rows = []
+    base.mkdir(exist_ok=True)
+    try:
+        for mode, hold_ms, nprocs in itertools.product(
+            config["modes"], config["hold_ms"], config["processes"]
+        ):
+            res = _measure_locking(
+                base / "lockfile", mode, nprocs, hold_ms, config
+            )
+            rows.append(
+                [mode, nprocs, hold_ms, res["locks_per_sec"]]
+                + [res["p50_ms"], res["p90_ms"], res["p99_ms"]]
+                + [res["max_ms"]]
+            )
+            name = f"locking.{mode}.p{nprocs}.h{hold_ms}"
+            record_property(f"{name}.locks_per_sec", res["locks_per_sec"])
+            for p in ("p50_ms", "p90_ms", "p99_ms"):
+                record_property(f"{name}.acquire_{p}", res[p])
+    finally:
+        print("\n" + testhelper.format_table(headers, rows))
+        testhelper.rmtree_parallel(base)
+
+
+@pytest.mark.privileged
+@pytest.mark.parametrize("setup_mount", gen_params(), indirect=True)
+def test_lock_contention(
+    setup_mount: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    base = setup_mount / "lock-contention"
+    _run_locking(base, record_property)
+
+
+@pytest.mark.parametrize("test_dir", gen_params_premounted(), indirect=True)
+def test_lock_contention_premounted(
+    test_dir: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    base = test_dir / "lock-contention"
+    _run_locking(base, record_property)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+# Metadata operation microbenchmarks via SMB mount-point. Each phase
+# times a single kind of operation on thousands of empty files, so that
+# the cost of the SMB2 CREATE, SETINFO and QUERY_INFO round-trips behind
+# it is not hidden behind data transfers.
+
+import pytest
+import itertools
+import os
+import time
+import typing
+import testhelper
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from .conftest import gen_params, gen_params_premounted
+
+default_config = {
+    # Number of files operated on by each phase
+    "nfiles": 2000,
+    # Numbers of threads running the operations in parallel
+    "threads": [1, 8],
+}
+
+
+def _create(tdir: Path, idx: int) -> None:
+    fd = os.open(tdir / "a" / f"f{idx}", os.O_CREAT | os.O_EXCL, 0o644)
+    os.close(fd)
+
+
+def _open_close(tdir: Path, idx: int) -> None:
+    os.close(os.open(tdir / "a" / f"f{idx}", os.O_RDONLY))
+
+
+def _stat_hit(tdir: Path, idx: int) -> None:
+    os.stat(tdir / "a" / f"f{idx}")
+
+
+def _stat_miss(tdir: Path, idx: int) -> None:
+    path = tdir / "a" / f"missing{idx}"
+    try:
+        os.stat(path)
+    except FileNotFoundError:
+        return
+    raise IOError(f"unexpected entry: {path}")
+
+
+def _chmod(tdir: Path, idx: int) -> None:
+    os.chmod(tdir / "a" / f"f{idx}", 0o600)
+
+
+def _utime(tdir: Path, idx: int) -> None:
+    os.utime(tdir / "a" / f"f{idx}", (1000000000, 1000000000 + idx))
+
+
+def _rename_same_dir(tdir: Path, idx: int) -> None:
+    os.rename(tdir / "a" / f"f{idx}", tdir / "a" / f"r{idx}")
+
+
+def _rename_cross_dir(tdir: Path, idx: int) -> None:
+    os.rename(tdir / "a" / f"r{idx}", tdir / "b" / f"f{idx}")
+
+
+def _hardlink(tdir: Path, idx: int) -> None:
+    os.link(tdir / "b" / f"f{idx}", tdir / "b" / f"l{idx}")
+
+
+def _unlink(tdir: Path, idx: int) -> None:
+    # Removes the hard link, the file itself is kept by its other name
+    os.unlink(tdir / "b" / f"l{idx}")
+
+
+def _unlink_last(tdir: Path, idx: int) -> None:
+    os.unlink(tdir / "b" / f"f{idx}")
+
+
+# Phases in the order they run, each one depending on the state left
+# behind by the previous ones.
+metadata_ops: typing.List[typing.Tuple[str, typing.Callable]] = [
+    ("create", _create),
+    ("open_close", _open_close),
+    ("stat_hit", _stat_hit),
+    ("stat_miss", _stat_miss),
+    ("chmod", _chmod),
+    ("utime", _utime),
+    ("rename_same_dir", _rename_same_dir),
+    ("rename_cross_dir", _rename_cross_dir),
+    ("hardlink", _hardlink),
+    ("unlink", _unlink),
+    ("unlink_last", _unlink_last),
+]
+
+
+def _run_phase(
+    func: typing.Callable[[Path, int], None],
+    tdirs: typing.List[Path],
+    nfiles: int,
+) -> typing.Dict[str, float]:
+    def _thread(tdir: Path) -> typing.List[float]:
+        latencies = []
+        for idx in range(nfiles):
+            t0 = time.perf_counter()
+            func(tdir, idx)
+            latencies.append(time.perf_counter() - t0)
+        return latencies
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(tdirs)) as executor:
+        results = list(executor.map(_thread, tdirs))
+    elapsed = time.perf_counter() - t0
+    latencies = list(itertools.chain(*results))
+    ret: typing.Dict[str, float] = dict(
+        testhelper.summarize_latencies(latencies)
+    )
+    ret["ops_per_sec"] = len(latencies) / elapsed
+    return ret
+
+
+def _measure_metadata(
+    base: Path, nthreads: int, nfiles: int
+) -> typing.Dict[str, typing.Dict[str, float]]:
+    # Each thread works in directories of its own
+    tdirs = [base / f"t{tid}" for tid in range(nthreads)]
+    for tdir in tdirs:
+        (tdir / "a").mkdir(parents=True)
+        (tdir / "b").mkdir()
+    per_thread = max(1, nfiles // nthreads)
+    return {
+        op: _run_phase(func, tdirs, per_thread) for op, func in metadata_ops
+    }
+
+
+def _run_metadata(
+    base: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(), "metadata", default_config
+    )
+    headers = ["op", "threads", "ops/s", "p50_ms", "p99_ms", "max_ms"]
+    rows = []
+    base.mkdir(exist_ok=True)
+    try:
+        for nthreads in config["threads"]:
+            tbase = base / f"threads-{nthreads}"
+            res = _measure_metadata(tbase, nthreads, config["nfiles"])
+            testhelper.rmtree_parallel(tbase)
+            for op, stats in res.items():
+                rows.append(
+                    [op, nthreads, stats["ops_per_sec"]]
+                    + [stats["p50_ms"], stats["p99_ms"], stats["max_ms"]]
+                )
+                name = f"metadata.{op}.t{nthreads}"
+                record_property(f"{name}.ops_per_sec", stats["ops_per_sec"])
+                record_property(f"{name}.p99_ms", stats["p99_ms"])
+    finally:
+        print("\n" + testhelper.format_table(headers, rows))
+        testhelper.rmtree_parallel(base)
+
+
+@pytest.mark.privileged
+@pytest.mark.parametrize("setup_mount", gen_params(), indirect=True)
+def test_metadata_ops(
+    setup_mount: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    base = setup_mount / "metadata-ops"
+    _run_metadata(base, record_property)
+
+
+@pytest.mark.parametrize("test_dir", gen_params_premounted(), indirect=True)
+def test_metadata_ops_premounted(
+    test_dir: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    base = test_dir / "metadata-ops"
+    _run_metadata(base, record_property)
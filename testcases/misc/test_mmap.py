@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+# Memory-mapped I/O workload via SMB mount-point. Large files are written
+# and read through mmap with sequential, strided or random page-touch
+# patterns and compared with pread/pwrite of the same pages. Every page
+# is verified in place against the seeded generator.
+
+import pytest
+import mmap
+import os
+import random
+import resource
+import struct
+import time
+import typing
+import testhelper
+from pathlib import Path
+from .conftest import gen_params, gen_params_premounted
+
+default_config = {
+    "file_size": 2**28,
+    # Orders in which the pages of the file are touched
+    "patterns": ["sequential", "strided", "random"],
+    # Distance in pages between touched pages of the strided pattern
+    "stride": 16,
+}
+
+# page index, write generation
+page_header = struct.Struct("<QQ")
+
+
+class PageFile:
+    """A file of tagged pages, accessed through mmap or pread/pwrite"""
+
+    def __init__(self, path: Path, file_size: int, seed: int) -> None:
+        self.path = path
+        self.page_size = mmap.PAGESIZE
+        self.npages = file_size // self.page_size
+        self.file_size = self.npages * self.page_size
+        self.seed = seed
+        self.pool = testhelper.generate_seeded_bytes(seed, 2 * self.page_size)
+
+    def page_data(self, idx: int, gen: int) -> bytes:
+        plen = self.page_size - page_header.size
+        off = (idx * 31 + gen * 17) % self.page_size
+        end = off + plen
+        return page_header.pack(idx, gen) + self.pool[off:end]
+
+    def page_order(self, pattern: str, stride: int) -> typing.List[int]:
+        if pattern == "sequential":
+            return list(range(self.npages))
+        if pattern == "strided":
+            return [
+                idx
+                for start in range(stride)
+                for idx in range(start, self.npages, stride)
+            ]
+        assert pattern == "random", f"unknown page-touch pattern {pattern}"
+        order = list(range(self.npages))
+        random.Random(self.seed).shuffle(order)
+        return order
+
+    def verify_page(self, idx: int, gen: int, data: typing.Any) -> None:
+        if data == self.page_data(idx, gen):
+            return
+        if len(data) != self.page_size:
+            raise IOError(f"short page {idx}: {len(data)} in {self.path}")
+        pidx, pgen = page_header.unpack_from(data)
+        raise IOError(
+            f"page {idx} gen {gen} corrupted: page={pidx} gen={pgen} "
+            f"in {self.path}"
+        )
+
+    def drop_cache(self, fd: int) -> None:
+        # Best effort: make the next pass fault its pages in from the
+        # server instead of finding them in the local page cache.
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+    def mmap_write(self, order: typing.List[int], gen: int) -> None:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, self.file_size)
+            with mmap.mmap(fd, self.file_size) as mm:
+                for idx in order:
+                    off = idx * self.page_size
+                    end = off + self.page_size
+                    mm[off:end] = self.page_data(idx, gen)
+                mm.flush()
+            self.drop_cache(fd)
+        finally:
+            os.close(fd)
+
+    def mmap_read(self, order: typing.List[int], gen: int) -> None:
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            with mmap.mmap(fd, self.file_size, prot=mmap.PROT_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for idx in order:
+                        off = idx * self.page_size
+                        end = off + self.page_size
+                        with view[off:end] as page:
+                            self.verify_page(idx, gen, page)
+                finally:
+                    view.release()
+        finally:
+            os.close(fd)
+
+    def pwrite(self, order: typing.List[int], gen: int) -> None:
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            for idx in order:
+                data = self.page_data(idx, gen)
+                ret = os.pwrite(fd, data, idx * self.page_size)
+                if ret != len(data):
+                    raise IOError(f"short write of page {idx}: {ret}")
+            self.drop_cache(fd)
+        finally:
+            os.close(fd)
+
+    def pread(self, order: typing.List[int], gen: int) -> None:
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            for idx in order:
+                data = os.pread(fd, self.page_size, idx * self.page_size)
+                self.verify_page(idx, gen, data)
+        finally:
+            os.close(fd)
+
+
+def _timed(
+    func: typing.Callable[[typing.List[int], int], None],
+    order: typing.List[int],
+    gen: int,
+    nbytes: int,
+) -> typing.Dict[str, float]:
+    ru0 = resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.perf_counter()
+    func(order, gen)
+    elapsed = time.perf_counter() - t0
+    ru1 = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "mbps": nbytes / elapsed / 2**20,
+        "majflt": ru1.ru_majflt - ru0.ru_majflt,
+        "minflt": ru1.ru_minflt - ru0.ru_minflt,
+    }
+
+
+def _run_mmap_pattern(
+    pfile: PageFile, pattern: str, stride: int
+) -> typing.Dict[str, typing.Dict[str, float]]:
+    order = pfile.page_order(pattern, stride)
+    nbytes = pfile.file_size
+    res = {}
+    res["mmap_write"] = _timed(pfile.mmap_write, order, 0, nbytes)
+    res["mmap_read"] = _timed(pfile.mmap_read, order, 0, nbytes)
+    res["pwrite"] = _timed(pfile.pwrite, order, 1, nbytes)
+    res["pread"] = _timed(pfile.pread, order, 1, nbytes)
+    # Pages written with pwrite must not be served stale through mmap
+    pfile.mmap_read(order, 1)
+    return res
+
+
+def _run_mmap(
+    base: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(), "mmap", default_config
+    )
+    phases = ["mmap_write", "mmap_read", "pwrite", "pread"]
+    headers = ["pattern", "phase", "MB/s", "majflt", "minflt"]
+    rows = []
+    base.mkdir(exist_ok=True)
+    try:
+        for pattern in config["patterns"]:
+            pfile = PageFile(
+                base / f"mmap-{pattern}",
+                config["file_size"],
+                random.randrange(2**32),
+            )
+            try:
+                res = _run_mmap_pattern(pfile, pattern, config["stride"])
+            finally:
+                pfile.path.unlink(missing_ok=True)
+            for phase in phases:
+                stats = res[phase]
+                rows.append(
+                    [pattern, phase, stats["mbps"]]
+                    + [stats["majflt"], stats["minflt"]]
+                )
+                name = f"mmap.{pattern}.{phase}"
+                record_property(f"{name}_mbps", stats["mbps"])
+                record_property(f"{name}_majflt", stats["majflt"])
+    finally:
+        print("\n" + testhelper.format_table(headers, rows))
+        testhelper.rmtree_parallel(base)
+
+
+@pytest.mark.privileged
+@pytest.mark.parametrize("setup_mount", gen_params(), indirect=True)
+def test_mmap_io(
+    setup_mount: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    base = setup_mount / "mmap-io"
+    _run_mmap(base, record_property)
+
+
+@pytest.mark.parametrize("test_dir", gen_params_premounted(), indirect=True)
+def test_mmap_io_premounted(
+    test_dir: Path, record_property: typing.Callable[[str, object], None]
+) -> None:
+    base = test_dir / "mmap-io"
+    _run_mmap(base, record_property)
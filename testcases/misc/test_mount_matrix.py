@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+# Re-run the throughput workloads with each of the mount option profiles
+# listed in the test-info and compare the results.
+
+import pytest
+import random
+import time
+import typing
+import testhelper
+from pathlib import Path
+from .conftest import gen_params_exported, mounted_share
+
+default_config: typing.Dict[str, typing.Any] = {
+    # Mount option profiles, e.g. {"loose": "cache=loose,actimeo=30"}
+    "profiles": {},
+    "workloads": ["io", "stress", "randio"],
+    "stress": {"num_clients": 4, "num_operations": 4, "file_size": 2**24},
+    "randio": {
+        "file_size": 2**28,
+        "block_size": 4096,
+        "read_pct": 70,
+        "threads": 8,
+        "duration": 10,
+    },
+}
+
+
+def _get_config() -> dict:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(), "mount_matrix", default_config
+    )
+    for workload in ("stress", "randio"):
+        config[workload] = {
+            **default_config[workload],
+            **(config[workload] or {}),
+        }
+    return config
+
+
+def _measure_io(base: Path) -> typing.Dict[str, float]:
+    ret = {}
+    for size, count in testhelper.io_cases:
+        base.mkdir()
+        try:
+            t0 = time.perf_counter()
+            nbytes = testhelper.run_io_checks(
+                testhelper.make_datasets(base, size, count)
+            )
+            elapsed = time.perf_counter() - t0
+        finally:
+            testhelper.rmtree_parallel(base)
+        ret[f"io_{size}x{count}_mbps"] = nbytes / elapsed / 2**20
+    return ret
+
+
+def _measure_stress(
+    base: Path, params: dict, sampler: testhelper.NullSampler
+) -> typing.Dict[str, float]:
+    base.mkdir()
+    try:
+        t0 = time.perf_counter()
+        testhelper.run_stress_test(base, sampler=sampler, **params)
+        elapsed = time.perf_counter() - t0
+    finally:
+        testhelper.rmtree_parallel(base)
+    # every operation writes and reads back one file
+    nbytes = 2 * params["num_clients"] * params["num_operations"]
+    nbytes *= params["file_size"]
+    return {"stress_mbps": nbytes / elapsed / 2**20}
+
+
+def _measure_randio(
+    base: Path, params: dict, sampler: testhelper.NullSampler
+) -> typing.Dict[str, float]:
+    base.mkdir()
+    seed = random.randrange(2**32)
+    bfile = testhelper.BlockFile(
+        base / "randio", params["file_size"], params["block_size"], seed
+    )
+    bfile.open()
+    try:
+        bfile.fill()
+        res = testhelper.run_random_io(
+            bfile,
+            params["threads"],
+            params["read_pct"],
+            params["duration"],
+            sampler,
+        )
+        bfile.verify()
+    finally:
+        bfile.close()
+        testhelper.rmtree_parallel(base)
+    ret = {"randio_iops": res["iops"], "randio_mbps": res["mbps"]}
+    for op in ("read", "write"):
+        if res[op]["count"]:
+            ret[f"randio_{op}_p50_ms"] = res[op]["p50_ms"]
+            ret[f"randio_{op}_p99_ms"] = res[op]["p99_ms"]
+    return ret
+
+
+def _measure_profile(
+    test_dir: Path, config: dict, sampler: testhelper.NullSampler
+) -> typing.Dict[str, float]:
+    workloads = config["workloads"]
+    ret = {}
+    test_dir.mkdir()
+    try:
+        if "io" in workloads:
+            ret.update(_measure_io(test_dir / "io"))
+        if "stress" in workloads:
+            ret.update(
+                _measure_stress(test_dir / "stress", config["stress"], sampler)
+            )
+        if "randio" in workloads:
+            ret.update(
+                _measure_randio(test_dir / "randio", config["randio"], sampler)
+            )
+    finally:
+        testhelper.rmtree_parallel(test_dir)
+    return ret
+
+
+def gen_matrix_params() -> typing.List[typing.Any]:
+    if not _get_config()["profiles"]:
+        return []
+    return gen_params_exported()
+
+
+@pytest.mark.privileged
+@pytest.mark.parametrize("ipaddr,share_name", gen_matrix_params())
+def test_mount_option_matrix(
+    ipaddr: str,
+    share_name: str,
+    record_property: typing.Callable[[str, object], None],
+    sampler: testhelper.NullSampler,
+) -> None:
+    config = _get_config()
+    dirname = f"mount_matrix-{testhelper.get_worker_namespace()}"
+    results = {}
+    for profile, opts in config["profiles"].items():
+        with mounted_share(ipaddr, share_name, opts or "") as mount_point:
+            results[profile] = _measure_profile(
+                mount_point / dirname, config, sampler
+            )
+        for metric, value in results[profile].items():
+            record_property(f"mount_matrix.{profile}.{metric}", value)
+
+    metrics: typing.List[str] = []
+    for res in results.values():
+        metrics += [m for m in res if m not in metrics]
+    rows = [
+        [profile] + [res.get(m, "-") for m in metrics]
+        for profile, res in results.items()
+    ]
+    print("\n" + testhelper.format_table(["profile"] + metrics, rows))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Measure how SMB3 multichannel scales the throughput of parallel large
+# sequential reads and writes with the number of channels.
+
+import pytest
+import threading
+import time
+import typing
+import warnings
+import testhelper
+from pathlib import Path
+from .conftest import gen_params_exported, mounted_share
+
+default_config = {
+    # Values of max_channels to mount with
+    "max_channels": [1, 2, 4],
+    # Number of files written and read in parallel
+    "streams": 8,
+    "file_size": 2**30,
+    "io_size": 2**22,
+    # Fail rather than warn when fewer channels than asked are established
+    "require_channels": False,
+}
+
+
+def _stream_write(path: Path, file_size: int, chunk: bytes) -> None:
+    with open(path, "wb", buffering=0) as f:
+        written = 0
+        while written < file_size:
+            remaining = file_size - written
+            written += f.write(chunk[:remaining])
+
+
+def _stream_read(path: Path, file_size: int, chunk: bytes) -> None:
+    with open(path, "rb", buffering=0) as f:
+        nread = 0
+        while nread < file_size:
+            data = f.read(len(chunk))
+            dlen = len(data)
+            if not dlen:
+                raise IOError(f"short read of {path}: {nread}")
+            if data != chunk[:dlen]:
+                raise IOError(f"data mismatch in {path} at {nread}")
+            nread += dlen
+
+
+def _run_streams(
+    func: typing.Callable[[Path, int, bytes], None],
+    paths: typing.List[Path],
+    file_size: int,
+    chunk: bytes,
+) -> float:
+    errors: typing.List[Exception] = []
+
+    def _worker(path: Path) -> None:
+        try:
+            func(path, file_size, chunk)
+        except Exception as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=_worker, args=(p,)) for p in paths]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+    if errors:
+        raise errors[0]
+    return len(paths) * file_size / elapsed / 2**20
+
+
+def _channel_count(ipaddr: str, share_name: str) -> typing.Optional[int]:
+    debug_data = testhelper.read_cifs_debug_data()
+    return testhelper.cifs_channel_count(debug_data, ipaddr, share_name)
+
+
+def _measure_channels(
+    ipaddr: str, share_name: str, nchannels: int, config: dict
+) -> typing.Dict[str, typing.Any]:
+    opts = f"multichannel,max_channels={nchannels}"
+    chunk = testhelper.generate_random_bytes(config["io_size"])
+    namespace = testhelper.get_worker_namespace()
+    dirname = f"multichannel-{nchannels}-{namespace}"
+    paths = [Path(dirname) / f"stream-{i}" for i in range(config["streams"])]
+    # Write and read back through separate mounts so that reads are
+    # served by the server and not by the client's page cache.
+    with mounted_share(ipaddr, share_name, opts) as mount_point:
+        (mount_point / dirname).mkdir()
+        write_mbps = _run_streams(
+            _stream_write,
+            [mount_point / p for p in paths],
+            config["file_size"],
+            chunk,
+        )
+        write_channels = _channel_count(ipaddr, share_name)
+    with mounted_share(ipaddr, share_name, opts) as mount_point:
+        try:
+            read_mbps = _run_streams(
+                _stream_read,
+                [mount_point / p for p in paths],
+                config["file_size"],
+                chunk,
+            )
+            read_channels = _channel_count(ipaddr, share_name)
+        finally:
+            testhelper.rmtree_parallel(mount_point / dirname)
+    channels = [c for c in (write_channels, read_channels) if c is not None]
+    return {
+        "established": min(channels) if channels else None,
+        "write_mbps": write_mbps,
+        "read_mbps": read_mbps,
+    }
+
+
+@pytest.mark.privileged
+@pytest.mark.parametrize("ipaddr,share_name", gen_params_exported())
+def test_multichannel_scaling(
+    ipaddr: str,
+    share_name: str,
+    record_property: typing.Callable[[str, object], None],
+) -> None:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(), "multichannel", default_config
+    )
+    headers = ["max_channels", "established", "write_MB/s", "read_MB/s"]
+    rows = []
+    short = []
+    try:
+        for nchannels in config["max_channels"]:
+            res = _measure_channels(ipaddr, share_name, nchannels, config)
+            established = res["established"]
+            rows.append(
+                [nchannels, established or "?"]
+                + [res["write_mbps"], res["read_mbps"]]
+            )
+            name = f"multichannel.{nchannels}"
+            if established is not None:
+                record_property(f"{name}.channels", established)
+            record_property(f"{name}.write_mbps", res["write_mbps"])
+            record_property(f"{name}.read_mbps", res["read_mbps"])
+            if established is None or established < nchannels:
+                count = "unknown" if established is None else established
+                msg = (
+                    f"max_channels={nchannels}: {count} channels "
+                    "established, the results do not measure the scaling"
+                )
+                warnings.warn(msg)
+                short.append(msg)
+    finally:
+        print("\n" + testhelper.format_table(headers, rows))
+    if short and config["require_channels"]:
+        pytest.fail("\n".join(short), pytrace=False)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Random-access pread/pwrite workload on large files via SMB mount-point.
+# Every block carries a header which tags it with its index and write
+# generation, so that any misplaced or stale block is detected on read.
+
+import pytest
+import itertools
+import random
+import typing
+import testhelper
+from pathlib import Path
+from .conftest import gen_params, gen_params_premounted
+
+default_config = {
+    "file_sizes": [2**28],
+    "block_sizes": [4096, 65536],
+    # Percentage of reads, the remainder are writes
+    "read_pcts": [100, 70, 0],
+    # Number of threads issuing I/O, i.e. the queue depth
+    "threads": [1, 8, 32],
+    # Duration in seconds of each combination
+    "duration": 10,
+}
+
+
+def _run_randio(
+    base: Path,
+    record_property: typing.Callable[[str, object], None],
+    sampler: testhelper.NullSampler,
+) -> None:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(), "randio", default_config
+    )
+    headers = ["file_size", "bs", "read%", "threads", "iops", "MB/s"]
+    headers += ["rd_p50_ms", "rd_p99_ms", "wr_p50_ms", "wr_p99_ms"]
+    rows = []
+    base.mkdir(exist_ok=True)
+    try:
+        for file_size, block_size in itertools.product(
+            config["file_sizes"], config["block_sizes"]
+        ):
+            seed = random.randrange(2**32)
+            bfile = testhelper.BlockFile(
+                base / "randio", file_size, block_size, seed
+            )
+            bfile.open()
+            try:
+                bfile.fill()
+                for read_pct, nthreads in itertools.product(
+                    config["read_pcts"], config["threads"]
+                ):
+                    res = testhelper.run_random_io(
+                        bfile, nthreads, read_pct, config["duration"], sampler
+                    )
+                    rd, wr = res["read"], res["write"]
+                    rows.append(
+                        [file_size, block_size, read_pct, nthreads]
+                        + [res["iops"], res["mbps"]]
+                        + [rd["p50_ms"], rd["p99_ms"]]
+                        + [wr["p50_ms"], wr["p99_ms"]]
+                    )
+                    name = (
+                        f"randio.fs{file_size}.bs{block_size}"
+                        f".r{read_pct}.t{nthreads}"
+                    )
+                    record_property(f"{name}.iops", res["iops"])
+                    record_property(f"{name}.mbps", res["mbps"])
+                    for op in ("read", "write"):
+                        if res[op]["count"]:
+                            for p in ("p50_ms", "p90_ms", "p99_ms"):
+                                record_property(f"{name}.{op}_{p}", res[op][p])
+                bfile.verify()
+            finally:
+                bfile.close()
+                bfile.unlink()
+    finally:
+        print("\n" + testhelper.format_table(headers, rows))
+        testhelper.rmtree_parallel(base)
+
+
+@pytest.mark.privileged
+@pytest.mark.parametrize("setup_mount", gen_params(), indirect=True)
+def test_random_io(
+    setup_mount: Path,
+    record_property: typing.Callable[[str, object], None],
+    sampler: testhelper.NullSampler,
+) -> None:
+    base = setup_mount / "random-io"
+    _run_randio(base, record_property, sampler)
+
+
+@pytest.mark.parametrize("test_dir", gen_params_premounted(), indirect=True)
+def test_random_io_premounted(
+    test_dir: Path,
+    record_property: typing.Callable[[str, object], None],
+    sampler: testhelper.NullSampler,
+) -> None:
+    base = test_dir / "random-io"
+    _run_randio(base, record_property, sampler)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Run the declarative workload jobs from YAML job files against the
+# shares listed in the test-info.
+
+import pytest
+import typing
+import testhelper
+from pathlib import Path
+from .conftest import gen_params, gen_params_premounted
+
+script_root = Path(__file__).resolve().parent
+workloads_dir = script_root / "workloads"
+
+default_config = {
+    # Run the job files shipped in testcases/misc/workloads
+    "builtin": True,
+    # Additional job files to run
+    "files": [],
+}
+
+
+def list_workload_files() -> typing.List[Path]:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(), "workloads", default_config
+    )
+    files = []
+    if config["builtin"]:
+        files += sorted(workloads_dir.glob("*.yml"))
+    files += [Path(f) for f in config["files"]]
+    return files
+
+
+def _run_workload_file(
+    base: Path,
+    job_file: Path,
+    record_property: typing.Callable[[str, object], None],
+    sampler: testhelper.NullSampler,
+) -> None:
+    jobs = testhelper.load_workload_jobs(job_file)
+    headers = ["job", "op", "ops/s", "MB/s", "p50_ms", "p99_ms", "max_ms"]
+    rows = []
+    base.mkdir(exist_ok=True)
+    try:
+        for job in jobs:
+            res = testhelper.run_workload_job(job, base, sampler)
+            prefix = f"workload.{job_file.stem}.{job.name}"
+            record_property(f"{prefix}.ops_per_sec", res["ops_per_sec"])
+            record_property(f"{prefix}.mbps", res["mbps"])
+            for op, stats in res["op"].items():
+                rows.append(
+                    [job.name, op, stats["ops_per_sec"], stats["mbps"]]
+                    + [stats["p50_ms"], stats["p99_ms"], stats["max_ms"]]
+                )
+                for metric in ("ops_per_sec", "mbps", "p50_ms", "p99_ms"):
+                    record_property(f"{prefix}.{op}.{metric}", stats[metric])
+            testhelper.rmtree_parallel(base / job.dirname)
+    finally:
+        print("\n" + testhelper.format_table(headers, rows))
+        testhelper.rmtree_parallel(base)
+
+
+def gen_workload_files() -> typing.List[typing.Any]:
+    return [pytest.param(f, id=f.stem) for f in list_workload_files()]
+
+
+@pytest.mark.privileged
+@pytest.mark.parametrize("job_file", gen_workload_files())
+@pytest.mark.parametrize("setup_mount", gen_params(), indirect=True)
+def test_workload(
+    setup_mount: Path,
+    job_file: Path,
+    record_property: typing.Callable[[str, object], None],
+    sampler: testhelper.NullSampler,
+) -> None:
+    base = setup_mount / "workload"
+    _run_workload_file(base, job_file, record_property, sampler)
+
+
+@pytest.mark.parametrize("job_file", gen_workload_files())
+@pytest.mark.parametrize("test_dir", gen_params_premounted(), indirect=True)
+def test_workload_premounted(
+    test_dir: Path,
+    job_file: Path,
+    record_property: typing.Callable[[str, object], None],
+    sampler: testhelper.NullSampler,
+) -> None:
+    base = test_dir / "workload"
+    _run_workload_file(base, job_file, record_property, sampler)
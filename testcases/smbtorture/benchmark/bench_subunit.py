@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+# Measure the throughput of the subunit parser of selftest/subunithelper.py
+#
+# Every corpus is fed to parse_results as test_smbtorture.py runs
+# filter-subunit, with the known failures and flapping tests of selftest/,
+# through FilterOps and SubunitOps writing to memory. The best of several
+# rounds is reported in test results and lines per second, the former
+# comparing the v1 and v2 (.subunit2.gz) corpora of the same tests, and
+# the speedup over the first parser run on them. --reference loads another
+# version of subunithelper.py, e.g. one extracted with
+# git show <rev>:testcases/smbtorture/selftest/subunithelper.py, and
+# reports its throughput on the same corpora for comparison.
+#
+# The samba python modules used by subunithelper.py must be importable.
+
+import argparse
+import contextlib
+import gzip
+import importlib.util
+import io
+import sys
+import time
+import types
+import typing
+import testhelper
+from pathlib import Path
+
+script_root = Path(__file__).resolve().parent
+subunithelper_path = script_root.parent / "selftest" / "subunithelper.py"
+corpus_dir = script_root / "corpus"
+# The lists passed to filter-subunit by test_smbtorture.py
+expected_failure_lists = ["knownfail", "knownfail.d", "expectedfail.d"]
+flapping_lists = ["flapping", "flapping.d"]
+
+
+def load_subunithelper(path: Path, name: str) -> types.ModuleType:
+    spec = importlib.util.spec_from_file_location(name, path)
+    assert spec is not None and spec.loader is not None, f"bad module {path}"
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _text_stream(data: bytes) -> typing.Iterable[str]:
+    # The way filter-subunit reads stdin
+    return io.TextIOWrapper(
+        io.BytesIO(data), errors="ignore", encoding="utf-8"
+    )
+
+
+def parse_rate(
+    module: types.ModuleType, data: bytes, rounds: int, mode: str
+) -> typing.Tuple[float, float]:
+    """Return the best throughput of the parser in results and lines per
+    second, reading the stream as text, bytes or v2 packets.
+    """
+    selftest = subunithelper_path.parent
+    expected_failures = module.read_test_regexes(
+        *[str(selftest / name) for name in expected_failure_lists]
+    )
+    flapping = module.read_test_regexes(
+        *[str(selftest / name) for name in flapping_lists]
+    )
+    best = float("inf")
+    for _ in range(rounds):
+        out = module.SubunitOps(io.StringIO())
+        msg_ops = module.FilterOps(
+            out,
+            "samba3.",
+            "",
+            expected_failures,
+            flapping=flapping,
+        )
+        statistics = dict.fromkeys(
+            [
+                "TESTS_UNEXPECTED_OK",
+                "TESTS_EXPECTED_OK",
+                "TESTS_UNEXPECTED_FAIL",
+                "TESTS_EXPECTED_FAIL",
+                "TESTS_ERROR",
+                "TESTS_SKIP",
+            ],
+            0,
+        )
+        if mode == "v2":
+            parse = module.parse_results_v2
+            fh: typing.Any = io.BufferedReader(io.BytesIO(data))
+        elif mode == "bytes":
+            parse = module.parse_results
+            fh = module.decode_lines(io.BytesIO(data))
+        else:
+            parse = module.parse_results
+            fh = _text_stream(data)
+        # FilterOps writes the output of the tests to stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            parse(msg_ops, statistics, fh)
+            best = min(best, time.perf_counter() - start)
+    return sum(statistics.values()) / best, data.count(b"\n") / best
+
+
+def _main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure the throughput of the subunit parser"
+    )
+    parser.add_argument(
+        "corpora",
+        nargs="*",
+        type=Path,
+        help="gzipped subunit streams, by default the checked-in corpora",
+    )
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--reference",
+        type=Path,
+        default=None,
+        help="another subunithelper.py to compare with",
+    )
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(subunithelper_path.parent))
+    parsers = [("current", load_subunithelper(subunithelper_path, "current"))]
+    if args.reference:
+        reference = load_subunithelper(args.reference, "reference")
+        parsers.insert(0, ("reference", reference))
+
+    rows = []
+    ref_rates: typing.Dict[str, float] = {}
+    for path in args.corpora or sorted(corpus_dir.glob("*.subunit*.gz")):
+        with gzip.open(path, "rb") as f:
+            data = f.read()
+        # v1 and v2 corpora of the same tests are compared with each other
+        corpus = path.name.split(".")[0]
+        v2 = data[:1] == b"\xb3"
+        for name, module in parsers:
+            if v2:
+                modes = ["v2"] if hasattr(module, "parse_results_v2") else []
+            elif hasattr(module, "decode_lines"):
+                modes = ["text", "bytes"]
+            else:
+                modes = ["text"]
+            for mode in modes:
+                results, lines = parse_rate(module, data, args.rounds, mode)
+                ref = ref_rates.setdefault(corpus, results)
+                rows.append(
+                    [path.name, name, mode, results, "-" if v2 else lines]
+                    + [results / ref]
+                )
+    headers = ["corpus", "parser", "input", "results/s", "lines/s"]
+    print(testhelper.format_table(headers + ["speedup"], rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
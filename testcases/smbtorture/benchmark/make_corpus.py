@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+# Generate the subunit corpora used by bench_subunit.py.
+#
+# The streams mimic the output of smbtorture --format=subunit for
+# suites such as smb2.lock and smb2.oplock: a time: line around every
+# result, debug output between the test and its result and failures,
+# skips and known failures with multi-line reasons. The generator is
+# seeded so the corpora are reproducible. Each corpus is also written as
+# a subunit v2 packet stream carrying the same tests, results, reasons,
+# output and timestamps; the testsuite: and progress: lines, which are
+# Samba extensions of v1, have no v2 equivalent and are left out.
+
+import argparse
+import datetime
+import gzip
+import random
+import re
+import sys
+import typing
+import zlib
+from pathlib import Path
+
+corpus_dir = Path(__file__).resolve().parent / "corpus"
+
+# name: (suites, subtests per suite, debug lines per subtest)
+corpora = {
+    "smb2-quick": (["smb2.lock", "smb2.oplock", "smb2.getinfo"], 60, 2),
+    "smb2-verbose": (["smb2.durable-open", "smb2.lease"], 80, 12),
+}
+
+_debug_lines = [
+    "Testing lock/unlock of range {offset}+{length}\n",
+    "create complete oplock level 0x{level:x}\n",
+    "oplock break 0x{level:x} received on fnum 0x{fnum:x}\n",
+    "SMB2 write of {length} bytes at offset {offset} succeeded\n",
+    "Setting file information level {level} on fnum 0x{fnum:x}\n",
+]
+_failure_reasons = [
+    "../../source4/torture/smb2/{suite}.c:{line}: status was "
+    "NT_STATUS_ACCESS_DENIED, expected NT_STATUS_OK: Incorrect status\n",
+    "../../source4/torture/smb2/{suite}.c:{line}: break_info.count was "
+    "0, expected 1: incorrect value\n",
+]
+
+
+def _timestamp(t: datetime.datetime) -> str:
+    return "time: " + t.strftime("%Y-%m-%d %H:%M:%S.%fZ") + "\n"
+
+
+def generate(
+    name: str,
+    suites: typing.List[str],
+    subtests: int,
+    debug: int,
+) -> typing.Iterator[str]:
+    """Yield the lines of a synthetic smbtorture subunit stream"""
+    rnd = random.Random(name)
+    t = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    for suite in suites:
+        yield "progress: push\n"
+        yield _timestamp(t)
+        yield f"testsuite: {suite}\n"
+        yield f"progress: {subtests}\n"
+        for i in range(subtests):
+            test = f"{suite}.case{i:03d}"
+            t += datetime.timedelta(microseconds=rnd.randrange(1, 10**6))
+            yield _timestamp(t)
+            yield f"test: {test}\n"
+            for _ in range(rnd.randrange(debug + 1)):
+                yield rnd.choice(_debug_lines).format(
+                    offset=rnd.randrange(1 << 20),
+                    length=rnd.randrange(1, 1 << 16),
+                    level=rnd.randrange(1, 9),
+                    fnum=rnd.randrange(1 << 16),
+                )
+            t += datetime.timedelta(microseconds=rnd.randrange(1, 10**6))
+            yield _timestamp(t)
+            outcome = rnd.random()
+            short = suite.rpartition(".")[2]
+            if outcome < 0.85:
+                yield f"success: {test}\n"
+            elif outcome < 0.92:
+                yield f"skip: {test} [\n"
+                yield "Server does not support this feature\n"
+                yield "]\n"
+            else:
+                result = "failure" if outcome < 0.97 else "knownfail"
+                yield f"{result}: {test} [\n"
+                for _ in range(rnd.randrange(1, 4)):
+                    yield rnd.choice(_failure_reasons).format(
+                        suite=short, line=rnd.randrange(100, 5000)
+                    )
+                yield "]\n"
+        t += datetime.timedelta(milliseconds=rnd.randrange(1, 1000))
+        yield _timestamp(t)
+        yield f"testsuite-success: {suite}\n"
+        yield "progress: pop\n"
+
+
+_v1_time_re = re.compile(r"time: (.*)Z\n")
+_v1_test_re = re.compile(r"test: (.*)\n")
+_v1_result_re = re.compile(r"(success|skip|failure|knownfail): (.*?)( \[)?\n")
+# v2 status of the v1 results
+_v2_status = {"success": 3, "skip": 5, "failure": 6, "knownfail": 7}
+
+
+def _v2_number(value: int) -> bytes:
+    for size, limit in enumerate((1 << 6, 1 << 14, 1 << 22, 1 << 30)):
+        if value < limit:
+            return ((size << (6 + 8 * size)) | value).to_bytes(size + 1, "big")
+    raise ValueError(f"{value} too large for subunit v2")
+
+
+def _v2_string(value: str) -> bytes:
+    data = value.encode()
+    return _v2_number(len(data)) + data
+
+
+def v2_packet(
+    status: int = 0,
+    test_id: typing.Optional[str] = None,
+    timestamp: typing.Optional[datetime.datetime] = None,
+    file_name: typing.Optional[str] = None,
+    file_bytes: bytes = b"",
+) -> bytes:
+    """Encode a subunit v2 packet"""
+    flags = 0x2000 | status
+    body = b""
+    if timestamp is not None:
+        flags |= 0x0200
+        body += int(timestamp.timestamp()).to_bytes(4, "big")
+        body += _v2_number(timestamp.microsecond * 1000)
+    if test_id is not None:
+        flags |= 0x0800
+        body += _v2_string(test_id)
+    if file_name is not None:
+        flags |= 0x0040
+        body += _v2_string(file_name)
+        body += _v2_number(len(file_bytes)) + file_bytes
+    # The length covers the signature, flags, length, fields and CRC
+    for size in range(1, 5):
+        length = 7 + size + len(body)
+        if len(_v2_number(length)) == size:
+            break
+    packet = b"\xb3" + flags.to_bytes(2, "big") + _v2_number(length) + body
+    return packet + zlib.crc32(packet).to_bytes(4, "big")
+
+
+def to_v2(lines: typing.Iterable[str]) -> typing.Iterator[bytes]:
+    """Convert the v1 stream written by generate to v2 packets"""
+    timestamp = None
+    test = None
+    lines = iter(lines)
+    for line in lines:
+        m = _v1_time_re.fullmatch(line)
+        if m:
+            timestamp = datetime.datetime.fromisoformat(m.group(1))
+            timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+            continue
+        m = _v1_test_re.fullmatch(line)
+        if m:
+            test = m.group(1)
+            yield v2_packet(2, test, timestamp)
+            timestamp = None
+            continue
+        m = _v1_result_re.fullmatch(line)
+        if m:
+            result, name = m.group(1), m.group(2)
+            if m.group(3):
+                reason = "".join(iter(lines.__next__, "]\n"))
+                file_name = "reason" if result == "skip" else "traceback"
+                yield v2_packet(0, name, None, file_name, reason.encode())
+            yield v2_packet(_v2_status[result], name, timestamp)
+            timestamp = test = None
+            continue
+        if line.startswith(("testsuite", "progress: ")):
+            continue
+        # Output of the running test
+        yield v2_packet(0, test, None, "stdout", line.encode())
+
+
+def _write(path: Path, data: bytes) -> None:
+    # mtime=0 keeps the files identical from one generation to the next
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+            f.write(data)
+    print(path)
+
+
+def _main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Generate the subunit corpora of the parser benchmark"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="number of times the suites of each corpus are repeated",
+    )
+    parser.add_argument("--output", type=Path, default=corpus_dir)
+    args = parser.parse_args()
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    for name, (suites, subtests, debug) in corpora.items():
+        lines = list(generate(name, suites * args.repeat, subtests, debug))
+        _write(args.output / f"{name}.subunit.gz", "".join(lines).encode())
+        _write(args.output / f"{name}.subunit2.gz", b"".join(to_v2(lines)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
@@ -15,12 +15,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-__all__ = ['parse_results']
+__all__ = ['parse_results', 'parse_results_v2', 'parse_stream']
 
 import datetime
+import io
 import re
 import sys
 import os
+import zlib
 from samba import subunit
 from samba.subunit.run import TestProtocolClient
 import unittest
@@ -46,55 +48,204 @@ class TestsuiteEnabledTestResult(unittest.TestResult):
         raise NotImplementedError(self.start_testsuite)
 
 
+# Control lines: a command, optionally followed by colons, whitespace and
+# an argument starting with a non-whitespace character. Everything else
+# is test output. Longer commands come first as some are prefixes of
+# others.
+_COMMANDS = sorted(VALID_RESULTS | set(['test', 'testing', 'time',
+                                        'testsuite', 'progress']),
+                   key=len, reverse=True)
+_CONTROL_RE = re.compile(r"(%s):*\s+(?=\S)" % "|".join(
+    re.escape(c) for c in _COMMANDS))
+_RESULT_ARG_RE = re.compile(r"(.*?)( \[)?([ \t]*)( multipart)?\n")
+# The timestamps written by smbtorture, e.g. 2024-01-11 12:34:56.123456Z
+_TIME_RE = re.compile(
+    r"(\d{4})-(\d\d)-(\d\d)[ T](\d\d):(\d\d):(\d\d)(?:\.(\d{1,6})\d*)?Z")
+_UTC = datetime.timezone.utc
+_NO_REASON = "No reason specified"
+
+
+def parse_time(text):
+    """Parse the timestamp of a time: line.
+
+    The fixed format used by smbtorture is parsed directly, anything else
+    is handed to the ISO 8601 parser.
+    """
+    m = _TIME_RE.fullmatch(text)
+    if m is None:
+        return iso_parse_date(text)
+    year, month, day, hour, minute, second, fraction = m.groups()
+    usec = int(fraction.ljust(6, "0")) if fraction else 0
+    return datetime.datetime(int(year), int(month), int(day), int(hour),
+                             int(minute), int(second), usec, _UTC)
+
+
+def decode_lines(fh):
+    """Decode the lines of a binary stream, ignoring invalid UTF-8.
+
+    Feeds parse_results from a binary stream, e.g. stdin.buffer, without
+    a TextIOWrapper. Unlike the latter, line endings are not translated.
+    """
+    for l in fh:
+        yield l.decode("utf-8", "ignore")
+
+
+def start_test(msg_ops, open_tests, name):
+    test = subunit.RemotedTestCase(name)
+    if name in open_tests:
+        msg_ops.addError(open_tests.pop(name), subunit.RemoteError(u"Test already running"))
+    msg_ops.startTest(test)
+    open_tests[name] = test
+
+
+def report_result(msg_ops, statistics, open_tests, result, testname, reason):
+    """Report the result of a test to msg_ops and count it.
+
+    Shared by the parsers of both protocol versions. open_tests maps the
+    names of the tests started and not finished yet to their test case.
+
+    Returns 1 if the result makes the run fail, 0 otherwise.
+    """
+    exitcode = 0
+    if reason is None:
+        remote_error_msg = _NO_REASON
+    else:
+        remote_error_msg = reason
+    if result in ("success", "successful"):
+        try:
+            test = open_tests.pop(testname)
+        except KeyError:
+            statistics['TESTS_ERROR'] += 1
+            exitcode = 1
+            msg_ops.addError(subunit.RemotedTestCase(testname), subunit.RemoteError(u"Test was never started"))
+        else:
+            statistics['TESTS_EXPECTED_OK'] += 1
+            msg_ops.addSuccess(test)
+    elif result in ("xfail", "knownfail"):
+        try:
+            test = open_tests.pop(testname)
+        except KeyError:
+            statistics['TESTS_ERROR'] += 1
+            exitcode = 1
+            msg_ops.addError(subunit.RemotedTestCase(testname), subunit.RemoteError(u"Test was never started"))
+        else:
+            statistics['TESTS_EXPECTED_FAIL'] += 1
+            msg_ops.addExpectedFailure(test, subunit.RemoteError(remote_error_msg))
+    elif result in ("uxsuccess", ):
+        try:
+            test = open_tests.pop(testname)
+        except KeyError:
+            statistics['TESTS_ERROR'] += 1
+            exitcode = 1
+            msg_ops.addError(subunit.RemotedTestCase(testname), subunit.RemoteError(u"Test was never started"))
+        else:
+            statistics['TESTS_UNEXPECTED_OK'] += 1
+            msg_ops.addUnexpectedSuccess(test)
+            exitcode = 1
+    elif result in ("failure", "fail"):
+        try:
+            test = open_tests.pop(testname)
+        except KeyError:
+            statistics['TESTS_ERROR'] += 1
+            exitcode = 1
+            msg_ops.addError(subunit.RemotedTestCase(testname), subunit.RemoteError(u"Test was never started"))
+        else:
+            statistics['TESTS_UNEXPECTED_FAIL'] += 1
+            exitcode = 1
+            msg_ops.addFailure(test, subunit.RemoteError(remote_error_msg))
+    elif result == "skip":
+        statistics['TESTS_SKIP'] += 1
+        # Allow tests to be skipped without prior announcement of test
+        try:
+            test = open_tests.pop(testname)
+        except KeyError:
+            test = subunit.RemotedTestCase(testname)
+        msg_ops.addSkip(test, reason)
+    elif result == "error":
+        statistics['TESTS_ERROR'] += 1
+        exitcode = 1
+        try:
+            test = open_tests.pop(testname)
+        except KeyError:
+            test = subunit.RemotedTestCase(testname)
+        msg_ops.addError(test, subunit.RemoteError(remote_error_msg))
+    elif result == "skip-testsuite":
+        msg_ops.skip_testsuite(testname)
+    elif result == "testsuite-success":
+        msg_ops.end_testsuite(testname, "success", reason)
+    elif result == "testsuite-failure":
+        msg_ops.end_testsuite(testname, "failure", reason)
+        exitcode = 1
+    elif result == "testsuite-xfail":
+        msg_ops.end_testsuite(testname, "xfail", reason)
+    elif result == "testsuite-uxsuccess":
+        msg_ops.end_testsuite(testname, "uxsuccess", reason)
+        exitcode = 1
+    elif result == "testsuite-error":
+        msg_ops.end_testsuite(testname, "error", reason)
+        exitcode = 1
+    else:
+        raise AssertionError("Recognized but unhandled result %r" %
+                             result)
+    return exitcode
+
+
+def end_open_tests(msg_ops, statistics, open_tests):
+    """Report the tests started but never finished as errors"""
+    exitcode = 0
+    while open_tests:
+        test = subunit.RemotedTestCase(open_tests.popitem()[1])
+        msg_ops.addError(test, subunit.RemoteError(u"was started but never finished!"))
+        statistics['TESTS_ERROR'] += 1
+        exitcode = 1
+    return exitcode
+
+
 def parse_results(msg_ops, statistics, fh):
     exitcode = 0
     open_tests = {}
-
-    for l in fh:
-        parts = l.split(None, 1)
-        if not len(parts) == 2 or not l.startswith(parts[0]):
-            msg_ops.output_msg(l)
+    # Looked up once instead of for every line
+    match_control = _CONTROL_RE.match
+    match_result_arg = _RESULT_ARG_RE.match
+    output_msg = msg_ops.output_msg
+    control_msg = msg_ops.control_msg
+    lines = iter(fh)
+
+    for l in lines:
+        m = match_control(l)
+        if m is None:
+            output_msg(l)
             continue
-        command = parts[0].rstrip(":")
-        arg = parts[1]
-        if command in ("test", "testing"):
-            msg_ops.control_msg(l)
-            name = arg.rstrip()
-            test = subunit.RemotedTestCase(name)
-            if name in open_tests:
-                msg_ops.addError(open_tests.pop(name), subunit.RemoteError(u"Test already running"))
-            msg_ops.startTest(test)
-            open_tests[name] = test
-        elif command == "time":
-            msg_ops.control_msg(l)
+        command = m.group(1)
+        arg = l[m.end():]
+        if command == "time":
+            control_msg(l)
             try:
-                dt = iso_parse_date(arg.rstrip("\n"))
+                dt = parse_time(arg.rstrip("\n"))
             except TypeError:
                 print("Unable to parse time line: %s" % arg.rstrip("\n"))
             else:
                 msg_ops.time(dt)
+        elif command in ("test", "testing"):
+            control_msg(l)
+            start_test(msg_ops, open_tests, arg.rstrip())
         elif command in VALID_RESULTS:
-            msg_ops.control_msg(l)
+            control_msg(l)
             result = command
-            grp = re.match(r"(.*?)( \[)?([ \t]*)( multipart)?\n", arg)
+            grp = match_result_arg(arg)
             (testname, hasreason) = (grp.group(1), grp.group(2))
             if hasreason:
                 reason = ""
                 # reason may be specified in next lines
                 terminated = False
-                for l in fh:
-                    msg_ops.control_msg(l)
+                for l in lines:
+                    control_msg(l)
                     if l == "]\n":
                         terminated = True
                         break
                     else:
                         reason += l
 
-                if isinstance(reason, bytes):
-                    remote_error = subunit.RemoteError(reason.decode("utf-8"))
-                else:
-                    remote_error = subunit.RemoteError(reason)
-
                 if not terminated:
                     statistics['TESTS_ERROR'] += 1
                     msg_ops.addError(subunit.RemotedTestCase(testname),
@@ -102,83 +253,9 @@ def parse_results(msg_ops, statistics, fh):
                     return 1
             else:
                 reason = None
-                remote_error = subunit.RemoteError(u"No reason specified")
-            if result in ("success", "successful"):
-                try:
-                    test = open_tests.pop(testname)
-                except KeyError:
-                    statistics['TESTS_ERROR'] += 1
-                    exitcode = 1
-                    msg_ops.addError(subunit.RemotedTestCase(testname), subunit.RemoteError(u"Test was never started"))
-                else:
-                    statistics['TESTS_EXPECTED_OK'] += 1
-                    msg_ops.addSuccess(test)
-            elif result in ("xfail", "knownfail"):
-                try:
-                    test = open_tests.pop(testname)
-                except KeyError:
-                    statistics['TESTS_ERROR'] += 1
-                    exitcode = 1
-                    msg_ops.addError(subunit.RemotedTestCase(testname), subunit.RemoteError(u"Test was never started"))
-                else:
-                    statistics['TESTS_EXPECTED_FAIL'] += 1
-                    msg_ops.addExpectedFailure(test, remote_error)
-            elif result in ("uxsuccess", ):
-                try:
-                    test = open_tests.pop(testname)
-                except KeyError:
-                    statistics['TESTS_ERROR'] += 1
-                    exitcode = 1
-                    msg_ops.addError(subunit.RemotedTestCase(testname), subunit.RemoteError(u"Test was never started"))
-                else:
-                    statistics['TESTS_UNEXPECTED_OK'] += 1
-                    msg_ops.addUnexpectedSuccess(test)
-                    exitcode = 1
-            elif result in ("failure", "fail"):
-                try:
-                    test = open_tests.pop(testname)
-                except KeyError:
-                    statistics['TESTS_ERROR'] += 1
-                    exitcode = 1
-                    msg_ops.addError(subunit.RemotedTestCase(testname), subunit.RemoteError(u"Test was never started"))
-                else:
-                    statistics['TESTS_UNEXPECTED_FAIL'] += 1
-                    exitcode = 1
-                    msg_ops.addFailure(test, remote_error)
-            elif result == "skip":
-                statistics['TESTS_SKIP'] += 1
-                # Allow tests to be skipped without prior announcement of test
-                try:
-                    test = open_tests.pop(testname)
-                except KeyError:
-                    test = subunit.RemotedTestCase(testname)
-                msg_ops.addSkip(test, reason)
-            elif result == "error":
-                statistics['TESTS_ERROR'] += 1
+            if report_result(msg_ops, statistics, open_tests, result,
+                             testname, reason):
                 exitcode = 1
-                try:
-                    test = open_tests.pop(testname)
-                except KeyError:
-                    test = subunit.RemotedTestCase(testname)
-                msg_ops.addError(test, remote_error)
-            elif result == "skip-testsuite":
-                msg_ops.skip_testsuite(testname)
-            elif result == "testsuite-success":
-                msg_ops.end_testsuite(testname, "success", reason)
-            elif result == "testsuite-failure":
-                msg_ops.end_testsuite(testname, "failure", reason)
-                exitcode = 1
-            elif result == "testsuite-xfail":
-                msg_ops.end_testsuite(testname, "xfail", reason)
-            elif result == "testsuite-uxsuccess":
-                msg_ops.end_testsuite(testname, "uxsuccess", reason)
-                exitcode = 1
-            elif result == "testsuite-error":
-                msg_ops.end_testsuite(testname, "error", reason)
-                exitcode = 1
-            else:
-                raise AssertionError("Recognized but unhandled result %r" %
-                                     result)
         elif command == "testsuite":
             msg_ops.start_testsuite(arg.strip())
         elif command == "progress":
@@ -191,18 +268,187 @@ def parse_results(msg_ops, statistics, fh):
                 msg_ops.progress(int(arg), subunit.PROGRESS_CUR)
             else:
                 msg_ops.progress(int(arg), subunit.PROGRESS_SET)
-        else:
-            msg_ops.output_msg(l)
 
-    while open_tests:
-        test = subunit.RemotedTestCase(open_tests.popitem()[1])
-        msg_ops.addError(test, subunit.RemoteError(u"was started but never finished!"))
-        statistics['TESTS_ERROR'] += 1
+    if end_open_tests(msg_ops, statistics, open_tests):
+        exitcode = 1
+
+    return exitcode
+
+
+# Subunit v2: packets starting with a signature byte, followed by 16 bits
+# of flags (version, optional fields present and test status), the
+# length of the whole packet, the optional fields and a CRC32.
+SUBUNIT_V2_SIGNATURE = 0xB3
+_V2_VERSION = 0x2
+_V2_FLAG_TEST_ID = 0x0800
+_V2_FLAG_ROUTE_CODE = 0x0400
+_V2_FLAG_TIMESTAMP = 0x0200
+_V2_FLAG_TAGS = 0x0080
+_V2_FLAG_FILE_CONTENT = 0x0040
+_V2_FLAG_MIME_TYPE = 0x0020
+_V2_STATUS_MASK = 0x0007
+_V2_STATUS_INPROGRESS = 2
+_V2_SIGNATURE_CRC = zlib.crc32(bytes([SUBUNIT_V2_SIGNATURE]))
+# v1 results of the final statuses
+_V2_RESULTS = {3: "success", 4: "uxsuccess", 5: "skip", 6: "failure",
+               7: "xfail"}
+# Attachments holding the reason of a result, the others are output
+_V2_REASON_FILES = ("reason", "traceback")
+
+
+class SubunitV2Error(Exception):
+    """Raised on a packet that cannot be parsed."""
+
+
+def _v2_number(data, pos):
+    """Decode a number at pos, returning it and the position after it.
+
+    The two high bits of the first byte give the number of bytes that
+    follow it, the value is the remaining bits in big endian order.
+    """
+    first = data[pos]
+    size = first >> 6
+    value = first & 0x3f
+    for i in range(pos + 1, pos + 1 + size):
+        value = (value << 8) | data[i]
+    return value, pos + 1 + size
+
+
+def _v2_string(data, pos):
+    length, pos = _v2_number(data, pos)
+    end = pos + length
+    return data[pos:end].decode("utf-8", "ignore"), end
+
+
+def read_v2_packet(fh):
+    """Read and decode the packet following a signature byte.
+
+    Returns the status, timestamp (datetime or None), test id, tags,
+    file name and file content of the packet, None for absent fields.
+    """
+    header = fh.read(5)
+    if len(header) < 5:
+        raise SubunitV2Error("truncated packet header")
+    flags = (header[0] << 8) | header[1]
+    if flags >> 12 != _V2_VERSION:
+        raise SubunitV2Error("unsupported version %d" % (flags >> 12))
+    if header[2] >> 6 == 3:
+        # Packets are limited to 4 MiB, i.e. 3 bytes of length
+        raise SubunitV2Error("packet too long")
+    length, pos = _v2_number(header, 2)
+    if length < 8:
+        raise SubunitV2Error("bad packet length %d" % length)
+    rest = fh.read(length - 6)
+    if len(rest) != length - 6:
+        raise SubunitV2Error("truncated packet of %d bytes" % length)
+    # Without the signature, covered by _V2_SIGNATURE_CRC
+    packet = header + rest
+    end = length - 5
+    if zlib.crc32(packet[:end], _V2_SIGNATURE_CRC) != \
+            int.from_bytes(packet[end:], "big"):
+        raise SubunitV2Error("bad CRC32")
+    timestamp = test_id = tags = file_name = file_bytes = None
+    try:
+        if flags & _V2_FLAG_TIMESTAMP:
+            seconds = int.from_bytes(packet[pos:pos + 4], "big")
+            nanoseconds, pos = _v2_number(packet, pos + 4)
+            timestamp = datetime.datetime.fromtimestamp(
+                seconds, _UTC).replace(microsecond=nanoseconds // 1000)
+        if flags & _V2_FLAG_TEST_ID:
+            test_id, pos = _v2_string(packet, pos)
+        if flags & _V2_FLAG_TAGS:
+            count, pos = _v2_number(packet, pos)
+            tags = []
+            for _ in range(count):
+                tag, pos = _v2_string(packet, pos)
+                tags.append(tag)
+        if flags & _V2_FLAG_MIME_TYPE:
+            _, pos = _v2_string(packet, pos)
+        if flags & _V2_FLAG_FILE_CONTENT:
+            file_name, pos = _v2_string(packet, pos)
+            size, pos = _v2_number(packet, pos)
+            file_bytes = packet[pos:pos + size]
+            pos += size
+        if flags & _V2_FLAG_ROUTE_CODE:
+            _, pos = _v2_string(packet, pos)
+    except (IndexError, ValueError) as e:
+        raise SubunitV2Error("malformed packet: %s" % e)
+    if pos > end:
+        raise SubunitV2Error("fields overrun the packet")
+    return (flags & _V2_STATUS_MASK, timestamp, test_id, tags, file_name,
+            file_bytes)
+
+
+def parse_results_v2(msg_ops, statistics, fh):
+    """Parse a subunit v2 stream read from a binary file.
+
+    The events are reported to msg_ops as for the v1 protocol. Files
+    named reason or traceback attached to a test are the reason of its
+    result, other attachments are output, as are the bytes found between
+    packets up to the end of their line.
+    """
+    exitcode = 0
+    open_tests = {}
+    reasons = {}
+    output_msg = msg_ops.output_msg
+
+    while True:
+        signature = fh.read(1)
+        if not signature:
+            break
+        if signature[0] != SUBUNIT_V2_SIGNATURE:
+            line = signature + fh.readline()
+            output_msg(line.decode("utf-8", "ignore"))
+            continue
+        try:
+            packet = read_v2_packet(fh)
+        except SubunitV2Error as e:
+            statistics['TESTS_ERROR'] += 1
+            msg_ops.addError(subunit.RemotedTestCase("subunit.parser"),
+                             subunit.RemoteError(u"subunit v2: %s" % e))
+            return 1
+        status, timestamp, test_id, _, file_name, file_bytes = packet
+        if timestamp is not None:
+            msg_ops.time(timestamp)
+        if file_bytes is not None:
+            text = file_bytes.decode("utf-8", "ignore")
+            if test_id is not None and file_name in _V2_REASON_FILES:
+                reasons.setdefault(test_id, []).append(text)
+            elif text:
+                output_msg(text)
+        if test_id is None:
+            continue
+        if status == _V2_STATUS_INPROGRESS:
+            start_test(msg_ops, open_tests, test_id)
+        elif status in _V2_RESULTS:
+            reason = reasons.pop(test_id, None)
+            if reason is not None:
+                reason = "".join(reason)
+            if report_result(msg_ops, statistics, open_tests,
+                             _V2_RESULTS[status], test_id, reason):
+                exitcode = 1
+
+    if end_open_tests(msg_ops, statistics, open_tests):
         exitcode = 1
 
     return exitcode
 
 
+def parse_stream(msg_ops, statistics, fh):
+    """Parse a subunit v1 or v2 stream read from a binary file.
+
+    A stream starting with the v2 signature byte is parsed as v2,
+    anything else as v1 text, ignoring invalid UTF-8.
+    """
+    if not hasattr(fh, "peek"):
+        fh = io.BufferedReader(fh)
+    first = fh.peek(1)[:1]
+    if first and first[0] == SUBUNIT_V2_SIGNATURE:
+        return parse_results_v2(msg_ops, statistics, fh)
+    text = io.TextIOWrapper(fh, errors='ignore', encoding='utf-8')
+    return parse_results(msg_ops, statistics, text)
+
+
 class SubunitOps(TestProtocolClient, TestsuiteEnabledTestResult):
 
     def progress(self, count, whence):
@@ -263,6 +509,29 @@ def read_test_regexes(*names):
     return ret
 
 
+# Constructs whose meaning depends on the group numbers of the pattern
+_GROUP_REFERENCE_RE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+
+def combine_regexes(regexes):
+    """Merge a list of regexes into as few patterns as possible.
+
+    find_in_list on the returned list gives the same answers as on the
+    original one, with a single match per test name instead of one per
+    regex. Patterns referring to groups by number are kept apart.
+    """
+    simple = [r for r in regexes if not _GROUP_REFERENCE_RE.search(r.pattern)]
+    other = [r for r in regexes if _GROUP_REFERENCE_RE.search(r.pattern)]
+    if len(simple) < 2:
+        return list(regexes)
+    try:
+        combined = re.compile("|".join("(?:%s)" % r.pattern for r in simple))
+    except re.error:
+        # e.g. inline flags or duplicate group names
+        return list(regexes)
+    return [combined] + other
+
+
 def find_in_list(regexes, fullname):
     for regex in regexes:
         if regex.match(fullname):
@@ -434,11 +703,11 @@ class FilterOps(unittest.TestResult):
         self.prefix = prefix
         self.suffix = suffix
         if expected_failures is not None:
-            self.expected_failures = expected_failures
+            self.expected_failures = combine_regexes(expected_failures)
         else:
             self.expected_failures = []
         if flapping is not None:
-            self.flapping = flapping
+            self.flapping = combine_regexes(flapping)
         else:
             self.flapping = []
         self.strip_ok_output = strip_ok_output
@@ -3,7 +3,12 @@
 # Run smbtorture tests
 
 import testhelper
+import contextlib
+import json
 import os
+import re
+import selectors
+import time
 import yaml
 import pytest
 import typing
@@ -15,13 +20,183 @@ smbtorture_exec = "/bin/smbtorture"
 filter_subunit_exec = script_root + "/selftest/filter-subunit"
 format_subunit_exec = script_root + "/selftest/format-subunit"
 smbtorture_tests_file = script_root + "/smbtorture-tests-info.yml"
+# Subtests of the suites, listed by smbtorture
+subtests_cache_file = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    / "sit-test-cases"
+    / "smbtorture-subtests.json"
+)
+# Seconds allowed to smbtorture --version and --list at collection
+smbtorture_list_timeout = 60
 
-test_info_file = os.getenv("TEST_INFO_FILE")
-test_info = testhelper.read_yaml(test_info_file)
+subunit_test_re = re.compile(r"^(?:test|testing):? (.+?)\s*$")
+subunit_result_re = re.compile(
+    r"^(success|successful|failure|fail|error|skip|xfail|knownfail|"
+    r"uxsuccess):? (.+?)( \[)?[ \t]*( multipart)?$"
+)
+# Aliases of the subunit results
+subunit_result_names = {
+    "successful": "success",
+    "fail": "failure",
+    "knownfail": "xfail",
+}
 
 
-def smbtorture(share_name: str, test: str, tmp_output: Path) -> bool:
+def subunit_outcomes(output: str) -> typing.List[typing.Tuple[str, str]]:
+    """Return the (test name, result) of each test of a subunit stream"""
+    outcomes = []
+    in_reason = False
+    for line in output.splitlines():
+        if in_reason:
+            in_reason = line != "]"
+            continue
+        m = subunit_result_re.match(line)
+        if m is None:
+            continue
+        result = subunit_result_names.get(m.group(1), m.group(1))
+        outcomes.append((m.group(2), result))
+        in_reason = m.group(3) is not None
+    return outcomes
+
+
+class SubtestMonitor:
+    """Follow the subtests of a subunit v1 stream line by line"""
+
+    def __init__(self, report: typing.Callable[[str], None]) -> None:
+        self.report = report
+        self.current: typing.Optional[str] = None
+        self.started = 0.0
+        self.subtests = 0
+        self._in_reason = False
+
+    def feed(self, line: str) -> None:
+        if self._in_reason:
+            self._in_reason = line != "]"
+            return
+        m = subunit_test_re.match(line)
+        if m is not None:
+            self.current = m.group(1)
+            self.started = time.monotonic()
+            self.subtests += 1
+            self.report(f"{self.current} started")
+            return
+        m = subunit_result_re.match(line)
+        if m is None:
+            return
+        name = m.group(2)
+        result = subunit_result_names.get(m.group(1), m.group(1))
+        if name == self.current:
+            elapsed = time.monotonic() - self.started
+            self.report(f"{name} {result} ({elapsed:.1f}s)")
+            self.current = None
+        else:
+            self.report(f"{name} {result}")
+        self._in_reason = m.group(3) is not None
+
+
+def run_live(
+    cmd: typing.List[str],
+    sink: typing.IO[bytes],
+    report: typing.Callable[[str], None],
+    subtest_timeout: typing.Optional[float],
+) -> typing.Optional[typing.Tuple[str, float]]:
+    """Run smbtorture, copying its subunit output to sink as it comes.
+
+    The start and result of every subtest are reported as they are seen.
+    A subtest running for longer than subtest_timeout seconds gets
+    smbtorture killed and an error result appended to the stream. The
+    same limit applies to smbtorture connecting to the server before its
+    first subtest, the error being then reported against the test run.
+
+    Parameters:
+    cmd: smbtorture command
+    sink: stream receiving the output, e.g. the stdin of filter-subunit
+    report: function called with a line describing each event
+    subtest_timeout: time allowed to each subtest, None for no limit
+
+    Returns:
+    tuple: name and elapsed time of the subtest which timed out, or None
+    """
+    proc = subprocess.Popen(
+        cmd, stderr=subprocess.STDOUT, stdout=subprocess.PIPE
+    )
+    assert proc.stdout is not None
+    monitor = SubtestMonitor(report)
+    # Until the first subtest, the time taken to connect to the server
+    monitor.started = time.monotonic()
+    stuck = None
+    pending = b""
+    with proc, selectors.DefaultSelector() as selector:
+        selector.register(proc.stdout, selectors.EVENT_READ)
+        while True:
+            running = monitor.current
+            if running is None and monitor.subtests == 0:
+                running = cmd[-1]
+            wait = None
+            if subtest_timeout and running is not None:
+                deadline = monitor.started + subtest_timeout
+                wait = deadline - time.monotonic()
+                # Checked after every read too, as a stuck subtest may
+                # keep the pipe ready by writing output
+                if wait <= 0:
+                    stuck = (running, time.monotonic() - monitor.started)
+                    proc.kill()
+                    break
+            if not selector.select(wait):
+                # Deadline reached, killed at the top of the loop
+                continue
+            data = os.read(proc.stdout.fileno(), 65536)
+            if not data:
+                break
+            sink.write(data)
+            *lines, pending = (pending + data).split(b"\n")
+            for line in lines:
+                monitor.feed(line.decode("utf-8", "ignore"))
+    if stuck is None and pending:
+        # Last line of the output, not terminated by a newline
+        monitor.feed(pending.decode("utf-8", "ignore"))
+    if stuck is not None:
+        name, elapsed = stuck
+        report(f"{name} timed out after {elapsed:.1f}s, smbtorture killed")
+        if pending:
+            # Terminate the partial line before the result
+            sink.write(b"\n")
+        sink.write(
+            f"error: {name} [\nsubtest timed out after {elapsed:.1f}s, "
+            "smbtorture killed\n]\n".encode()
+        )
+    return stuck
+
+
+def live_reporter(
+    config: pytest.Config, prefix: str
+) -> typing.Callable[[str], None]:
+    """Return a function writing lines to the terminal as the test runs"""
+    terminal = config.pluginmanager.get_plugin("terminalreporter")
+    capture = config.pluginmanager.get_plugin("capturemanager")
+
+    def report(line: str) -> None:
+        if terminal is None:
+            return
+        with (
+            capture.global_and_fixture_disabled()
+            if capture is not None
+            else contextlib.nullcontext()
+        ):
+            terminal.write_line(f"{prefix}{line}")
+
+    return report
+
+
+def smbtorture(
+    share_name: str,
+    test: str,
+    tmp_output: Path,
+    report: typing.Callable[[str], None],
+    subtest_timeout: typing.Optional[float],
+) -> typing.Tuple[bool, typing.Optional[typing.Tuple[str, float]]]:
     # build smbtorture command
+    test_info = testhelper.get_test_info()
     mount_params = testhelper.get_mount_parameters(test_info, share_name)
     smbtorture_cmd = [
         smbtorture_exec,
@@ -65,21 +240,19 @@ def smbtorture(share_name: str, test: str, tmp_output: Path) -> bool:
     # build format-subunit commands
     format_subunit_cmd = ["/usr/bin/python3", format_subunit_exec]
 
-    # run commands - smbtorture
-    smbtorturec = subprocess.Popen(
-        smbtorture_cmd, stderr=subprocess.STDOUT, stdout=subprocess.PIPE
-    )
-    assert smbtorturec.stdout is not None
-
-    # run commands - filter_subunit
+    # run commands - smbtorture piped to filter_subunit
     with open(tmp_output, "w") as filter_subunit_stdout:
         filter_subunitc = subprocess.Popen(
             filter_subunit_cmd,
             stdout=filter_subunit_stdout,
-            stdin=smbtorturec.stdout,
+            stdin=subprocess.PIPE,
         )
-        smbtorturec.stdout.close()
-        filter_subunitc.communicate()
+        assert filter_subunitc.stdin is not None
+        with filter_subunitc.stdin:
+            stuck = run_live(
+                smbtorture_cmd, filter_subunitc.stdin, report, subtest_timeout
+            )
+        filter_subunitc.wait()
 
     # run commands - format_subunit
     with open(tmp_output, "r") as filter_subunit_stdout:
@@ -103,7 +276,7 @@ def smbtorture(share_name: str, test: str, tmp_output: Path) -> bool:
         print(filter_subunit_stdout.read())
     print("\n" + format_subunitc.stdout)
 
-    return format_subunitc.returncode == 0
+    return format_subunitc.returncode == 0, stuck
 
 
 def list_smbtorture_tests():
@@ -112,8 +285,96 @@ def list_smbtorture_tests():
     return smbtorture_info
 
 
+def smbtorture_version() -> typing.Optional[str]:
+    """Identify the smbtorture binary, None if it cannot be run"""
+    try:
+        st = os.stat(smbtorture_exec)
+        proc = subprocess.run(
+            [smbtorture_exec, "--version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            check=True,
+            timeout=smbtorture_list_timeout,
+        )
+    except (
+        OSError,
+        subprocess.CalledProcessError,
+        subprocess.TimeoutExpired,
+    ):
+        return None
+    # Builds of the same version differ in size or time of modification
+    return f"{proc.stdout.strip()} {st.st_size} {st.st_mtime_ns}"
+
+
+def list_subtests(suite: str) -> typing.List[str]:
+    """List the subtests of a suite with smbtorture --list.
+
+    Returns:
+    list: full names of the subtests, or the suite itself if it has none
+    """
+    proc = subprocess.run(
+        [smbtorture_exec, "--list", suite],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+        check=True,
+        timeout=smbtorture_list_timeout,
+    )
+    subtests = []
+    for line in proc.stdout.splitlines():
+        name = line.strip()
+        if not name or any(c.isspace() for c in name) or ":" in name:
+            continue
+        if name == suite:
+            continue
+        if not name.startswith(suite + "."):
+            name = f"{suite}.{name}"
+        subtests.append(name)
+    return subtests or [suite]
+
+
+def expand_suites(suites: typing.List[str]) -> typing.List[str]:
+    """Replace each suite by its subtests.
+
+    The subtests are cached on disk for the smbtorture binary which
+    listed them. Without a usable smbtorture the suites are returned
+    as they are.
+    """
+    version = smbtorture_version()
+    if version is None:
+        return suites
+    cache: typing.Dict[str, typing.Any] = {}
+    with contextlib.suppress(OSError, ValueError):
+        cache = json.loads(subtests_cache_file.read_text())
+    if cache.get("version") != version:
+        cache = {"version": version, "suites": {}}
+    listed = cache["suites"]
+    missing = [suite for suite in suites if suite not in listed]
+    try:
+        for suite in missing:
+            listed[suite] = list_subtests(suite)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return suites
+    if missing:
+        # Written atomically as several runners may collect at once
+        subtests_cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = subtests_cache_file.with_name(
+            f"{subtests_cache_file.name}.{os.getpid()}"
+        )
+        tmp.write_text(json.dumps(cache, indent=1))
+        os.replace(tmp, subtests_cache_file)
+    return [subtest for suite in suites for subtest in listed[suite]]
+
+
 def generate_smbtorture_tests() -> typing.List[typing.Tuple[str, str]]:
     smbtorture_info = list_smbtorture_tests()
+    test_info = testhelper.get_test_info()
+    config = testhelper.get_test_config(
+        test_info, "smbtorture", {"split_subtests": True}
+    )
+    if config["split_subtests"]:
+        smbtorture_info = expand_suites(smbtorture_info)
     arr = []
     for share_name in testhelper.get_exported_shares(test_info):
         for torture_test in smbtorture_info:
@@ -121,11 +382,40 @@ def generate_smbtorture_tests() -> typing.List[typing.Tuple[str, str]]:
     return arr
 
 
+# smbtorture works in the root of the share
+@pytest.mark.exclusive
 @pytest.mark.parametrize("share_name,test", generate_smbtorture_tests())
-def test_smbtorture(share_name: str, test: str) -> None:
+def test_smbtorture(
+    share_name: str,
+    test: str,
+    record_property: typing.Callable[[str, object], None],
+    pytestconfig: pytest.Config,
+) -> None:
+    config = testhelper.get_test_config(
+        testhelper.get_test_info(),
+        "smbtorture",
+        {"progress": True, "subtest_timeout": 900},
+    )
+    if config["progress"]:
+        report = live_reporter(pytestconfig, f"[{share_name}] ")
+    else:
+        # Only shown with the captured output of the test
+        report = print
     output = testhelper.get_tmp_file()
-    ret = smbtorture(share_name, test, output)
+    ret, stuck = smbtorture(
+        share_name, test, output, report, config["subtest_timeout"] or None
+    )
     if os.path.exists(output):
+        for name, result in subunit_outcomes(output.read_text()):
+            record_property(f"subtest.{name}", result)
         os.unlink(output)
+    if stuck is not None:
+        name, elapsed = stuck
+        record_property("smbtorture.stuck_subtest", name)
+        record_property("smbtorture.stuck_elapsed_s", elapsed)
+        pytest.fail(
+            f"{test}: subtest {name} timed out after {elapsed:.1f}s",
+            pytrace=False,
+        )
     if not ret:
         pytest.fail("Failure in running test - %s" % (test), pytrace=False)
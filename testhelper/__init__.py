@@ -1,4 +1,132 @@
-from .testhelper import *  # noqa: F401, F403
-from .cmdhelper import *  # noqa: F401, F403
-from .fshelper import *  # noqa: F401, F403
-from .smbclient import *  # noqa: F401, F403
+import importlib
+import typing
+
+if typing.TYPE_CHECKING:
+    from .testhelper import *  # noqa: F401, F403
+    from .cmdhelper import *  # noqa: F401, F403
+    from .fshelper import *  # noqa: F401, F403
+    from .smbclient import *  # noqa: F401, F403
+    from .perfhelper import *  # noqa: F401, F403
+    from .prochelper import *  # noqa: F401, F403
+    from .workload import *  # noqa: F401, F403
+    from .manifest import *  # noqa: F401, F403
+    from .sampler import *  # noqa: F401, F403
+    from .baseline import *  # noqa: F401, F403
+    from .results import *  # noqa: F401, F403
+
+# Public names are resolved from their submodules on first use so that
+# importing testhelper does not load pysmb, yaml or subprocess until a
+# helper which needs them is used.
+_submodule_names = {
+    "testhelper": [
+        "read_yaml",
+        "get_test_info",
+        "get_test_config",
+        "gen_mount_params",
+        "get_mount_parameters",
+        "generate_random_bytes",
+        "generate_seeded_bytes",
+        "mix_seeds",
+        "get_worker_namespace",
+        "get_shares",
+        "get_share",
+        "is_premounted_share",
+        "get_premounted_shares",
+        "get_exported_shares",
+    ],
+    "cmdhelper": [
+        "cifs_mount",
+        "cifs_umount",
+        "check_cmds",
+        "podman_run",
+        "get_cifs_mount_history",
+    ],
+    "fshelper": [
+        "get_tmp_root",
+        "get_tmp_mount_point",
+        "get_tmp_file",
+        "get_tmp_dir",
+        "rmtree_parallel",
+    ],
+    "smbclient": [
+        "SMBClient",
+        "smb_share_lock",
+    ],
+    "perfhelper": [
+        "percentile",
+        "summarize_latencies",
+        "format_table",
+    ],
+    "prochelper": [
+        "read_cifs_debug_data",
+        "split_cifs_servers",
+        "cifs_channel_count",
+        "parse_proc_io",
+        "read_proc_io",
+        "parse_net_dev",
+        "read_net_dev",
+        "read_cifs_stats",
+        "parse_cifs_stats",
+        "parse_cifs_server_state",
+        "diff_counters",
+    ],
+    "workload": [
+        "parse_size",
+        "WorkloadJob",
+        "load_workload_jobs",
+        "run_workload_job",
+        "DataPath",
+        "io_cases",
+        "make_datasets",
+        "run_io_checks",
+        "BlockFile",
+        "run_random_io",
+        "run_stress_test",
+    ],
+    "manifest": [
+        "chunk_digests",
+        "verify_file",
+        "ManifestEntry",
+        "Manifest",
+        "write_seeded_file",
+        "write_seeded_files",
+    ],
+    "sampler": [
+        "NullSampler",
+        "Sampler",
+    ],
+    "baseline": [
+        "metric_direction",
+        "t_critical",
+        "compare_samples",
+        "get_tolerance",
+        "BaselineStore",
+        "compare_stores",
+        "format_comparison",
+    ],
+    "results": [
+        "ResultsStore",
+    ],
+}
+
+_lazy_names = {
+    name: submodule
+    for submodule, names in _submodule_names.items()
+    for name in names
+}
+
+__all__ = sorted(_lazy_names)
+
+
+def __getattr__(name: str) -> typing.Any:
+    submodule = _lazy_names.get(name)
+    if submodule is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module("." + submodule, __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> typing.List[str]:
+    return sorted(set(globals()) | set(__all__))
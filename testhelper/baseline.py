@@ -0,0 +1,308 @@
+import argparse
+import fnmatch
+import json
+import math
+import statistics
+import sys
+import typing
+from pathlib import Path
+from .perfhelper import format_table
+
+# 2: the workload is the test name with its parameters
+baseline_version = 2
+
+# (backend, share, workload, metric)
+BaselineKey = typing.Tuple[str, str, str, str]
+
+# Metric name suffixes telling whether larger values are better
+_higher_better = ("mbps", "iops", "per_sec", "_per_s")
+_lower_better = ("_ms", "_s", "majflt")
+# Metrics matching the suffixes above which do not measure performance
+_not_performance = {"smbtorture.stuck_elapsed_s"}
+
+# One-sided critical values of Student's t distribution for 1 to 30
+# degrees of freedom, followed by the limit for infinite ones.
+_t_table = {
+    0.90: [
+        3.078, 1.886, 1.638, 1.533, 1.476, 1.440, 1.415, 1.397, 1.383,
+        1.372, 1.363, 1.356, 1.350, 1.345, 1.341, 1.337, 1.333, 1.330,
+        1.328, 1.325, 1.323, 1.321, 1.319, 1.318, 1.316, 1.315, 1.314,
+        1.313, 1.311, 1.310, 1.282,
+    ],
+    0.95: [
+        6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833,
+        1.812, 1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734,
+        1.729, 1.725, 1.721, 1.717, 1.714, 1.711, 1.708, 1.706, 1.703,
+        1.701, 1.699, 1.697, 1.645,
+    ],
+    0.99: [
+        31.821, 6.965, 4.541, 3.747, 3.365, 3.143, 2.998, 2.896, 2.821,
+        2.764, 2.718, 2.681, 2.650, 2.624, 2.602, 2.583, 2.567, 2.552,
+        2.539, 2.528, 2.518, 2.508, 2.500, 2.492, 2.485, 2.479, 2.473,
+        2.467, 2.462, 2.457, 2.326,
+    ],
+}  # fmt: skip
+confidence_levels = sorted(_t_table)
+
+
+def metric_direction(metric: str) -> int:
+    """Tell from the name of a metric which direction is an improvement.
+
+    Parameters:
+    metric: name of the metric, e.g. "randio.fs4096.bs4096.iops"
+
+    Returns:
+    int: 1 if higher values are better, -1 if lower values are better
+    and 0 if the metric is not a performance metric
+    """
+    if metric in _not_performance:
+        return 0
+    if metric.endswith(_higher_better):
+        return 1
+    if metric.endswith(_lower_better):
+        return -1
+    return 0
+
+
+def t_critical(df: float, confidence: float = 0.95) -> float:
+    """Return the one-sided critical value of Student's t distribution.
+
+    Parameters:
+    df: degrees of freedom, rounded down to be conservative
+    confidence: one of 0.90, 0.95 and 0.99
+
+    Returns:
+    float: critical value
+    """
+    assert confidence in _t_table, f"unsupported confidence {confidence}"
+    table = _t_table[confidence]
+    dof = max(1, int(df))
+    if dof <= 30:
+        return table[dof - 1]
+    # Interpolate in 1/df towards the limit
+    return table[30] + (table[29] - table[30]) * 30 / dof
+
+
+def compare_samples(
+    base: typing.List[float],
+    current: typing.List[float],
+    direction: int,
+    tolerance: float = 0.05,
+    confidence: float = 0.95,
+) -> typing.Dict[str, typing.Any]:
+    """Test whether a metric regressed against its baseline.
+
+    The degradation is the drop of the mean for higher-is-better
+    metrics and the rise of the mean otherwise. A regression is reported
+    when the lower bound of the one-sided confidence interval of the
+    degradation (Welch's t-test) exceeds the tolerance, relative to the
+    baseline mean. If only one side has repeated samples, its variance
+    is used for both sides. Without any repeated samples no regression
+    can be told apart from noise and none is reported.
+
+    Parameters:
+    base: samples of the baseline
+    current: samples of the current run
+    direction: 1 if higher is better, -1 if lower is better
+    tolerance: degradation accepted, relative to the baseline mean
+    confidence: confidence level of the interval
+
+    Returns:
+    dict: base_mean, current_mean, change (relative, positive is
+    worse), change_low (lower bound of change), significant and
+    regression
+    """
+    assert base and current, "no samples to compare"
+    assert direction in (1, -1), "not a performance metric"
+    n1, n2 = len(base), len(current)
+    mean1, mean2 = statistics.fmean(base), statistics.fmean(current)
+    scale = abs(mean1) or 1.0
+    worse = (mean1 - mean2) if direction > 0 else (mean2 - mean1)
+    ret: typing.Dict[str, typing.Any] = {
+        "base_mean": mean1,
+        "current_mean": mean2,
+        "change": worse / scale,
+        "change_low": None,
+        "significant": False,
+        "regression": False,
+    }
+    if n1 < 2 and n2 < 2:
+        return ret
+    df: float
+    if n1 < 2:
+        var1 = var2 = statistics.variance(current)
+        df = n2 - 1
+    elif n2 < 2:
+        var1 = var2 = statistics.variance(base)
+        df = n1 - 1
+    else:
+        var1, var2 = statistics.variance(base), statistics.variance(current)
+    a, b = var1 / n1, var2 / n2
+    se = math.sqrt(a + b)
+    if n1 > 1 and n2 > 1:
+        # Welch-Satterthwaite degrees of freedom
+        denom = a * a / (n1 - 1) + b * b / (n2 - 1)
+        df = (a + b) ** 2 / denom if denom else n1 + n2 - 2
+    low = worse - t_critical(df, confidence) * se
+    ret["change_low"] = low / scale
+    ret["significant"] = low > 0
+    ret["regression"] = low > tolerance * scale
+    return ret
+
+
+def get_tolerance(
+    metric: str, tolerances: typing.Dict[str, float], default: float
+) -> float:
+    """Return the tolerance of the first glob pattern matching a metric"""
+    for pattern, tolerance in tolerances.items():
+        if fnmatch.fnmatchcase(metric, pattern):
+            return float(tolerance)
+    return default
+
+
+class BaselineStore:
+    """Samples of performance metrics keyed by backend, share, workload
+    and metric name, saved as JSON.
+    """
+
+    def __init__(self) -> None:
+        self.entries: typing.Dict[BaselineKey, typing.List[float]] = {}
+
+    def set(self, key: BaselineKey, samples: typing.List[float]) -> None:
+        self.entries[key] = list(samples)
+
+    def get(self, key: BaselineKey) -> typing.Optional[typing.List[float]]:
+        return self.entries.get(key)
+
+    def update(self, other: "BaselineStore") -> None:
+        self.entries.update(other.entries)
+
+    def save(self, path: Path) -> None:
+        entries = [
+            {
+                "backend": key[0],
+                "share": key[1],
+                "workload": key[2],
+                "metric": key[3],
+                "samples": samples,
+            }
+            for key, samples in sorted(self.entries.items())
+        ]
+        with open(path, "w") as f:
+            json.dump(
+                {"version": baseline_version, "entries": entries}, f, indent=1
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "BaselineStore":
+        with open(path) as f:
+            data = json.load(f)
+        assert data.get("version") == baseline_version, "unknown baseline"
+        store = cls()
+        for e in data["entries"]:
+            key = (e["backend"], e["share"], e["workload"], e["metric"])
+            store.set(key, e["samples"])
+        return store
+
+
+def compare_stores(
+    base: BaselineStore,
+    current: BaselineStore,
+    tolerance: float = 0.05,
+    confidence: float = 0.95,
+    tolerances: typing.Optional[typing.Dict[str, float]] = None,
+) -> typing.List[typing.Tuple[BaselineKey, typing.Dict[str, typing.Any]]]:
+    """Compare every metric of a run with its baseline.
+
+    Parameters:
+    base: baseline samples
+    current: samples of the run
+    tolerance: default tolerance
+    confidence: confidence level of the comparison
+    tolerances: tolerances of the metrics matching glob patterns
+
+    Returns:
+    list of (key, result of compare_samples) of the metrics found in
+    both stores
+    """
+    ret = []
+    for key, samples in sorted(current.entries.items()):
+        base_samples = base.get(key)
+        direction = metric_direction(key[3])
+        if not base_samples or not samples or not direction:
+            continue
+        tol = get_tolerance(key[3], tolerances or {}, tolerance)
+        res = compare_samples(
+            base_samples, samples, direction, tol, confidence
+        )
+        ret.append((key, res))
+    return ret
+
+
+def format_comparison(
+    results: typing.List[
+        typing.Tuple[BaselineKey, typing.Dict[str, typing.Any]]
+    ],
+) -> str:
+    headers = ["backend", "share", "workload", "metric", "base", "current"]
+    headers += ["worse%", "worse_min%", "verdict"]
+    rows = []
+    for key, res in results:
+        if res["regression"]:
+            verdict = "REGRESSION"
+        elif res["change_low"] is None:
+            verdict = "no repeats"
+        else:
+            verdict = "ok"
+        low = res["change_low"]
+        rows.append(
+            list(key)
+            + [res["base_mean"], res["current_mean"], 100 * res["change"]]
+            + ["-" if low is None else 100 * low, verdict]
+        )
+    return format_table(headers, rows)
+
+
+def _main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m testhelper.baseline",
+        description="Show or compare performance baselines",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="show the metrics of a baseline")
+    show.add_argument("baseline", type=Path)
+    compare = sub.add_parser("compare", help="compare a run to a baseline")
+    compare.add_argument("baseline", type=Path)
+    compare.add_argument("current", type=Path)
+    compare.add_argument("--tolerance", type=float, default=0.05)
+    compare.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        choices=confidence_levels,
+    )
+    args = parser.parse_args()
+
+    if args.command == "show":
+        store = BaselineStore.load(args.baseline)
+        rows = [
+            list(key)
+            + [len(s), statistics.fmean(s)]
+            + [statistics.stdev(s) if len(s) > 1 else "-"]
+            for key, s in sorted(store.entries.items())
+        ]
+        headers = ["backend", "share", "workload", "metric", "n", "mean"]
+        print(format_table(headers + ["stdev"], rows))
+        return 0
+    results = compare_stores(
+        BaselineStore.load(args.baseline),
+        BaselineStore.load(args.current),
+        args.tolerance,
+        args.confidence,
+    )
+    print(format_comparison(results))
+    return 1 if any(res["regression"] for _, res in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
@@ -2,7 +2,31 @@ import os
 import subprocess
 import typing
 import shutil
+import time
 from pathlib import Path
+from .prochelper import parse_cifs_stats, read_cifs_stats
+
+# Mounts made by cifs_mount, oldest first. The counters of the share in
+# /proc/fs/cifs/Stats are captured right after mounting and right before
+# unmounting, so that the activity of a mount is known even when it was
+# both created and removed while a single test ran.
+_cifs_mount_history: typing.List[typing.Dict[str, typing.Any]] = []
+
+
+def _cifs_share_stats(unc: str) -> typing.Optional[typing.Dict[str, int]]:
+    return parse_cifs_stats(read_cifs_stats())["shares"].get(unc)
+
+
+def get_cifs_mount_history() -> typing.List[typing.Dict[str, typing.Any]]:
+    """Return the mounts made by cifs_mount, oldest first.
+
+    Returns:
+    list of dicts holding the unc, mount_point, mounted_at and
+    umounted_at time of each mount, the duration of the mount and umount
+    commands (mount_s and umount_s), and the share counters taken after
+    mounting (stats_mounted) and before unmounting (stats_umounted).
+    """
+    return list(_cifs_mount_history)
 
 
 def cifs_mount(
@@ -43,8 +67,23 @@ def cifs_mount(
         + " "
         + str(mount_point)
     )
+    start = time.monotonic()
     ret = os.system(cmd)
+    mount_s = time.monotonic() - start
     assert ret == 0, "Error mounting: ret %d cmd: %s\n" % (ret, cmd)
+    unc = "\\\\" + mount_params["host"] + "\\" + mount_params["share"]
+    _cifs_mount_history.append(
+        {
+            "unc": unc,
+            "mount_point": Path(mount_point),
+            "mounted_at": time.time(),
+            "umounted_at": None,
+            "mount_s": mount_s,
+            "umount_s": None,
+            "stats_mounted": _cifs_share_stats(unc),
+            "stats_umounted": None,
+        }
+    )
     return ret
 
 
@@ -57,8 +96,19 @@ def cifs_umount(mount_point: Path) -> int:
     Returns:
     int: return value of the umount command.
     """
+    mount: typing.Optional[typing.Dict[str, typing.Any]] = None
+    for entry in reversed(_cifs_mount_history):
+        if entry["mount_point"] == Path(mount_point):
+            if entry["umounted_at"] is None:
+                entry["stats_umounted"] = _cifs_share_stats(entry["unc"])
+                entry["umounted_at"] = time.time()
+                mount = entry
+            break
     cmd = "umount -fl %s" % (mount_point)
+    start = time.monotonic()
     ret = os.system(cmd)
+    if mount is not None:
+        mount["umount_s"] = time.monotonic() - start
     assert ret == 0, "Error mounting: ret %d cmd: %s\n" % (ret, cmd)
     return ret
 
@@ -79,12 +129,17 @@ def check_cmds(cmds: typing.List[str]) -> Path:
     assert False, "Could not find command"
 
 
-def podman_run(test_image: str, test_root: Path) -> typing.Tuple[int, str]:
+def podman_run(
+    test_image: str,
+    test_root: Path,
+    env: typing.Optional[typing.Dict[str, str]] = None,
+) -> typing.Tuple[int, str]:
     """Run podman command
 
     Parameters:
     test_image: The image to be used for the podman run
     test_root: The root of the folder which will be used to perform the tests
+    env: Environment variables to set within the container
 
     Returns:
     int: Return value from the execution
@@ -98,8 +153,10 @@ def podman_run(test_image: str, test_root: Path) -> typing.Tuple[int, str]:
         "run",
         f"--volume={mount_path}:/testdir",
         "--privileged",
-        test_image,
     ]
+    for name, value in (env or {}).items():
+        podman_cmd.append(f"--env={name}={value}")
+    podman_cmd.append(test_image)
     ret = subprocess.run(
         podman_cmd,
         universal_newlines=True,
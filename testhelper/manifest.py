@@ -0,0 +1,269 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from .testhelper import generate_seeded_bytes, mix_seeds
+
+manifest_version = 1
+default_chunk_size = 2**20
+
+
+def _digest(data: typing.Union[bytes, memoryview]) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def chunk_digests(
+    data: bytes, chunk_size: int = default_chunk_size
+) -> typing.List[str]:
+    """Return the BLAKE2 digest of each chunk of an in-memory buffer.
+
+    Parameters:
+    data: file contents
+    chunk_size: size of each digested chunk
+
+    Returns:
+    list of hex digests, one per chunk
+    """
+    view = memoryview(data)
+    digests = []
+    for off in range(0, len(data), chunk_size):
+        end = off + chunk_size
+        digests.append(_digest(view[off:end]))
+    return digests
+
+
+def verify_file(
+    path: Path,
+    size: int,
+    digests: typing.List[str],
+    chunk_size: int = default_chunk_size,
+) -> None:
+    """Verify a file against its chunk digests, streaming its contents.
+
+    Only a single chunk is held in memory at any time.
+
+    Parameters:
+    path: file to verify
+    size: expected size of the file
+    digests: expected digest of each chunk
+    chunk_size: size of each digested chunk
+
+    Raises:
+    IOError: if the file does not match
+    """
+    st_size = path.stat().st_size
+    if st_size != size:
+        raise IOError(f"size mismatch: {st_size} != {size} {path}")
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        for idx, expected in enumerate(digests):
+            nread = 0
+            while nread < chunk_size:
+                n = f.readinto(view[nread:])
+                if not n:
+                    break
+                nread += n
+            if _digest(view[:nread]) != expected:
+                raise IOError(f"chunk {idx} digest mismatch in {path}")
+        if f.read(1):
+            raise IOError(f"file longer than expected: {path}")
+
+
+class ManifestEntry:
+    """Size, seed and chunk digests of one file in a manifest"""
+
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        digests: typing.List[str],
+        seed: typing.Optional[int] = None,
+    ) -> None:
+        self.path = path
+        self.size = size
+        self.digests = digests
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "size": self.size,
+            "seed": self.seed,
+            "digests": self.digests,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ManifestEntry":
+        return cls(d["path"], d["size"], d["digests"], d.get("seed"))
+
+
+def write_seeded_file(
+    root: Path,
+    path: str,
+    size: int,
+    seed: int,
+    chunk_size: int = default_chunk_size,
+) -> ManifestEntry:
+    """Write a file of seeded data and digest it while streaming.
+
+    Parameters:
+    root: directory the path is relative to
+    path: relative path of the file
+    size: size of the file
+    seed: seed of the file's data
+    chunk_size: size of each written and digested chunk
+
+    Returns:
+    ManifestEntry: manifest entry of the written file
+    """
+    digests = []
+    with open(root / path, "wb", buffering=0) as f:
+        for idx, off in enumerate(range(0, size, chunk_size)):
+            data = generate_seeded_bytes(
+                mix_seeds(seed, idx), min(chunk_size, size - off)
+            )
+            f.write(data)
+            digests.append(_digest(data))
+    return ManifestEntry(path, size, digests, seed)
+
+
+class Manifest:
+    """A list of files with their chunk digests.
+
+    A manifest is saved as JSON lines: a header line followed by one
+    line per file. It lets files be verified from another mount, node,
+    user or session without keeping their contents in memory.
+    """
+
+    def __init__(self, chunk_size: int = default_chunk_size) -> None:
+        self.chunk_size = chunk_size
+        self.entries: typing.List[ManifestEntry] = []
+
+    def add(self, entry: ManifestEntry) -> None:
+        self.entries.append(entry)
+
+    def save(self, path: Path) -> None:
+        header = {
+            "version": manifest_version,
+            "algorithm": "blake2b-128",
+            "chunk_size": self.chunk_size,
+        }
+        with open(path, "w") as f:
+            f.write(json.dumps(header) + "\n")
+            for entry in self.entries:
+                f.write(json.dumps(entry.to_dict()) + "\n")
+
+    @classmethod
+    def load(cls, path: Path) -> "Manifest":
+        with open(path) as f:
+            header = json.loads(f.readline())
+            assert header["version"] == manifest_version, "unknown manifest"
+            manifest = cls(header["chunk_size"])
+            for line in f:
+                manifest.add(ManifestEntry.from_dict(json.loads(line)))
+        return manifest
+
+    def verify(self, root: Path, workers: int = 8) -> typing.List[str]:
+        """Verify the files of the manifest below a directory.
+
+        Parameters:
+        root: directory the paths of the manifest are relative to
+        workers: number of files verified in parallel
+
+        Returns:
+        list of errors, empty if all files match
+        """
+
+        def _verify(entry: ManifestEntry) -> typing.Optional[str]:
+            try:
+                verify_file(
+                    root / entry.path,
+                    entry.size,
+                    entry.digests,
+                    self.chunk_size,
+                )
+            except (IOError, OSError) as error:
+                return str(error)
+            return None
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_verify, self.entries)
+        return [err for err in results if err is not None]
+
+
+def write_seeded_files(
+    root: Path,
+    nfiles: int,
+    size: int,
+    seed: int,
+    workers: int = 8,
+    chunk_size: int = default_chunk_size,
+) -> Manifest:
+    """Write a set of seeded files in parallel and return their manifest.
+
+    Parameters:
+    root: directory to write the files in
+    nfiles: number of files
+    size: size of each file
+    seed: seed of the data set
+    workers: number of files written in parallel
+    chunk_size: size of each written and digested chunk
+
+    Returns:
+    Manifest: manifest of the written files
+    """
+
+    def _write(idx: int) -> ManifestEntry:
+        seed_idx = mix_seeds(seed, idx)
+        return write_seeded_file(
+            root, f"file-{idx:06d}", size, seed_idx, chunk_size
+        )
+
+    manifest = Manifest(chunk_size)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for entry in executor.map(_write, range(nfiles)):
+            manifest.add(entry)
+    return manifest
+
+
+def _main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m testhelper.manifest",
+        description="Write or verify files against a checksum manifest",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    write = sub.add_parser("write", help="write seeded files")
+    write.add_argument("root", type=Path)
+    write.add_argument("manifest", type=Path)
+    write.add_argument("--files", type=int, default=16)
+    write.add_argument("--size", type=int, default=2**26)
+    write.add_argument("--seed", type=int, default=None)
+    write.add_argument("--workers", type=int, default=8)
+    verify = sub.add_parser("verify", help="verify files")
+    verify.add_argument("manifest", type=Path)
+    verify.add_argument("root", type=Path)
+    verify.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == "write":
+        seed = args.seed
+        if seed is None:
+            seed = int.from_bytes(os.urandom(4), "little")
+        manifest = write_seeded_files(
+            args.root, args.files, args.size, seed, args.workers
+        )
+        manifest.save(args.manifest)
+        return 0
+    errors = Manifest.load(args.manifest).verify(args.root, args.workers)
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
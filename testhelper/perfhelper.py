@@ -0,0 +1,71 @@
+import math
+import typing
+
+
+def percentile(samples: typing.Sequence[float], pct: float) -> float:
+    """Return the given percentile of a list of samples.
+
+    Parameters:
+    samples: measured values
+    pct: percentile in the range 0-100
+
+    Returns:
+    float: nearest-rank percentile, or 0.0 when there are no samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = math.ceil(pct / 100.0 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def summarize_latencies(
+    samples: typing.Sequence[float],
+) -> typing.Dict[str, float]:
+    """Summarize a list of latencies.
+
+    Parameters:
+    samples: latencies in seconds
+
+    Returns:
+    dict: count, mean, p50, p90, p99 and max latency in milliseconds
+    """
+    ordered = sorted(samples)
+    count = len(ordered)
+    mean = sum(ordered) / count if count else 0.0
+    return {
+        "count": count,
+        "mean_ms": mean * 1000,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p90_ms": percentile(ordered, 90) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": (ordered[-1] if count else 0.0) * 1000,
+    }
+
+
+def format_table(
+    headers: typing.Sequence[str], rows: typing.Iterable[typing.Sequence]
+) -> str:
+    """Format rows of values as a plain text table.
+
+    Parameters:
+    headers: column names
+    rows: rows of values, floats are printed with 3 decimals
+
+    Returns:
+    str: the table with one line per row
+    """
+
+    def _fmt(value: typing.Any) -> str:
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        return str(value)
+
+    lines = [[str(h) for h in headers]]
+    lines += [[_fmt(v) for v in row] for row in rows]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(headers))]
+    out = []
+    for line in lines:
+        out.append("  ".join(v.rjust(w) for v, w in zip(line, widths)))
+    out.insert(1, "  ".join("-" * w for w in widths))
+    return "\n".join(out)
@@ -0,0 +1,27 @@
+import typing
+import pytest
+from pathlib import Path
+
+
+def get_item_share(item: pytest.Item, shares: dict) -> typing.Optional[str]:
+    """Return the name of the share a test item runs against.
+
+    Parameters:
+    item: the test item
+    shares: dict of the shares of the test-info
+
+    Returns:
+    str: name of the share, or None if the test does not take a share
+    """
+    callspec = getattr(item, "callspec", None)
+    params = callspec.params if callspec else {}
+    # Tests without any share to run on are parametrized with NOTSET
+    if isinstance(params.get("setup_mount"), tuple):
+        return params["setup_mount"][1]
+    if isinstance(params.get("share_name"), str):
+        return params["share_name"]
+    if isinstance(params.get("test_dir"), Path):
+        for name, share in shares.items():
+            if share.get("path") == str(params["test_dir"]):
+                return name
+    return None
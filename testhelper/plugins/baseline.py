@@ -0,0 +1,187 @@
+# Record performance baselines and gate runs on them.
+#
+# The metrics a test reports with record_property are keyed by the
+# backend and share it ran against, the test with its parameters and
+# the metric name. With --perf-repeat=N the call of every test reporting
+# metrics is repeated N times so that each metric has N samples.
+# --baseline-record writes the samples to a baseline file and --baseline
+# compares them to one, failing the tests with a statistically
+# significant regression beyond the tolerance of the metric.
+
+import typing
+import pytest
+import testhelper
+from pathlib import Path
+from testhelper import baseline as _baseline
+from testhelper.plugins import get_item_share
+
+
+def _perf_samples(
+    properties: typing.List[typing.Tuple[str, object]],
+) -> typing.Dict[str, typing.List[float]]:
+    samples: typing.Dict[str, typing.List[float]] = {}
+    for name, value in properties:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if _baseline.metric_direction(name):
+                samples.setdefault(name, []).append(float(value))
+    return samples
+
+
+class BaselineGate:
+    def __init__(
+        self,
+        repeat: int,
+        compare_path: typing.Optional[Path],
+        record_path: typing.Optional[Path],
+        tolerance: float,
+        confidence: float,
+    ) -> None:
+        self.repeat = repeat
+        self.base = (
+            _baseline.BaselineStore.load(compare_path)
+            if compare_path
+            else None
+        )
+        self.record_path = record_path
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.current = _baseline.BaselineStore()
+        self.results: typing.List[typing.Any] = []
+        self._test_info: typing.Optional[dict] = None
+
+    @property
+    def test_info(self) -> dict:
+        if self._test_info is None:
+            self._test_info = testhelper.get_test_info()
+        return self._test_info
+
+    def _key_prefix(self, item: pytest.Item) -> typing.Tuple[str, str, str]:
+        shares = testhelper.get_shares(self.test_info)
+        share = get_item_share(item, shares)
+        if share is None:
+            backend = "-"
+        else:
+            backend = shares[share]["backend"]["name"]
+        # Each parametrization of a test has its own baseline
+        return backend, share or "-", item.name
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_pyfunc_call(
+        self, pyfuncitem: pytest.Function
+    ) -> typing.Optional[bool]:
+        # Only tests reporting metrics are repeated and compared
+        if "record_property" not in pyfuncitem.fixturenames:
+            return None
+        funcargs = pyfuncitem.funcargs
+        argnames = pyfuncitem._fixtureinfo.argnames
+        testargs = {arg: funcargs[arg] for arg in argnames}
+        start = len(pyfuncitem.user_properties)
+        for i in range(self.repeat):
+            pyfuncitem.obj(**testargs)
+            # Tests reporting no performance metrics run once
+            properties = pyfuncitem.user_properties[start:]
+            if i == 0 and not _perf_samples(properties):
+                return True
+        self._check(pyfuncitem, _perf_samples(properties))
+        return True
+
+    def _check(
+        self, item: pytest.Item, samples: typing.Dict[str, typing.List[float]]
+    ) -> None:
+        run = _baseline.BaselineStore()
+        prefix = self._key_prefix(item)
+        for metric, values in samples.items():
+            run.set(prefix + (metric,), values)
+        self.current.update(run)
+        if self.base is None:
+            return
+        config = testhelper.get_test_config(self.test_info, "baseline")
+        results = _baseline.compare_stores(
+            self.base,
+            run,
+            self.tolerance,
+            self.confidence,
+            config.get("tolerances"),
+        )
+        self.results.extend(results)
+        regressions = [
+            f"{key[3]}: {100 * res['change']:.1f}% worse than baseline "
+            f"(at least {100 * res['change_low']:.1f}%)"
+            for key, res in results
+            if res["regression"]
+        ]
+        if regressions:
+            pytest.fail("performance regression\n" + "\n".join(regressions))
+
+    def pytest_terminal_summary(self, terminalreporter: typing.Any) -> None:
+        if not self.results:
+            return
+        terminalreporter.write_sep(
+            "=",
+            f"baseline comparison (confidence {self.confidence}, "
+            f"{self.repeat} repeats)",
+        )
+        terminalreporter.write_line(_baseline.format_comparison(self.results))
+
+    def pytest_sessionfinish(self) -> None:
+        if self.record_path is None or not self.current.entries:
+            return
+        # Metrics of tests not run this time are kept
+        store = _baseline.BaselineStore()
+        if self.record_path.exists():
+            store = _baseline.BaselineStore.load(self.record_path)
+        store.update(self.current)
+        store.save(self.record_path)
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("baseline", "performance baselines")
+    group.addoption(
+        "--perf-repeat",
+        type=int,
+        default=1,
+        metavar="N",
+        help="repeat the tests reporting metrics N times",
+    )
+    group.addoption(
+        "--baseline",
+        default=None,
+        metavar="PATH",
+        help="fail tests whose metrics regressed against this baseline",
+    )
+    group.addoption(
+        "--baseline-record",
+        default=None,
+        metavar="PATH",
+        help="record the metrics of the run in this baseline file",
+    )
+    group.addoption(
+        "--baseline-tolerance",
+        type=float,
+        default=0.05,
+        metavar="FRACTION",
+        help="degradation of a metric accepted, relative to the baseline",
+    )
+    group.addoption(
+        "--baseline-confidence",
+        type=float,
+        default=0.95,
+        choices=_baseline.confidence_levels,
+        help="confidence level required to report a regression",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    repeat = config.getoption("perf_repeat")
+    compare_path = config.getoption("baseline")
+    record_path = config.getoption("baseline_record")
+    if repeat <= 1 and not compare_path and not record_path:
+        return
+    plugin = BaselineGate(
+        max(repeat, 1),
+        Path(compare_path) if compare_path else None,
+        Path(record_path) if record_path else None,
+        config.getoption("baseline_tolerance"),
+        config.getoption("baseline_confidence"),
+    )
+    config.pluginmanager.register(plugin, "baseline")
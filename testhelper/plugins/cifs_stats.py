@@ -0,0 +1,166 @@
+# Capture the client-side CIFS statistics of each test.
+#
+# The counters of /proc/fs/cifs/Stats are taken before the setup and
+# after the teardown of each test and diffed per share. Mounts created
+# and removed while the test ran are covered by the snapshots which
+# cifs_mount and cifs_umount take. The differences and the credits and
+# in-flight requests of each server at the end of the test are attached
+# to the test report and optionally written to a JSON file.
+
+import json
+import time
+import typing
+import pytest
+from pathlib import Path
+from testhelper import cmdhelper, prochelper
+
+# Counters of each share attached to the test report
+report_counters = [
+    "smbs",
+    "reads",
+    "writes",
+    "creates",
+    "closes",
+    "bytes_read",
+    "bytes_written",
+]
+
+
+def _sum_deltas(
+    base: typing.Dict[str, int], series: typing.List[typing.Dict[str, int]]
+) -> typing.Dict[str, int]:
+    total: typing.Dict[str, int] = {}
+    prev = base
+    for counters in series:
+        for name, value in prochelper.diff_counters(prev, counters).items():
+            total[name] = total.get(name, 0) + value
+        prev = counters
+    return total
+
+
+def _share_prefix(unc: str) -> str:
+    host, _, share = unc.lstrip("\\").partition("\\")
+    return f"cifs.{host}.{share}"
+
+
+class CifsStats:
+    def __init__(self, json_path: typing.Optional[Path]) -> None:
+        self.json_path = json_path
+        self.results: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        self._start: typing.Dict[str, typing.Tuple[float, dict]] = {}
+        self._servers: typing.Dict[str, dict] = {}
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_setup(self, item: pytest.Item) -> None:
+        stats = prochelper.parse_cifs_stats(prochelper.read_cifs_stats())
+        self._start[item.nodeid] = (time.time(), stats)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(
+        self, item: pytest.Item
+    ) -> typing.Generator[None, None, None]:
+        yield
+        # Taken while the mounts of the test are still in place
+        debug_data = prochelper.read_cifs_debug_data()
+        self._servers[item.nodeid] = prochelper.parse_cifs_server_state(
+            debug_data
+        )
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(
+        self, item: pytest.Item
+    ) -> typing.Generator[None, None, None]:
+        yield
+        if item.nodeid not in self._start:
+            return
+        start_time, start = self._start.pop(item.nodeid)
+        end = prochelper.parse_cifs_stats(prochelper.read_cifs_stats())
+        servers = self._servers.pop(item.nodeid, {})
+        result = self._diff(start_time, start, end)
+        result["servers"] = servers
+        if not result["shares"] and not servers:
+            return
+        self.results[item.nodeid] = result
+        self._attach(item, result)
+
+    def _diff(
+        self, start_time: float, start: dict, end: dict
+    ) -> typing.Dict[str, typing.Any]:
+        # Snapshots of each share taken by cifs_mount and cifs_umount
+        # while the test ran, in time order
+        observations: typing.Dict[str, list] = {}
+        for mount in cmdhelper.get_cifs_mount_history():
+            for when, counters in (
+                (mount["mounted_at"], mount["stats_mounted"]),
+                (mount["umounted_at"], mount["stats_umounted"]),
+            ):
+                if when is not None and when >= start_time and counters:
+                    obs = observations.setdefault(mount["unc"], [])
+                    obs.append((when, counters))
+
+        shares = {}
+        for unc in (
+            set(start["shares"]) | set(end["shares"]) | set(observations)
+        ):
+            obs = sorted(observations.get(unc, []), key=lambda o: o[0])
+            series = [counters for _, counters in obs]
+            if unc in end["shares"]:
+                series.append(end["shares"][unc])
+            deltas = _sum_deltas(start["shares"].get(unc, {}), series)
+            if any(deltas.values()):
+                shares[unc] = deltas
+        return {
+            "shares": shares,
+            "global": prochelper.diff_counters(start["global"], end["global"]),
+        }
+
+    def _attach(self, item: pytest.Item, result: dict) -> None:
+        for unc, deltas in result["shares"].items():
+            prefix = _share_prefix(unc)
+            for name in report_counters:
+                item.user_properties.append(
+                    (f"{prefix}.{name}", deltas.get(name, 0))
+                )
+            failed = sum(
+                value
+                for name, value in deltas.items()
+                if name.endswith("_failed")
+            )
+            item.user_properties.append((f"{prefix}.failed", failed))
+        for name in ("session_reconnects", "share_reconnects"):
+            if name in result["global"]:
+                value = result["global"][name]
+                item.user_properties.append((f"cifs.{name}", value))
+        for host, state in result["servers"].items():
+            for name, value in state.items():
+                item.user_properties.append((f"cifs.{host}.{name}", value))
+
+    def pytest_sessionfinish(self) -> None:
+        if self.json_path is None:
+            return
+        with open(self.json_path, "w") as f:
+            json.dump(self.results, f, indent=2, sort_keys=True)
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("cifs-stats", "client-side CIFS statistics")
+    group.addoption(
+        "--cifs-stats-json",
+        metavar="PATH",
+        default=None,
+        help="write the CIFS statistics of each test to a JSON file",
+    )
+    group.addoption(
+        "--no-cifs-stats",
+        action="store_true",
+        default=False,
+        help="do not capture CIFS statistics",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    if config.getoption("no_cifs_stats"):
+        return
+    json_path = config.getoption("cifs_stats_json")
+    plugin = CifsStats(Path(json_path) if json_path else None)
+    config.pluginmanager.register(plugin, "cifs_stats")
@@ -0,0 +1,117 @@
+# Run the tests on several runners sharing the same shares.
+#
+# --shard=K/N selects the K-th of N disjoint subsets of the tests so that
+# N runners, on one or several hosts, run the suite together. The tests
+# of each share are spread over all shards, starting at a different
+# shard for each share, so that the runners work on different shares
+# as much as possible. Tests marked exclusive, such as smbtorture which
+# works in the root of the share, take a lock on their share for the
+# duration of their call so that no two of them run on a share at once.
+# They are serialized only against each other: the other tests, which
+# work in their runner's own directory, keep using the share meanwhile.
+
+import typing
+import pytest
+import testhelper
+from testhelper.plugins import get_item_share
+
+
+def parse_shard(value: str) -> typing.Tuple[int, int]:
+    """Parse K/N into the 0-based shard index and the number of shards"""
+    index, sep, count = value.partition("/")
+    try:
+        k, n = int(index), int(count)
+    except ValueError:
+        k = n = 0
+    if not sep or not 1 <= k <= n:
+        raise pytest.UsageError(
+            f"--shard expects K/N with 1 <= K <= N: {value}"
+        )
+    return k - 1, n
+
+
+def assign_shards(
+    items: typing.List[pytest.Item],
+    share_of: typing.Callable[[pytest.Item], typing.Optional[str]],
+    count: int,
+) -> typing.Dict[str, int]:
+    """Return the shard of each test by node id.
+
+    The assignment depends only on the node ids and shares of the tests,
+    so all runners agree on it whatever the order of collection.
+    """
+    groups: typing.Dict[str, typing.List[str]] = {}
+    for item in items:
+        groups.setdefault(share_of(item) or "", []).append(item.nodeid)
+    shards = {}
+    for offset, share in enumerate(sorted(groups)):
+        for i, nodeid in enumerate(sorted(groups[share])):
+            shards[nodeid] = (offset + i) % count
+    return shards
+
+
+class Distributed:
+    def __init__(
+        self, shard: typing.Optional[typing.Tuple[int, int]], timeout: float
+    ) -> None:
+        self.shard = shard
+        self.timeout = timeout
+
+    def _share_of(self, item: pytest.Item) -> typing.Optional[str]:
+        shares = testhelper.get_shares(testhelper.get_test_info())
+        return get_item_share(item, shares)
+
+    def pytest_collection_modifyitems(
+        self, config: pytest.Config, items: typing.List[pytest.Item]
+    ) -> None:
+        if self.shard is None:
+            return
+        index, count = self.shard
+        shards = assign_shards(items, self._share_of, count)
+        selected = [item for item in items if shards[item.nodeid] == index]
+        deselected = [item for item in items if shards[item.nodeid] != index]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(
+        self, item: pytest.Item
+    ) -> typing.Generator[None, None, None]:
+        if item.get_closest_marker("exclusive") is None:
+            yield
+            return
+        share = self._share_of(item)
+        assert share is not None, f"{item.nodeid} takes no share to lock"
+        mount_params = testhelper.get_mount_parameters(
+            testhelper.get_test_info(), share
+        )
+        owner = f"{testhelper.get_worker_namespace()} {item.nodeid}"
+        with testhelper.smb_share_lock(mount_params, owner, self.timeout):
+            yield
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("distributed", "distributed execution")
+    group.addoption(
+        "--shard",
+        default=None,
+        metavar="K/N",
+        help="run only the K-th of N disjoint subsets of the tests",
+    )
+    group.addoption(
+        "--exclusive-timeout",
+        type=float,
+        default=3600,
+        metavar="SECONDS",
+        help="time tests marked exclusive wait for the lock of their share",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    shard = config.getoption("shard")
+    plugin = Distributed(
+        parse_shard(shard) if shard else None,
+        config.getoption("exclusive_timeout"),
+    )
+    config.pluginmanager.register(plugin, "distributed")
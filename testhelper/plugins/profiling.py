@@ -0,0 +1,219 @@
+# Profile the tests selected with --profile-tests.
+#
+# The call phase of each matching test runs under cProfile, or under a
+# sampling profiler with --profile-mode=sampling, including the threads
+# it starts. One pstats or collapsed-stack file is written per test and
+# the hottest functions are listed at the end of the session.
+
+import cProfile
+import collections
+import fnmatch
+import pstats
+import re
+import sys
+import threading
+import types
+import typing
+import pytest
+from pathlib import Path
+from testhelper import perfhelper
+
+
+def _profile_name(nodeid: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", nodeid).strip("_")
+
+
+def _frame_name(frame: typing.Any) -> str:
+    code = frame.f_code
+    filename = Path(code.co_filename).name
+    return f"{filename}:{code.co_firstlineno}({code.co_name})"
+
+
+class _CProfiler:
+    """cProfile of the calling thread and of the threads it starts"""
+
+    suffix = ".pstats"
+
+    def __init__(self) -> None:
+        self.profiles: typing.List[cProfile.Profile] = []
+
+    def _thread_hook(self, *args: typing.Any) -> None:
+        sys.setprofile(None)
+        prof = cProfile.Profile()
+        self.profiles.append(prof)
+        prof.enable()
+
+    def start(self) -> None:
+        prof = cProfile.Profile()
+        self.profiles.append(prof)
+        # Since Python 3.12 a profiler sees every thread
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._thread_hook)
+        prof.enable()
+
+    def stop(self, path: Path) -> typing.List[typing.List[typing.Any]]:
+        self.profiles[0].disable()
+        threading.setprofile(None)  # type: ignore[arg-type]
+        stats = pstats.Stats(self.profiles[0])
+        for prof in self.profiles[1:]:
+            stats.add(prof)
+        stats.dump_stats(path)
+        top = []
+        raw = stats.stats  # type: ignore[attr-defined]
+        for func, (_, ncalls, tottime, cumtime, _) in raw.items():
+            name = f"{Path(func[0]).name}:{func[1]}({func[2]})"
+            top.append([tottime, cumtime, ncalls, name])
+        top.sort(key=lambda r: r[0], reverse=True)
+        return top
+
+
+class _SamplingProfiler:
+    """Sample the stacks of all threads but its own at an interval"""
+
+    suffix = ".collapsed"
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.stacks: typing.Counter[str] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, top in sys._current_frames().items():
+                if ident == own:
+                    continue
+                names = []
+                frame: typing.Optional[types.FrameType] = top
+                while frame is not None:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, path: Path) -> typing.List[typing.List[typing.Any]]:
+        assert self._thread is not None
+        self._stop.set()
+        self._thread.join()
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        # Time spent in each function itself, i.e. at the top of a stack
+        own: typing.Counter[str] = collections.Counter()
+        total: typing.Counter[str] = collections.Counter()
+        for stack, count in self.stacks.items():
+            names = stack.split(";")
+            own[names[-1]] += count
+            for name in set(names):
+                total[name] += count
+        return [
+            [count * self.interval, total[name] * self.interval, "-", name]
+            for name, count in own.most_common()
+        ]
+
+
+class Profiling:
+    def __init__(
+        self,
+        patterns: typing.List[str],
+        mode: str,
+        out_dir: Path,
+        top: int,
+        interval: float,
+    ) -> None:
+        self.patterns = patterns
+        self.mode = mode
+        self.out_dir = out_dir
+        self.top = top
+        self.interval = interval
+        self.results: typing.Dict[str, typing.Any] = {}
+
+    def _selected(self, nodeid: str) -> bool:
+        return any(
+            pattern in nodeid or fnmatch.fnmatchcase(nodeid, pattern)
+            for pattern in self.patterns
+        )
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(
+        self, item: pytest.Item
+    ) -> typing.Generator[None, None, None]:
+        if not self._selected(item.nodeid):
+            yield
+            return
+        profiler: typing.Union[_CProfiler, _SamplingProfiler]
+        if self.mode == "sampling":
+            profiler = _SamplingProfiler(self.interval)
+        else:
+            profiler = _CProfiler()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        path = self.out_dir / (_profile_name(item.nodeid) + profiler.suffix)
+        profiler.start()
+        try:
+            yield
+        finally:
+            top = profiler.stop(path)
+            self.results[item.nodeid] = (path, top[: self.top])
+
+    def pytest_terminal_summary(self, terminalreporter: typing.Any) -> None:
+        headers = ["own_s", "total_s", "calls", "function"]
+        for nodeid, (path, top) in self.results.items():
+            terminalreporter.write_sep("=", f"profile of {nodeid}")
+            terminalreporter.write_line(f"written to {path}")
+            terminalreporter.write_line(perfhelper.format_table(headers, top))
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("profiling", "profiling of selected tests")
+    group.addoption(
+        "--profile-tests",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="profile the tests whose node id contains or matches the "
+        "glob PATTERN, may be given several times",
+    )
+    group.addoption(
+        "--profile-mode",
+        choices=["cprofile", "sampling"],
+        default="cprofile",
+        help="deterministic cProfile or a low-overhead sampling profiler",
+    )
+    group.addoption(
+        "--profile-dir",
+        default="profiles",
+        metavar="DIR",
+        help="directory of the profile files, one per test",
+    )
+    group.addoption(
+        "--profile-top",
+        type=int,
+        default=15,
+        metavar="N",
+        help="number of hottest functions shown per test",
+    )
+    group.addoption(
+        "--profile-interval",
+        type=float,
+        default=0.005,
+        metavar="SECONDS",
+        help="interval of the sampling profiler",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    patterns = config.getoption("profile_tests")
+    if not patterns:
+        return
+    plugin = Profiling(
+        patterns,
+        config.getoption("profile_mode"),
+        Path(config.getoption("profile_dir")),
+        config.getoption("profile_top"),
+        config.getoption("profile_interval"),
+    )
+    config.pluginmanager.register(plugin, "profiling")
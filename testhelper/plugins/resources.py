@@ -0,0 +1,235 @@
+# Account the resources used by each test phase.
+#
+# With --resources or --resources-json the wall time, user and system
+# CPU time, peak RSS, context switches and I/O counters of the setup,
+# call and teardown of every test and of the setup and teardown of every
+# fixture defined in the test tree (e.g. setup_mount) are recorded. A
+# fixture's teardown is the phase fixture:<name>:teardown. A table of
+# the most expensive phases is shown at the end of the session and all
+# records can be written to a JSON file.
+
+import json
+import resource
+import time
+import typing
+import pytest
+from pathlib import Path
+from testhelper import perfhelper, prochelper
+
+resource_columns = [
+    "wall_s",
+    "user_s",
+    "sys_s",
+    "peak_rss_bytes",
+    "voluntary_ctxsw",
+    "involuntary_ctxsw",
+    "rchar",
+    "wchar",
+    "read_bytes",
+    "write_bytes",
+]
+
+_clear_refs_path = Path("/proc/self/clear_refs")
+_status_path = Path("/proc/self/status")
+
+
+def _reset_peak_rss() -> bool:
+    # Writing 5 to clear_refs resets the peak RSS (VmHWM) of the process
+    try:
+        _clear_refs_path.write_text("5")
+    except OSError:
+        return False
+    return True
+
+
+def _peak_rss() -> int:
+    for line in _status_path.read_text().splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1]) * 1024
+    # Peak over the lifetime of the process, in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _snapshot() -> typing.Dict[str, float]:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    ruc = resource.getrusage(resource.RUSAGE_CHILDREN)
+    io = prochelper.read_proc_io()
+    return {
+        "wall_s": time.perf_counter(),
+        "user_s": ru.ru_utime + ruc.ru_utime,
+        "sys_s": ru.ru_stime + ruc.ru_stime,
+        "voluntary_ctxsw": ru.ru_nvcsw + ruc.ru_nvcsw,
+        "involuntary_ctxsw": ru.ru_nivcsw + ruc.ru_nivcsw,
+        "rchar": io.get("rchar", 0),
+        "wchar": io.get("wchar", 0),
+        "read_bytes": io.get("read_bytes", 0),
+        "write_bytes": io.get("write_bytes", 0),
+    }
+
+
+class _Frame:
+    def __init__(self) -> None:
+        _reset_peak_rss()
+        self.child_peak_rss = 0
+        self.start = _snapshot()
+
+
+class ResourceAccounting:
+    def __init__(
+        self, json_path: typing.Optional[Path], sort: str, top: int
+    ) -> None:
+        self.json_path = json_path
+        self.sort = sort
+        self.top = top
+        self.records: typing.List[typing.Dict[str, typing.Any]] = []
+        self._stack: typing.List[_Frame] = []
+        # Fixture teardowns being measured, by id of their FixtureDef
+        self._teardowns: typing.Dict[int, _Frame] = {}
+
+    def _start(self) -> _Frame:
+        frame = _Frame()
+        self._stack.append(frame)
+        return frame
+
+    def _finish(self, frame: _Frame, nodeid: str, phase: str) -> None:
+        end = _snapshot()
+        peak = max(_peak_rss(), frame.child_peak_rss)
+        assert self._stack.pop() is frame, f"{nodeid} {phase} not nested"
+        # The peak of the enclosing phase must include this one as
+        # its own peak was reset when this one started.
+        if self._stack:
+            parent = self._stack[-1]
+            parent.child_peak_rss = max(parent.child_peak_rss, peak)
+        record: typing.Dict[str, typing.Any] = {
+            "nodeid": nodeid,
+            "phase": phase,
+        }
+        for name, value in end.items():
+            record[name] = value - frame.start[name]
+        record["peak_rss_bytes"] = peak
+        self.records.append(record)
+
+    def _measure(
+        self, nodeid: str, phase: str
+    ) -> typing.Generator[None, None, None]:
+        frame = self._start()
+        try:
+            yield
+        finally:
+            self._finish(frame, nodeid, phase)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(
+        self, item: pytest.Item
+    ) -> typing.Generator[None, None, None]:
+        yield from self._measure(item.nodeid, "setup")
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(
+        self, item: pytest.Item
+    ) -> typing.Generator[None, None, None]:
+        yield from self._measure(item.nodeid, "call")
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(
+        self, item: pytest.Item
+    ) -> typing.Generator[None, None, None]:
+        yield from self._measure(item.nodeid, "teardown")
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(
+        self, fixturedef: typing.Any, request: pytest.FixtureRequest
+    ) -> typing.Generator[None, None, None]:
+        # Only fixtures of the test tree, not those of pytest or plugins
+        if not fixturedef.baseid:
+            yield
+            return
+        nodeid = request.node.nodeid
+        phase = f"fixture:{fixturedef.argname}"
+        yield from self._measure(nodeid, phase)
+        if fixturedef.cached_result is None:
+            return
+
+        # The finalizers of a fixture run last added first, so this one
+        # starts the teardown and pytest_fixture_post_finalizer ends it.
+        def start_teardown() -> None:
+            self._teardowns[id(fixturedef)] = self._start()
+
+        fixturedef.addfinalizer(start_teardown)
+
+    def pytest_fixture_post_finalizer(
+        self, fixturedef: typing.Any, request: pytest.FixtureRequest
+    ) -> None:
+        frame = self._teardowns.pop(id(fixturedef), None)
+        if frame is None:
+            return
+        phase = f"fixture:{fixturedef.argname}:teardown"
+        self._finish(frame, request.node.nodeid, phase)
+
+    def pytest_terminal_summary(self, terminalreporter: typing.Any) -> None:
+        if not self.records:
+            return
+        records = sorted(
+            self.records, key=lambda r: r[self.sort], reverse=True
+        )
+        rows = [
+            [r["nodeid"], r["phase"]]
+            + [r["wall_s"], r["user_s"], r["sys_s"]]
+            + [r["peak_rss_bytes"] // 2**20]
+            + [r["voluntary_ctxsw"], r["involuntary_ctxsw"]]
+            + [r["rchar"] // 2**20, r["wchar"] // 2**20]
+            for r in records[: self.top]
+        ]
+        headers = ["test", "phase", "wall_s", "user_s", "sys_s", "rss_MB"]
+        headers += ["vcsw", "ivcsw", "rchar_MB", "wchar_MB"]
+        terminalreporter.write_sep(
+            "=", f"resource usage (top {self.top} by {self.sort})"
+        )
+        terminalreporter.write_line(perfhelper.format_table(headers, rows))
+
+    def pytest_sessionfinish(self) -> None:
+        if self.json_path is None:
+            return
+        with open(self.json_path, "w") as f:
+            json.dump(self.records, f, indent=2)
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("resources", "resource accounting")
+    group.addoption(
+        "--resources",
+        action="store_true",
+        default=False,
+        help="account the resources used by each test phase",
+    )
+    group.addoption(
+        "--resources-json",
+        metavar="PATH",
+        default=None,
+        help="write the resource usage of each test phase to a JSON file",
+    )
+    group.addoption(
+        "--resources-sort",
+        default="wall_s",
+        choices=resource_columns,
+        help="column to sort the resource usage table by",
+    )
+    group.addoption(
+        "--resources-top",
+        type=int,
+        default=20,
+        metavar="N",
+        help="number of test phases shown in the resource usage table",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    json_path = config.getoption("resources_json")
+    if not config.getoption("resources") and not json_path:
+        return
+    plugin = ResourceAccounting(
+        Path(json_path) if json_path else None,
+        config.getoption("resources_sort"),
+        config.getoption("resources_top"),
+    )
+    config.pluginmanager.register(plugin, "resources")
@@ -0,0 +1,151 @@
+# Store the results of each run in a SQLite database.
+#
+# With --results-db the outcome and duration of every test, the numeric
+# properties it reported (throughput, latencies, CIFS counters, fsstress
+# statistics), the time taken by the mounts it made and the outcomes of
+# the subtests it reported as "subtest.<name>" properties, such as the
+# smbtorture subunit results, are added to the database. Each test is
+# tagged with the backend, server and share it ran against and each run
+# with the git revision of the tests and its start time. Under
+# pytest-xdist, the controller adds the run and its workers add their
+# results to it. The database is queried with python -m testhelper.results.
+
+import subprocess
+import typing
+import pytest
+import testhelper
+from pathlib import Path
+from testhelper import cmdhelper, results
+from testhelper.plugins import get_item_share
+
+subtest_prefix = "subtest."
+
+
+def _git_revision(root: Path) -> typing.Optional[str]:
+    proc = subprocess.run(
+        ["git", "-C", str(root), "rev-parse", "HEAD"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+        check=False,
+    )
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+
+def _outcome(reports: typing.List[pytest.TestReport]) -> str:
+    outcome = "passed"
+    for report in reports:
+        if report.failed:
+            return "failed" if report.when == "call" else "error"
+        if report.skipped:
+            outcome = "xfailed" if hasattr(report, "wasxfail") else "skipped"
+        elif report.when == "call" and hasattr(report, "wasxfail"):
+            outcome = "xpassed"
+    return outcome
+
+
+def _mount_metrics(
+    mounts: typing.List[typing.Dict[str, typing.Any]],
+) -> typing.List[typing.Tuple[str, float]]:
+    metrics = []
+    for mount in mounts:
+        host, _, share = mount["unc"].lstrip("\\").partition("\\")
+        for name in ("mount_s", "umount_s"):
+            if mount.get(name) is not None:
+                metrics.append((f"mount.{host}.{share}.{name}", mount[name]))
+    return metrics
+
+
+class ResultsWarehouse:
+    def __init__(self, store: results.ResultsStore, run_id: int) -> None:
+        self.store = store
+        self.run_id = run_id
+        # The pytest-xdist controller leaves the results to its workers
+        self.distributed = False
+        self._reports: typing.Dict[str, typing.List[pytest.TestReport]] = {}
+
+    def _tags(self, item: pytest.Item) -> typing.Dict[str, typing.Any]:
+        shares = testhelper.get_shares(testhelper.get_test_info())
+        name = get_item_share(item, shares)
+        if name is None:
+            return {}
+        share = shares[name]
+        return {
+            "backend": share["backend"]["name"],
+            "server": share.get("server"),
+            "share": name,
+        }
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node: typing.Any) -> None:
+        node.workerinput["results_run_id"] = self.run_id
+        self.distributed = True
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        if self.distributed:
+            return
+        self._reports.setdefault(report.nodeid, []).append(report)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(
+        self, item: pytest.Item
+    ) -> typing.Generator[None, None, None]:
+        nmounts = len(cmdhelper.get_cifs_mount_history())
+        yield
+        reports = self._reports.pop(item.nodeid, [])
+        if not reports:
+            return
+        metrics = _mount_metrics(cmdhelper.get_cifs_mount_history()[nmounts:])
+        subtests = []
+        # The report of the teardown holds all properties of the test
+        for name, value in reports[-1].user_properties:
+            if isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                metrics.append((name, float(value)))
+            elif name.startswith(subtest_prefix):
+                start = len(subtest_prefix)
+                subtests.append((name[start:], str(value)))
+        self.store.add_result(
+            self.run_id,
+            item.nodeid,
+            _outcome(reports),
+            sum(report.duration for report in reports),
+            self._tags(item),
+            metrics,
+            subtests,
+        )
+
+    def pytest_unconfigure(self) -> None:
+        self.store.close()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("results", "results warehouse")
+    group.addoption(
+        "--results-db",
+        default=None,
+        metavar="PATH",
+        help="add the results of the run to this SQLite database",
+    )
+    group.addoption(
+        "--results-label",
+        default=None,
+        metavar="TEXT",
+        help="label of the run in the results database",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    db = config.getoption("results_db")
+    if not db:
+        return
+    store = results.ResultsStore(Path(db))
+    workerinput = getattr(config, "workerinput", {})
+    if "results_run_id" in workerinput:
+        run_id = workerinput["results_run_id"]
+    else:
+        run_id = store.add_run(
+            _git_revision(config.rootpath), config.getoption("results_label")
+        )
+    config.pluginmanager.register(ResultsWarehouse(store, run_id), "results")
@@ -0,0 +1,75 @@
+# Provide the sampler fixture to the workloads.
+#
+# With --sample-interval set, the sampler fixture records the state of
+# the client in the background while the test runs and writes it to a
+# CSV file per test. Otherwise it is a no-op.
+
+import re
+import typing
+import pytest
+from pathlib import Path
+from testhelper import prochelper, sampler as _sampler
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("sampler", "background sampling of workloads")
+    group.addoption(
+        "--sample-interval",
+        type=float,
+        default=0.0,
+        metavar="SECONDS",
+        help="sample the client state during workloads at this interval",
+    )
+    group.addoption(
+        "--sample-dir",
+        default=None,
+        metavar="DIR",
+        help="directory of the sample files, defaults to the directory "
+        "of --junitxml or ./samples",
+    )
+    group.addoption(
+        "--sample-interface",
+        default=None,
+        metavar="NAME",
+        help="network interface to sample, defaults to all interfaces",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    interface = config.getoption("sample_interface")
+    if interface is None or not config.getoption("sample_interval"):
+        return
+    if interface not in prochelper.read_net_dev():
+        raise pytest.UsageError(
+            f"--sample-interface: unknown network interface {interface}"
+        )
+
+
+def _sample_dir(config: pytest.Config) -> Path:
+    sample_dir = config.getoption("sample_dir")
+    if sample_dir:
+        return Path(sample_dir)
+    xmlpath = config.getoption("xmlpath", None)
+    if xmlpath:
+        return Path(xmlpath).parent
+    return Path("samples")
+
+
+def _sample_name(nodeid: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", nodeid).strip("_") + ".csv"
+
+
+@pytest.fixture
+def sampler(
+    request: pytest.FixtureRequest,
+) -> typing.Generator[_sampler.NullSampler, None, None]:
+    config = request.config
+    interval = config.getoption("sample_interval")
+    if not interval:
+        yield _sampler.NullSampler()
+        return
+    path = _sample_dir(config) / _sample_name(request.node.nodeid)
+    with _sampler.Sampler(
+        path, interval, config.getoption("sample_interface")
+    ) as smp:
+        yield smp
@@ -0,0 +1,258 @@
+import re
+import typing
+from pathlib import Path
+
+cifs_debug_data_path = Path("/proc/fs/cifs/DebugData")
+cifs_stats_path = Path("/proc/fs/cifs/Stats")
+net_dev_path = Path("/proc/net/dev")
+
+# Servers in DebugData are numbered at the start of a line while the
+# sessions and shares of a server are indented below it.
+_server_re = re.compile(r"^\d+\) ", re.MULTILINE)
+_extra_channels_re = re.compile(r"Extra Channels: (\d+)")
+_hostname_re = re.compile(r"Hostname: (\S+)")
+_credits_re = re.compile(r"Number of credits: (\d+)")
+_in_send_re = re.compile(r"In Send: (\d+)\s+In MaxReq Wait: (\d+)")
+
+# Per share blocks of Stats start with the UNC of the share
+_stats_share_re = re.compile(r"^\d+\) (\\\\\S+)\s*$", re.MULTILINE)
+_stats_reconnects_re = re.compile(r"(\d+) session (\d+) share reconnects")
+_stats_vfs_re = re.compile(r"Total vfs operations: (\d+)")
+_stats_total_re = re.compile(r"^(\w+): (\d+) (?:total|sent) (\d+) failed")
+_stats_bytes_re = re.compile(r"Bytes read: (\d+)\s+Bytes written: (\d+)")
+
+
+def read_cifs_debug_data() -> str:
+    """Return the contents of /proc/fs/cifs/DebugData.
+
+    Returns:
+    str: the debug data, empty if the cifs module is not loaded
+    """
+    try:
+        return cifs_debug_data_path.read_text()
+    except FileNotFoundError:
+        return ""
+
+
+def read_cifs_stats() -> str:
+    """Return the contents of /proc/fs/cifs/Stats.
+
+    Returns:
+    str: the statistics, empty if the cifs module is not loaded
+    """
+    try:
+        return cifs_stats_path.read_text()
+    except FileNotFoundError:
+        return ""
+
+
+def _unc_re(host: str, share: str) -> typing.Pattern:
+    unc = "\\\\" + host + "\\" + share
+    return re.compile(re.escape(unc) + r"(\s|$)", re.IGNORECASE)
+
+
+def split_cifs_servers(debug_data: str) -> typing.List[str]:
+    """Split DebugData into one block per server connection.
+
+    Parameters:
+    debug_data: contents of /proc/fs/cifs/DebugData
+
+    Returns:
+    list of the text blocks of each server
+    """
+    starts = [m.start() for m in _server_re.finditer(debug_data)]
+    ends = starts[1:] + [len(debug_data)]
+    return [debug_data[s:e] for s, e in zip(starts, ends)]
+
+
+def cifs_channel_count(
+    debug_data: str, host: str, share: str
+) -> typing.Optional[int]:
+    """Return the number of channels established for a mounted share.
+
+    Parameters:
+    debug_data: contents of /proc/fs/cifs/DebugData
+    host: server host name or address used for the mount
+    share: name of the mounted share
+
+    Returns:
+    int: number of channels of the session serving the share, None if
+    the share is not found in the debug data.
+    """
+    unc_re = _unc_re(host, share)
+    ret = None
+    for block in split_cifs_servers(debug_data):
+        if not unc_re.search(block):
+            continue
+        extra = [int(n) for n in _extra_channels_re.findall(block)]
+        ret = max([ret or 1] + [n + 1 for n in extra])
+    return ret
+
+
+def parse_proc_io(text: str) -> typing.Dict[str, int]:
+    """Parse the I/O accounting of a process from /proc/<pid>/io.
+
+    Parameters:
+    text: contents of /proc/<pid>/io
+
+    Returns:
+    dict: counters such as rchar, wchar, read_bytes and write_bytes
+    """
+    ret = {}
+    for line in text.splitlines():
+        name, _, value = line.partition(":")
+        if value.strip():
+            ret[name.strip()] = int(value)
+    return ret
+
+
+def read_proc_io(
+    pid: typing.Union[int, str] = "self",
+) -> typing.Dict[str, int]:
+    """Return the I/O accounting counters of a process.
+
+    Note that rchar and wchar count the bytes passed through read and
+    write calls, including copy_file_range, whether or not the data
+    crossed the network.
+
+    Parameters:
+    pid: process to read the counters of, the calling one by default
+
+    Returns:
+    dict: counters of /proc/<pid>/io
+    """
+    return parse_proc_io(Path(f"/proc/{pid}/io").read_text())
+
+
+def parse_net_dev(text: str) -> typing.Dict[str, typing.Dict[str, int]]:
+    """Parse the per-interface byte counters from /proc/net/dev.
+
+    Parameters:
+    text: contents of /proc/net/dev
+
+    Returns:
+    dict: rx_bytes and tx_bytes of each network interface
+    """
+    ret = {}
+    for line in text.splitlines():
+        iface, sep, counters = line.partition(":")
+        fields = counters.split()
+        if not sep or len(fields) < 9:
+            continue
+        ret[iface.strip()] = {
+            "rx_bytes": int(fields[0]),
+            "tx_bytes": int(fields[8]),
+        }
+    return ret
+
+
+def read_net_dev() -> typing.Dict[str, typing.Dict[str, int]]:
+    """Return the byte counters of the network interfaces of the host.
+
+    Returns:
+    dict: rx_bytes and tx_bytes of each network interface
+    """
+    return parse_net_dev(net_dev_path.read_text())
+
+
+def parse_cifs_server_state(
+    debug_data: str,
+) -> typing.Dict[str, typing.Dict[str, int]]:
+    """Parse the credits and in-flight requests of each server connection.
+
+    Parameters:
+    debug_data: contents of /proc/fs/cifs/DebugData
+
+    Returns:
+    dict: credits, in_send and in_maxreq_wait of each server host. The
+    values of several connections to the same host are added up.
+    """
+    ret: typing.Dict[str, typing.Dict[str, int]] = {}
+    for block in split_cifs_servers(debug_data):
+        hostname = _hostname_re.search(block)
+        if not hostname:
+            continue
+        state = ret.setdefault(
+            hostname.group(1),
+            {"credits": 0, "in_send": 0, "in_maxreq_wait": 0},
+        )
+        credits = _credits_re.search(block)
+        if credits:
+            state["credits"] += int(credits.group(1))
+        in_send = _in_send_re.search(block)
+        if in_send:
+            state["in_send"] += int(in_send.group(1))
+            state["in_maxreq_wait"] += int(in_send.group(2))
+    return ret
+
+
+def _parse_share_stats(block: str) -> typing.Dict[str, int]:
+    ret = {}
+    for line in block.splitlines():
+        m = _stats_total_re.match(line)
+        if m:
+            name = m.group(1).lower()
+            ret[name] = int(m.group(2))
+            ret[name + "_failed"] = int(m.group(3))
+        elif line.startswith("SMBs:"):
+            ret["smbs"] = int(line.split(":")[1])
+    m = _stats_bytes_re.search(block)
+    if m:
+        ret["bytes_read"] = int(m.group(1))
+        ret["bytes_written"] = int(m.group(2))
+    return ret
+
+
+def parse_cifs_stats(stats: str) -> typing.Dict[str, typing.Any]:
+    """Parse the global and per share counters of /proc/fs/cifs/Stats.
+
+    Parameters:
+    stats: contents of /proc/fs/cifs/Stats
+
+    Returns:
+    dict: "global" holds session_reconnects, share_reconnects and
+    vfs_operations. "shares" maps the UNC of each share to its counters
+    such as smbs, bytes_read, bytes_written, creates, closes, reads and
+    writes, each with a matching *_failed counter. The counters of
+    several mounts of the same UNC are added up.
+    """
+    glob = {}
+    m = _stats_reconnects_re.search(stats)
+    if m:
+        glob["session_reconnects"] = int(m.group(1))
+        glob["share_reconnects"] = int(m.group(2))
+    m = _stats_vfs_re.search(stats)
+    if m:
+        glob["vfs_operations"] = int(m.group(1))
+
+    shares: typing.Dict[str, typing.Dict[str, int]] = {}
+    matches = list(_stats_share_re.finditer(stats))
+    ends = [m.start() for m in matches[1:]] + [len(stats)]
+    for m, end in zip(matches, ends):
+        counters = shares.setdefault(m.group(1), {})
+        start = m.end()
+        for name, value in _parse_share_stats(stats[start:end]).items():
+            counters[name] = counters.get(name, 0) + value
+    return {"global": glob, "shares": shares}
+
+
+def diff_counters(
+    before: typing.Dict[str, int], after: typing.Dict[str, int]
+) -> typing.Dict[str, int]:
+    """Return the change of each counter between two snapshots.
+
+    A counter lower than before was reset in between, e.g. because the
+    share was unmounted and mounted again, and counts from zero.
+
+    Parameters:
+    before: counters at the start of the interval
+    after: counters at the end of the interval
+
+    Returns:
+    dict: difference of each counter present in after
+    """
+    ret = {}
+    for name, value in after.items():
+        prev = before.get(name, 0)
+        ret[name] = value - prev if value >= prev else value
+    return ret
@@ -0,0 +1,369 @@
+import argparse
+import socket
+import sqlite3
+import sys
+import time
+import typing
+from pathlib import Path
+from .perfhelper import format_table
+
+_schema = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    git_revision TEXT,
+    hostname TEXT,
+    label TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    nodeid TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    duration_s REAL NOT NULL,
+    backend TEXT,
+    server TEXT,
+    share TEXT,
+    PRIMARY KEY (run_id, nodeid)
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    nodeid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subtests (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    nodeid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    outcome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_nodeid ON results (nodeid);
+CREATE INDEX IF NOT EXISTS metrics_name ON metrics (nodeid, name);
+CREATE UNIQUE INDEX IF NOT EXISTS metrics_key
+    ON metrics (run_id, nodeid, name);
+CREATE INDEX IF NOT EXISTS subtests_run ON subtests (run_id, nodeid);
+"""
+
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def _slope(values: typing.List[float]) -> float:
+    # Least-squares slope of the values against their index
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    num = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    den = sum((x - mean_x) ** 2 for x in range(n))
+    return num / den
+
+
+class ResultsStore:
+    """SQLite store of the outcomes, durations, metrics and subtest
+    outcomes of the tests of many runs.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self._merge_metrics()
+        self.db.executescript(_schema)
+
+    def _merge_metrics(self) -> None:
+        # Databases written before metrics were unique per run, test and
+        # name keep the mean of the values, as the queries used to.
+        has_key = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'metrics_key'"
+        ).fetchone()
+        has_table = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'metrics'"
+        ).fetchone()
+        if has_key or not has_table:
+            return
+        with self.db:
+            self.db.executescript(
+                "CREATE TEMP TABLE merged AS SELECT run_id, nodeid, name,"
+                " AVG(value) FROM metrics GROUP BY run_id, nodeid, name;"
+                " DELETE FROM metrics;"
+                " INSERT INTO metrics SELECT * FROM merged;"
+                " DROP TABLE merged;"
+            )
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+    def add_run(
+        self,
+        git_revision: typing.Optional[str] = None,
+        label: typing.Optional[str] = None,
+        started_at: typing.Optional[float] = None,
+    ) -> int:
+        """Add a run and return its id"""
+        with self.db:
+            cur = self.db.execute(
+                "INSERT INTO runs (started_at, git_revision, hostname, label)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    time.time() if started_at is None else started_at,
+                    git_revision,
+                    socket.gethostname(),
+                    label,
+                ),
+            )
+        assert cur.lastrowid is not None
+        return cur.lastrowid
+
+    def add_result(
+        self,
+        run_id: int,
+        nodeid: str,
+        outcome: str,
+        duration_s: float,
+        tags: typing.Optional[typing.Dict[str, typing.Optional[str]]] = None,
+        metrics: typing.Iterable[typing.Tuple[str, float]] = (),
+        subtests: typing.Iterable[typing.Tuple[str, str]] = (),
+    ) -> None:
+        """Add the result of a test to a run.
+
+        Parameters:
+        run_id: id returned by add_run
+        nodeid: pytest node id of the test
+        outcome: passed, failed, error, skipped, xfailed or xpassed
+        duration_s: duration of the setup, call and teardown
+        tags: backend, server and share the test ran against
+        metrics: (name, value) of the metrics reported by the test, the
+        mean of the values of a metric reported several times being
+        kept. They replace those recorded before for the test in the run.
+        subtests: (name, outcome) of the subtests run by the test
+        """
+        tags = tags or {}
+        values: typing.Dict[str, typing.List[float]] = {}
+        for name, value in metrics:
+            values.setdefault(name, []).append(value)
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    nodeid,
+                    outcome,
+                    duration_s,
+                    tags.get("backend"),
+                    tags.get("server"),
+                    tags.get("share"),
+                ),
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?)",
+                [
+                    (run_id, nodeid, name, sum(v) / len(v))
+                    for name, v in values.items()
+                ],
+            )
+            self.db.executemany(
+                "INSERT INTO subtests VALUES (?, ?, ?, ?)",
+                [(run_id, nodeid, name, res) for name, res in subtests],
+            )
+
+    def runs(self, limit: int = 20) -> typing.List[typing.Tuple]:
+        """Return the latest runs with their number of tests and failures"""
+        return self.db.execute(
+            "SELECT r.id, r.started_at, r.git_revision, r.hostname, r.label,"
+            " COUNT(t.nodeid),"
+            " COALESCE(SUM(t.outcome IN ('failed', 'error')), 0)"
+            " FROM runs r LEFT JOIN results t ON t.run_id = r.id"
+            " GROUP BY r.id ORDER BY r.id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    def trend(
+        self, pattern: str, metric: typing.Optional[str] = None
+    ) -> typing.List[typing.Tuple]:
+        """Return the duration or a metric of tests over all runs.
+
+        Parameters:
+        pattern: glob pattern of the node ids
+        metric: glob pattern of the metric names, the duration of the
+        tests if None
+
+        Returns:
+        list of (run id, start time, git revision, node id, outcome,
+        duration) or of (run id, start time, git revision, node id,
+        metric, value) where the value of a metric reported several
+        times by a test in a run is the mean
+        """
+        if metric is None:
+            return self.db.execute(
+                "SELECT r.id, r.started_at, r.git_revision, t.nodeid,"
+                " t.outcome, t.duration_s"
+                " FROM results t JOIN runs r ON r.id = t.run_id"
+                " WHERE t.nodeid GLOB ? ORDER BY t.nodeid, r.id",
+                (pattern,),
+            ).fetchall()
+        return self.db.execute(
+            "SELECT r.id, r.started_at, r.git_revision, m.nodeid, m.name,"
+            " AVG(m.value)"
+            " FROM metrics m JOIN runs r ON r.id = m.run_id"
+            " WHERE m.nodeid GLOB ? AND m.name GLOB ?"
+            " GROUP BY r.id, m.nodeid, m.name"
+            " ORDER BY m.nodeid, m.name, r.id",
+            (pattern, metric),
+        ).fetchall()
+
+    def growth(self, last: int = 10) -> typing.List[typing.Tuple]:
+        """Return the tests by the growth of their duration.
+
+        Parameters:
+        last: number of latest runs considered
+
+        Returns:
+        list of (node id, runs, first duration, last duration, growth
+        in seconds per run), fastest growing first
+        """
+        rows = self.db.execute(
+            "SELECT nodeid, duration_s FROM results"
+            " WHERE run_id IN (SELECT id FROM runs ORDER BY id DESC LIMIT ?)"
+            " AND outcome = 'passed' ORDER BY nodeid, run_id",
+            (last,),
+        ).fetchall()
+        durations: typing.Dict[str, typing.List[float]] = {}
+        for nodeid, duration in rows:
+            durations.setdefault(nodeid, []).append(duration)
+        ret = [
+            (nodeid, len(values), values[0], values[-1], _slope(values))
+            for nodeid, values in durations.items()
+            if len(values) > 1
+        ]
+        ret.sort(key=lambda r: r[4], reverse=True)
+        return ret
+
+    def diff(self, run_a: int, run_b: int) -> typing.Dict[str, typing.List]:
+        """Compare the results of two runs.
+
+        Returns:
+        dict of the tests and subtests whose outcome changed, as
+        (node id, outcome a, outcome b) and (node id, subtest, outcome a,
+        outcome b), and of the durations and metrics of the tests found
+        in both runs, as (node id, value a, value b) and (node id, name,
+        value a, value b). A missing outcome is None.
+        """
+        outcomes = self.db.execute(
+            "SELECT nodeid, MAX(CASE WHEN run_id = ?1 THEN outcome END),"
+            " MAX(CASE WHEN run_id = ?2 THEN outcome END)"
+            " FROM results WHERE run_id IN (?1, ?2) GROUP BY nodeid",
+            (run_a, run_b),
+        ).fetchall()
+        subtests = self.db.execute(
+            "SELECT nodeid, name, MAX(CASE WHEN run_id = ?1 THEN outcome END),"
+            " MAX(CASE WHEN run_id = ?2 THEN outcome END)"
+            " FROM subtests WHERE run_id IN (?1, ?2) GROUP BY nodeid, name",
+            (run_a, run_b),
+        ).fetchall()
+        durations = self.db.execute(
+            "SELECT a.nodeid, a.duration_s, b.duration_s"
+            " FROM results a JOIN results b ON b.nodeid = a.nodeid"
+            " WHERE a.run_id = ? AND b.run_id = ? ORDER BY a.nodeid",
+            (run_a, run_b),
+        ).fetchall()
+        metrics = self.db.execute(
+            "SELECT nodeid, name,"
+            " AVG(CASE WHEN run_id = ?1 THEN value END),"
+            " AVG(CASE WHEN run_id = ?2 THEN value END)"
+            " FROM metrics WHERE run_id IN (?1, ?2)"
+            " GROUP BY nodeid, name ORDER BY nodeid, name",
+            (run_a, run_b),
+        ).fetchall()
+        return {
+            "outcomes": [r for r in outcomes if r[1] != r[2]],
+            "subtests": [r for r in subtests if r[2] != r[3]],
+            "durations": durations,
+            "metrics": [r for r in metrics if None not in r],
+        }
+
+
+def _change(a: float, b: float) -> typing.Union[float, str]:
+    return 100 * (b - a) / a if a else "-"
+
+
+def _main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m testhelper.results",
+        description="Query the results of the test runs",
+    )
+    parser.add_argument("db", type=Path, help="results database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    runs = sub.add_parser("runs", help="list the latest runs")
+    runs.add_argument("--limit", type=int, default=20)
+    trend = sub.add_parser("trend", help="show a test or metric over runs")
+    trend.add_argument("pattern", help="glob pattern of the test node ids")
+    trend.add_argument(
+        "--metric", default=None, help="glob pattern of the metric names"
+    )
+    growth = sub.add_parser(
+        "growth", help="list the tests whose duration grows the fastest"
+    )
+    growth.add_argument("--last", type=int, default=10, metavar="RUNS")
+    growth.add_argument("--top", type=int, default=20)
+    diff = sub.add_parser("diff", help="compare two runs")
+    diff.add_argument("run_a", type=int)
+    diff.add_argument("run_b", type=int)
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        parser.error(f"{args.db} does not exist")
+    with ResultsStore(args.db) as store:
+        if args.command == "runs":
+            headers = ["run", "started", "revision", "host", "label"]
+            headers += ["tests", "failed"]
+            rows = [
+                [r[0], _format_time(r[1]), r[2] or "-", r[3], r[4] or "-"]
+                + [r[5], r[6]]
+                for r in store.runs(args.limit)
+            ]
+            print(format_table(headers, rows))
+        elif args.command == "trend":
+            headers = ["run", "started", "revision", "test"]
+            if args.metric is None:
+                headers += ["outcome", "duration_s"]
+            else:
+                headers += ["metric", "value"]
+            rows = [
+                [r[0], _format_time(r[1]), r[2] or "-"] + list(r[3:])
+                for r in store.trend(args.pattern, args.metric)
+            ]
+            print(format_table(headers, rows))
+        elif args.command == "growth":
+            headers = ["test", "runs", "first_s", "last_s", "s_per_run"]
+            rows = [list(r) for r in store.growth(args.last)[: args.top]]
+            print(format_table(headers, rows))
+        else:
+            res = store.diff(args.run_a, args.run_b)
+            a, b = f"run {args.run_a}", f"run {args.run_b}"
+            print("Changed outcomes:")
+            rows = [[r[0], r[1] or "-", r[2] or "-"] for r in res["outcomes"]]
+            print(format_table(["test", a, b], rows))
+            print("\nChanged subtest outcomes:")
+            rows = [
+                [r[0], r[1], r[2] or "-", r[3] or "-"] for r in res["subtests"]
+            ]
+            print(format_table(["test", "subtest", a, b], rows))
+            print("\nDurations:")
+            rows = [list(r) + [_change(r[1], r[2])] for r in res["durations"]]
+            print(format_table(["test", a, b, "change%"], rows))
+            print("\nMetrics:")
+            rows = [list(r) + [_change(r[2], r[3])] for r in res["metrics"]]
+            print(format_table(["test", "metric", a, b, "change%"], rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
@@ -0,0 +1,166 @@
+import csv
+import os
+import threading
+import time
+import typing
+from pathlib import Path
+from .prochelper import (
+    parse_cifs_server_state,
+    read_cifs_debug_data,
+    read_net_dev,
+)
+
+_page_size = os.sysconf("SC_PAGE_SIZE")
+
+# Columns sampled from the system, workload counters follow them
+sample_columns = [
+    "time_s",
+    "cpu_user_pct",
+    "cpu_sys_pct",
+    "rss_bytes",
+    "net_rx_bytes_per_s",
+    "net_tx_bytes_per_s",
+    "cifs_in_send",
+    "cifs_in_maxreq_wait",
+    "cifs_credits",
+]
+
+
+class NullSampler:
+    """A sampler which records nothing, used when sampling is disabled"""
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+
+def _read_rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * _page_size
+
+
+def _net_bytes(interface: typing.Optional[str]) -> typing.Tuple[int, int]:
+    devs = read_net_dev()
+    if interface is not None:
+        if interface not in devs:
+            raise ValueError(f"unknown network interface: {interface}")
+        devs = {interface: devs[interface]}
+    rx = sum(dev["rx_bytes"] for dev in devs.values())
+    tx = sum(dev["tx_bytes"] for dev in devs.values())
+    return rx, tx
+
+
+class Sampler(NullSampler):
+    """Sample the state of the client in a background thread.
+
+    At every interval the CPU usage and RSS of this process, the network
+    throughput, the in-flight requests and credits of the CIFS client
+    and the rate of each workload counter are recorded. Workloads bump
+    their counters with count(). The samples are written to a CSV file
+    when the sampler is stopped.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        interval: float = 1.0,
+        interface: typing.Optional[str] = None,
+    ) -> None:
+        self.path = path
+        self.interval = interval
+        self.interface = interface
+        self.samples: typing.List[typing.Dict[str, float]] = []
+        self._counts: typing.Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + n
+
+    def _snapshot(self) -> typing.Dict[str, typing.Any]:
+        times = os.times()
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            "time": time.monotonic(),
+            "cpu": (times.user, times.system),
+            "net": _net_bytes(self.interface),
+            "counts": counts,
+        }
+
+    def _sample(
+        self, start: float, prev: typing.Dict[str, typing.Any]
+    ) -> typing.Dict[str, typing.Any]:
+        cur = self._snapshot()
+        elapsed = max(cur["time"] - prev["time"], 1e-9)
+        servers = parse_cifs_server_state(read_cifs_debug_data()).values()
+        sample = {
+            "time_s": cur["time"] - start,
+            "cpu_user_pct": 100 * (cur["cpu"][0] - prev["cpu"][0]) / elapsed,
+            "cpu_sys_pct": 100 * (cur["cpu"][1] - prev["cpu"][1]) / elapsed,
+            "rss_bytes": _read_rss(),
+            "net_rx_bytes_per_s": (cur["net"][0] - prev["net"][0]) / elapsed,
+            "net_tx_bytes_per_s": (cur["net"][1] - prev["net"][1]) / elapsed,
+            "cifs_in_send": sum(s["in_send"] for s in servers),
+            "cifs_in_maxreq_wait": sum(s["in_maxreq_wait"] for s in servers),
+            "cifs_credits": sum(s["credits"] for s in servers),
+        }
+        for name, value in cur["counts"].items():
+            delta = value - prev["counts"].get(name, 0)
+            sample[f"{name}_per_s"] = delta / elapsed
+        self.samples.append(sample)
+        return cur
+
+    def _run(self, prev: typing.Dict[str, typing.Any]) -> None:
+        start = prev["time"]
+        while not self._stop.wait(self.interval):
+            prev = self._sample(start, prev)
+        self._sample(start, prev)
+
+    def start(self) -> None:
+        assert self._thread is None, "sampler already started"
+        # Taken here so that a bad interface fails the caller, not the
+        # thread
+        prev = self._snapshot()
+        self._thread = threading.Thread(
+            target=self._run, args=(prev,), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.write()
+
+    def write(self) -> None:
+        counters = sorted(
+            {name for s in self.samples for name in s} - set(sample_columns)
+        )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", newline="") as f:
+            writer = csv.DictWriter(
+                f, sample_columns + counters, restval=0, extrasaction="raise"
+            )
+            writer.writeheader()
+            for sample in self.samples:
+                writer.writerow(
+                    {
+                        name: (
+                            round(value, 3)
+                            if isinstance(value, float)
+                            else value
+                        )
+                        for name, value in sample.items()
+                    }
+                )
+
+    def __enter__(self) -> "Sampler":
+        self.start()
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.stop()
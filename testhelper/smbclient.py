@@ -1,8 +1,20 @@
 from smb.SMBConnection import SMBConnection  # type: ignore
 from smb import smb_structs, base  # type: ignore
+import contextlib
 import typing
+import time
 import io
 
+NT_STATUS_OBJECT_NAME_COLLISION = 0xC0000035
+
+
+def _nt_statuses(error: smb_structs.OperationFailure) -> typing.List[int]:
+    # SMB2 messages carry the status as an int, SMB1 ones as an SMBError
+    return [
+        getattr(msg.status, "internal_value", msg.status)
+        for msg in error.smb_messages
+    ]
+
 
 class SMBClient:
     """Use pysmb to access the SMB server"""
@@ -35,9 +47,9 @@ class SMBClient:
         self.connected = False
         self.ctx.close()
 
-    def listdir(self, path: str = "/") -> typing.List[str]:
+    def listdir(self, path: str = "/", timeout: int = 30) -> typing.List[str]:
         try:
-            dentries = self.ctx.listPath(self.share, path)
+            dentries = self.ctx.listPath(self.share, path, timeout=timeout)
         except smb_structs.OperationFailure as error:
             raise IOError(f"failed to readdir: {error}")
         return [dent.filename for dent in dentries]
@@ -46,6 +58,8 @@ class SMBClient:
         try:
             self.ctx.createDirectory(self.share, dpath)
         except smb_structs.OperationFailure as error:
+            if NT_STATUS_OBJECT_NAME_COLLISION in _nt_statuses(error):
+                raise FileExistsError(f"failed to mkdir: {error}")
             raise IOError(f"failed to mkdir: {error}")
 
     def rmdir(self, dpath: str) -> None:
@@ -75,3 +89,77 @@ class SMBClient:
         except smb_structs.OperationFailure as error:
             raise IOError(f"failed in read_text: {error}")
         return ret
+
+
+@contextlib.contextmanager
+def smb_share_lock(
+    mount_params: typing.Dict[str, str],
+    owner: str,
+    timeout: float = 3600,
+    poll: float = 5,
+    lock_dir: str = "/.sit-exclusive.lock",
+) -> typing.Generator[None, None, None]:
+    """Hold an exclusive lock on a share among all test runners.
+
+    The lock is a directory created on the share with an SMB mkdir, which
+    fails while it exists, so only one runner holds it at a time. The
+    owner is written to a file in the directory to identify stale locks
+    left behind by runners which were killed. Errors other than the
+    directory existing, e.g. bad credentials or a read-only share, are
+    raised at once.
+
+    Parameters:
+    mount_params: Dict containing the parameters to access the share
+    owner: description of the holder, e.g. its worker namespace
+    timeout: seconds to wait for the lock before raising TimeoutError
+    poll: seconds between two attempts to take the lock
+    lock_dir: path of the lock directory on the share
+    """
+    owner_file = lock_dir + "/owner"
+    deadline = time.monotonic() + timeout
+    while True:
+        smbclient = SMBClient(
+            mount_params["host"],
+            mount_params["share"],
+            mount_params["username"],
+            mount_params["password"],
+        )
+        try:
+            try:
+                smbclient.mkdir(lock_dir)
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    try:
+                        holder = smbclient.read_text(owner_file)
+                    except IOError:
+                        holder = "unknown"
+                    raise TimeoutError(
+                        f"{lock_dir} on {mount_params['share']} is held by "
+                        f"{holder}, remove it if that runner is gone"
+                    )
+            else:
+                try:
+                    smbclient.write_text(owner_file, owner)
+                except IOError:
+                    smbclient.rmdir(lock_dir)
+                    raise
+                break
+        finally:
+            smbclient.disconnect()
+        time.sleep(poll)
+    # The connection is not kept open while the lock is held, which can
+    # be for hours.
+    try:
+        yield
+    finally:
+        smbclient = SMBClient(
+            mount_params["host"],
+            mount_params["share"],
+            mount_params["username"],
+            mount_params["password"],
+        )
+        try:
+            smbclient.unlink(owner_file)
+            smbclient.rmdir(lock_dir)
+        finally:
+            smbclient.disconnect()
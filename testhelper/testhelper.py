@@ -1,8 +1,17 @@
+import os
 import yaml
 import typing
 import random
+import socket
+import threading
 from pathlib import Path
 
+# Use the libyaml based loader when available
+_yaml_loader = getattr(yaml, "CFullLoader", yaml.FullLoader)
+
+_test_info_lock = threading.Lock()
+_test_info_cache: typing.Dict[str, typing.Tuple[typing.Any, dict]] = {}
+
 
 def _get_default_backend(test_info: dict) -> str:
     return test_info.get("backend") or test_info.get("test_backend", "xfs")
@@ -33,7 +42,7 @@ def read_yaml(test_info_file):
     dict: The parsed test information yml as a dictionary.
     """
     with open(test_info_file) as f:
-        test_info = yaml.load(f, Loader=yaml.FullLoader)
+        test_info = yaml.load(f, Loader=_yaml_loader)
 
     shares = test_info.get("shares", {})
 
@@ -64,6 +73,51 @@ def read_yaml(test_info_file):
     return test_info
 
 
+def get_test_info(test_info_file: typing.Optional[str] = None) -> dict:
+    """Returns the process-wide cached test information.
+
+    The file is parsed on first use and parsed again only once its
+    modification time or size changes. The returned dict is shared by
+    all callers and must not be modified.
+
+    Parameters:
+    test_info_file: filename of yaml file. Defaults to $TEST_INFO_FILE.
+
+    Returns:
+    dict: The parsed test information yml as a dictionary.
+    """
+    if test_info_file is None:
+        test_info_file = os.getenv("TEST_INFO_FILE")
+    assert test_info_file, "TEST_INFO_FILE not set"
+    path = os.path.abspath(test_info_file)
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    with _test_info_lock:
+        cached = _test_info_cache.get(path)
+        if cached is None or cached[0] != key:
+            cached = (key, read_yaml(path))
+            _test_info_cache[path] = cached
+    return cached[1]
+
+
+def get_test_config(
+    test_info: dict, section: str, defaults: typing.Optional[dict] = None
+) -> dict:
+    """Get the configuration of a test area from the test-info.
+
+    Parameters:
+    test_info: Dict containing the parsed yaml file.
+    section: Name of the test area under the "tests" key.
+    defaults: Default values for settings missing from the test-info.
+
+    Returns:
+    dict: settings for the test area
+    """
+    config = dict(defaults or {})
+    config.update((test_info.get("tests") or {}).get(section) or {})
+    return config
+
+
 def gen_mount_params(
     host: str, share: str, username: str, password: str
 ) -> typing.Dict[str, str]:
@@ -125,6 +179,53 @@ def generate_random_bytes(size: int) -> bytes:
     return rba[:size]
 
 
+def generate_seeded_bytes(seed: int, size: int) -> bytes:
+    """
+    Creates a reproducible sequence of semi-random bytes.
+
+    Same construction as 'generate_random_bytes()', but drawn from a
+    random generator seeded with 'seed'. The same seed and size always
+    yield the same bytes, so data can be verified later by re-generating
+    it instead of keeping a copy in memory.
+    """
+    rng = random.Random(seed)
+    rba = bytearray(rng.randbytes(min(size, 1024)))
+    while len(rba) < size:
+        rem = size - len(rba)
+        rnd = bytearray(rng.randbytes(min(rem, 1024)))
+        rba = rba + rnd + rba
+    return bytes(rba[:size])
+
+
+def mix_seeds(*values: int) -> int:
+    """
+    Combines several integers into a single seed.
+
+    Used to derive the seed of a piece of data, e.g. a chunk of a file,
+    from the seed of a whole run and the position of the data within it.
+    """
+    seed = 0
+    for value in values:
+        seed = (seed * 0x9E3779B1 + value + 1) % 2**64
+    return seed
+
+
+def get_worker_namespace() -> str:
+    """
+    Returns a name unique to this test process among all test runners.
+
+    Tests name the directories they create on a share after it so that
+    runners on several hosts and pytest-xdist workers can share it.
+
+    Returns:
+    str: sit-<host>-<worker>-<pid> where worker is the pytest-xdist
+    worker id, or "main" without pytest-xdist.
+    """
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    host = socket.gethostname().split(".")[0]
+    return f"sit-{host}-{worker}-{os.getpid()}"
+
+
 def get_shares(test_info: dict) -> dict:
     """
     Get list of shares
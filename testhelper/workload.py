@@ -0,0 +1,625 @@
+import itertools
+import os
+import random
+import struct
+import threading
+import time
+import typing
+import yaml
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from .testhelper import generate_seeded_bytes, mix_seeds
+from .manifest import ManifestEntry, verify_file, write_seeded_file
+from .perfhelper import summarize_latencies
+from .sampler import NullSampler
+
+workload_ops = ["read", "write", "stat", "unlink"]
+
+_size_suffixes = {"k": 2**10, "m": 2**20, "g": 2**30, "t": 2**40}
+
+
+def parse_size(size: typing.Union[int, str]) -> int:
+    """Convert a size such as 4096, "4k" or "16M" into bytes.
+
+    Parameters:
+    size: number of bytes, optionally with a k/m/g/t suffix
+
+    Returns:
+    int: size in bytes
+    """
+    if isinstance(size, int):
+        return size
+    value = str(size).strip().lower()
+    mult = 1
+    if value and value[-1] in _size_suffixes:
+        mult = _size_suffixes[value[-1]]
+        value = value[:-1]
+    return int(float(value) * mult)
+
+
+class WorkloadJob:
+    """A job definition of the workload engine.
+
+    A job works on a set of files in its own directory. Each worker of
+    the job owns every n-th file, so that the expected contents of each
+    file are always known to the worker reading it.
+    """
+
+    def __init__(self, spec: dict) -> None:
+        assert "name" in spec, "workload job without a name"
+        self.name = str(spec["name"])
+        fileset = spec.get("fileset") or {}
+        self.dirname = str(fileset.get("dir", self.name))
+        self.nfiles = int(fileset.get("nfiles", 1))
+        self.file_size = parse_size(fileset.get("size", 4096))
+        self.block_size = parse_size(spec.get("block_size", "1M"))
+        self.ops = {op: 0.0 for op in workload_ops}
+        for op, weight in (spec.get("ops") or {"write": 1, "read": 1}).items():
+            assert op in self.ops, f"{self.name}: unknown op {op}"
+            self.ops[op] = float(weight)
+        assert sum(self.ops.values()) > 0, f"{self.name}: no ops"
+        self.threads = int(spec.get("threads", 1))
+        self.processes = int(spec.get("processes", 1))
+        self.duration = float(spec.get("duration", 0))
+        self.ops_count = int(
+            spec.get("ops_count", 0 if self.duration else 100)
+        )
+        self.verify = bool(spec.get("verify", True))
+        self.seed = int(spec.get("seed", random.randrange(2**32)))
+        self.spec = dict(spec, seed=self.seed)
+        assert self.nfiles >= self.workers, f"{self.name}: too few files"
+
+    @property
+    def workers(self) -> int:
+        return self.threads * self.processes
+
+    def file_path(self, root: Path, idx: int) -> Path:
+        return root / self.dirname / f"file-{idx:06d}"
+
+    def chunks(self, idx: int, gen: int) -> typing.Iterator[bytes]:
+        """Generate the contents of file idx at write generation gen"""
+        nchunks = (self.file_size + self.block_size - 1) // self.block_size
+        for chunk in range(nchunks):
+            size = min(
+                self.block_size, self.file_size - chunk * self.block_size
+            )
+            seed = mix_seeds(self.seed, idx, gen, chunk)
+            yield generate_seeded_bytes(seed, size)
+
+
+def load_workload_jobs(path: Path) -> typing.List[WorkloadJob]:
+    """Load the job definitions from a YAML file.
+
+    Parameters:
+    path: YAML file holding a list of job definitions
+
+    Returns:
+    list of the jobs in the file
+    """
+    with open(path) as f:
+        specs = yaml.safe_load(f) or []
+    return [WorkloadJob(spec) for spec in specs]
+
+
+class _Worker:
+    def __init__(
+        self,
+        job: WorkloadJob,
+        root: Path,
+        wid: int,
+        sampler: typing.Optional[NullSampler] = None,
+    ) -> None:
+        self.job = job
+        self.root = root
+        self.wid = wid
+        self.sampler = sampler or NullSampler()
+        self.files = list(range(wid, job.nfiles, job.workers))
+        # Write generation of each owned file, None once unlinked
+        self.gens: typing.Dict[int, typing.Optional[int]] = {
+            idx: 0 for idx in self.files
+        }
+        self.rng = random.Random(mix_seeds(job.seed, wid))
+        self.latencies: typing.Dict[str, typing.List[float]] = {
+            op: [] for op in workload_ops
+        }
+        self.nbytes = {op: 0 for op in workload_ops}
+
+    def _write(self, idx: int, gen: int) -> int:
+        nbytes = 0
+        with open(self.job.file_path(self.root, idx), "wb") as f:
+            for chunk in self.job.chunks(idx, gen):
+                nbytes += f.write(chunk)
+        return nbytes
+
+    def prepare(self) -> None:
+        for idx in self.files:
+            self._write(idx, 0)
+
+    def do_write(self, idx: int) -> int:
+        gen = (self.gens[idx] or 0) + 1
+        nbytes = self._write(idx, gen)
+        self.gens[idx] = gen
+        return nbytes
+
+    def do_read(self, idx: int) -> int:
+        path = self.job.file_path(self.root, idx)
+        gen = self.gens[idx]
+        nbytes = 0
+        try:
+            with open(path, "rb") as f:
+                if not self.job.verify:
+                    while True:
+                        data = f.read(self.job.block_size)
+                        if not data:
+                            break
+                        nbytes += len(data)
+                    return nbytes
+                if gen is None:
+                    raise IOError(f"unlinked file still exists: {path}")
+                for expected in self.job.chunks(idx, gen):
+                    data = f.read(len(expected))
+                    if data != expected:
+                        raise IOError(f"data mismatch at {nbytes} in {path}")
+                    nbytes += len(data)
+                if f.read(1):
+                    raise IOError(f"file longer than expected: {path}")
+        except FileNotFoundError:
+            if self.job.verify and gen is not None:
+                raise
+        return nbytes
+
+    def do_stat(self, idx: int) -> int:
+        path = self.job.file_path(self.root, idx)
+        try:
+            st_size = path.stat().st_size
+        except FileNotFoundError:
+            if self.job.verify and self.gens[idx] is not None:
+                raise
+            return 0
+        if self.job.verify and st_size != self.job.file_size:
+            raise IOError(f"stat size mismatch: {st_size} {path}")
+        return 0
+
+    def do_unlink(self, idx: int) -> int:
+        try:
+            self.job.file_path(self.root, idx).unlink()
+        except FileNotFoundError:
+            if self.job.verify and self.gens[idx] is not None:
+                raise
+        self.gens[idx] = None
+        return 0
+
+    def run(self, deadline: float) -> None:
+        job = self.job
+        ops = [op for op in workload_ops if job.ops[op] > 0]
+        weights = [job.ops[op] for op in ops]
+        funcs = {op: getattr(self, "do_" + op) for op in ops}
+        count = 0
+        while True:
+            if job.ops_count and count >= job.ops_count:
+                break
+            if job.duration and time.time() >= deadline:
+                break
+            op = self.rng.choices(ops, weights)[0]
+            idx = self.rng.choice(self.files)
+            t0 = time.perf_counter()
+            nbytes = funcs[op](idx)
+            self.latencies[op].append(time.perf_counter() - t0)
+            self.nbytes[op] += nbytes
+            self.sampler.count(op)
+            if nbytes:
+                self.sampler.count(op + "_bytes", nbytes)
+            count += 1
+
+
+def _run_threads(
+    workers: typing.List[_Worker],
+    func: typing.Callable[[_Worker], None],
+) -> None:
+    errors: typing.List[Exception] = []
+
+    def _target(worker: _Worker) -> None:
+        try:
+            func(worker)
+        except Exception as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=_target, args=(w,)) for w in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def _run_process(
+    spec: dict,
+    root: str,
+    proc_idx: int,
+    sampler: typing.Optional[NullSampler] = None,
+) -> typing.Tuple[dict, dict, float, float]:
+    job = WorkloadJob(spec)
+    workers = [
+        _Worker(job, Path(root), proc_idx * job.threads + tid, sampler)
+        for tid in range(job.threads)
+    ]
+    _run_threads(workers, _Worker.prepare)
+    start = time.time()
+    _run_threads(workers, lambda w: w.run(start + job.duration))
+    end = time.time()
+    latencies: typing.Dict[str, typing.List[float]] = {}
+    nbytes: typing.Dict[str, int] = {}
+    for op in workload_ops:
+        latencies[op] = [lat for w in workers for lat in w.latencies[op]]
+        nbytes[op] = sum(w.nbytes[op] for w in workers)
+    return latencies, nbytes, start, end
+
+
+def run_workload_job(
+    job: WorkloadJob,
+    root: Path,
+    sampler: typing.Optional[NullSampler] = None,
+) -> dict:
+    """Run a workload job on a directory.
+
+    Parameters:
+    job: job to run
+    root: directory, usually on a mounted share, to run the job in
+    sampler: sampler counting the operations of the job. Only jobs
+    running in a single process are counted.
+
+    Returns:
+    dict: throughput and latency of the job in total and per op type
+    """
+    (root / job.dirname).mkdir(parents=True, exist_ok=True)
+    if job.processes == 1:
+        results = [_run_process(job.spec, str(root), 0, sampler)]
+    else:
+        with ProcessPoolExecutor(max_workers=job.processes) as executor:
+            futures = [
+                executor.submit(_run_process, job.spec, str(root), i)
+                for i in range(job.processes)
+            ]
+            results = [future.result() for future in futures]
+    # Measured from the first worker starting until the last one is done
+    start = min(res[2] for res in results)
+    end = max(res[3] for res in results)
+    elapsed = max(end - start, 1e-9)
+
+    ret: typing.Dict[str, typing.Any] = {
+        "job": job.name,
+        "workers": job.workers,
+        "elapsed_s": elapsed,
+        "op": {},
+    }
+    total_ops = 0
+    total_bytes = 0
+    for op in workload_ops:
+        latencies = [lat for res in results for lat in res[0][op]]
+        nbytes = sum(res[1][op] for res in results)
+        if not latencies:
+            continue
+        stats: typing.Dict[str, float] = dict(summarize_latencies(latencies))
+        stats["ops_per_sec"] = len(latencies) / elapsed
+        stats["mbps"] = nbytes / elapsed / 2**20
+        ret["op"][op] = stats
+        total_ops += len(latencies)
+        total_bytes += nbytes
+    ret["ops"] = total_ops
+    ret["ops_per_sec"] = total_ops / elapsed
+    ret["mbps"] = total_bytes / elapsed / 2**20
+    return ret
+
+
+# The fixed workloads of test_io, test_randio and test_stress, also run by
+# test_mount_matrix with each mount option profile.
+
+
+class DataPath:
+    """A pair of seeded data and path-name to its regular file.
+
+    The data is generated from a random seed while writing and verified
+    against the chunk digests recorded at that time, so that it never
+    has to be held in memory.
+    """
+
+    def __init__(self, path: Path, size: int) -> None:
+        self.path = path
+        self.size = size
+        self.seed = random.randrange(2**32)
+        self.entry: typing.Optional[ManifestEntry] = None
+
+    def renew(self) -> None:
+        self.seed = random.randrange(2**32)
+
+    def write(self) -> None:
+        self.entry = write_seeded_file(
+            self.path.parent, self.path.name, self.size, self.seed
+        )
+
+    def overwrite(self) -> None:
+        self.renew()
+        self.write()
+
+    def mkdirs(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def unlink(self) -> None:
+        self.path.unlink()
+
+    def verify(self) -> None:
+        # verify_file checks the size before the data
+        assert self.entry is not None, f"not written: {self.path}"
+        verify_file(self.path, self.size, self.entry.digests)
+
+    def verify_noent(self) -> None:
+        has_stat = False
+        try:
+            self.path.stat()
+            has_stat = True
+        except FileNotFoundError:
+            pass
+        if has_stat:
+            raise IOError(f"still exists: {self.path}")
+
+
+# (file size, file count) of each I/O consistency case
+io_cases = [
+    # Case-1: single 4K file
+    (4096, 1),
+    # Case-2: single 16M file
+    (2**24, 1),
+    # Case-3: few 1M files
+    (2**20, 10),
+    # Case-4: many 1K files
+    (1024, 100),
+]
+
+
+def _make_pathname(base: Path, idx: int) -> Path:
+    return base / str(idx)
+
+
+def _make_datapath(base: Path, idx: int, size: int) -> DataPath:
+    return DataPath(_make_pathname(base, idx), size)
+
+
+def make_datasets(base: Path, size: int, count: int) -> typing.List[DataPath]:
+    return [_make_datapath(base, idx, size) for idx in range(0, count)]
+
+
+def run_io_checks(dsets: typing.List[DataPath]) -> int:
+    """Run the checks and return the number of bytes written and read"""
+    for dset in dsets:
+        dset.mkdirs()
+    for dset in dsets:
+        dset.write()
+    for dset in dsets:
+        dset.verify()
+    for dset in dsets:
+        dset.overwrite()
+    for dset in dsets:
+        dset.verify()
+    for dset in dsets:
+        dset.unlink()
+    for dset in dsets:
+        dset.verify_noent()
+    return 4 * sum(dset.size for dset in dsets)
+
+
+# magic, block index, write generation, seed
+block_header = struct.Struct("<8sQQQ")
+block_magic = b"SITRIO01"
+
+
+class BlockFile:
+    """A file made of tagged blocks, accessed with pread/pwrite"""
+
+    def __init__(
+        self, path: Path, file_size: int, block_size: int, seed: int
+    ) -> None:
+        assert block_size > block_header.size, "block size too small"
+        self.path = path
+        self.block_size = block_size
+        self.nblocks = file_size // block_size
+        self.seed = seed
+        self.generations = [0] * self.nblocks
+        self.pool = generate_seeded_bytes(seed, 2 * block_size)
+        self.fd = -1
+
+    def open(self) -> None:
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def close(self) -> None:
+        os.close(self.fd)
+        self.fd = -1
+
+    def unlink(self) -> None:
+        self.path.unlink()
+
+    def block_data(self, idx: int, gen: int) -> bytes:
+        plen = self.block_size - block_header.size
+        off = (idx * 31 + gen * 17) % self.block_size
+        end = off + plen
+        header = block_header.pack(block_magic, idx, gen, self.seed)
+        return header + self.pool[off:end]
+
+    def fill(self) -> None:
+        batch = max(1, 2**24 // self.block_size)
+        for start in range(0, self.nblocks, batch):
+            end = min(start + batch, self.nblocks)
+            data = b"".join(self.block_data(i, 0) for i in range(start, end))
+            self._pwrite(data, start)
+
+    def _pwrite(self, data: bytes, idx: int) -> None:
+        ret = os.pwrite(self.fd, data, idx * self.block_size)
+        if ret != len(data):
+            raise IOError(f"short write at block {idx}: {ret}")
+
+    def write_block(self, idx: int) -> None:
+        gen = self.generations[idx] + 1
+        self._pwrite(self.block_data(idx, gen), idx)
+        self.generations[idx] = gen
+
+    def read_block(self, idx: int) -> None:
+        data = os.pread(self.fd, self.block_size, idx * self.block_size)
+        self.verify_block(idx, data)
+
+    def verify_block(self, idx: int, data: bytes) -> None:
+        gen = self.generations[idx]
+        if data == self.block_data(idx, gen):
+            return
+        if len(data) != self.block_size:
+            raise IOError(f"short read at block {idx}: {len(data)}")
+        magic, bidx, bgen, bseed = block_header.unpack_from(data)
+        raise IOError(
+            f"block {idx} gen {gen} corrupted: magic={magic!r} "
+            f"block={bidx} gen={bgen} seed={bseed} in {self.path}"
+        )
+
+    def verify(self) -> None:
+        batch = max(1, 2**24 // self.block_size)
+        for start in range(0, self.nblocks, batch):
+            end = min(start + batch, self.nblocks)
+            data = os.pread(
+                self.fd,
+                (end - start) * self.block_size,
+                start * self.block_size,
+            )
+            for idx in range(start, end):
+                off = (idx - start) * self.block_size
+                bend = off + self.block_size
+                self.verify_block(idx, data[off:bend])
+
+
+def _run_io_thread(
+    bfile: BlockFile,
+    tid: int,
+    nthreads: int,
+    read_pct: int,
+    deadline: float,
+    latencies: typing.Dict[str, typing.List[float]],
+    sampler: NullSampler,
+) -> None:
+    # Each thread owns every nthreads-th block so that the expected
+    # generation of a block is never changed behind its back.
+    rng = random.Random(bfile.seed + tid)
+    nowned = len(range(tid, bfile.nblocks, nthreads))
+    reads = latencies["read"]
+    writes = latencies["write"]
+    while time.perf_counter() < deadline:
+        idx = tid + nthreads * rng.randrange(nowned)
+        is_read = rng.random() * 100 < read_pct
+        t0 = time.perf_counter()
+        if is_read:
+            bfile.read_block(idx)
+            reads.append(time.perf_counter() - t0)
+            sampler.count("read")
+        else:
+            bfile.write_block(idx)
+            writes.append(time.perf_counter() - t0)
+            sampler.count("write")
+
+
+def run_random_io(
+    bfile: BlockFile,
+    nthreads: int,
+    read_pct: int,
+    duration: float,
+    sampler: typing.Optional[NullSampler] = None,
+) -> typing.Dict[str, typing.Any]:
+    assert nthreads <= bfile.nblocks, "more threads than blocks"
+    smp = sampler or NullSampler()
+    per_thread: typing.List[typing.Dict[str, typing.List[float]]] = [
+        {"read": [], "write": []} for _ in range(nthreads)
+    ]
+    errors: typing.List[Exception] = []
+
+    def _worker(tid: int) -> None:
+        try:
+            _run_io_thread(
+                bfile,
+                tid,
+                nthreads,
+                read_pct,
+                deadline,
+                per_thread[tid],
+                smp,
+            )
+        except Exception as ex:
+            errors.append(ex)
+
+    threads = [
+        threading.Thread(target=_worker, args=(tid,))
+        for tid in range(nthreads)
+    ]
+    start = time.perf_counter()
+    deadline = start + duration
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+
+    reads = list(itertools.chain(*(lat["read"] for lat in per_thread)))
+    writes = list(itertools.chain(*(lat["write"] for lat in per_thread)))
+    nops = len(reads) + len(writes)
+    return {
+        "iops": nops / elapsed,
+        "mbps": nops * bfile.block_size / elapsed / 2**20,
+        "read": summarize_latencies(reads),
+        "write": summarize_latencies(writes),
+    }
+
+
+def _perform_file_operations(
+    client_id: int,
+    root_dir: Path,
+    num_operations: int,
+    file_size: int,
+    sampler: NullSampler,
+) -> None:
+    try:
+        for i in range(num_operations):
+            name = f"testfile_{client_id}_{i}.txt"
+            seed = random.randrange(2**32)
+            entry = write_seeded_file(root_dir, name, file_size, seed)
+            sampler.count("write_bytes", file_size)
+            path = root_dir / name
+            verify_file(path, file_size, entry.digests)
+            sampler.count("read_bytes", file_size)
+
+            path.unlink()
+            sampler.count("files")
+    except Exception as ex:
+        print(f"Error while stress testing with Client {client_id}: %s", ex)
+        raise
+
+
+def run_stress_test(
+    root_dir: Path,
+    num_clients: int,
+    num_operations: int,
+    file_size: int,
+    sampler: typing.Optional[NullSampler] = None,
+) -> None:
+    sampler = sampler or NullSampler()
+    threads = []
+
+    for i in range(num_clients):
+        thread = threading.Thread(
+            target=_perform_file_operations,
+            args=(i, root_dir, num_operations, file_size, sampler),
+        )
+        threads.append(thread)
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    print("Stress test complete.")